@@ -1,11 +1,69 @@
 from app.models.usuario import buscar_usuario
 from app.models.empresa import buscar_empresa
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
 from app.db.db import get_db
+import asyncio
 import logging
+import time
+import os
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+SENHA_WORKERS = int(os.getenv("SENHA_WORKERS", "2"))
+SENHA_MAX_FILA = int(os.getenv("SENHA_MAX_FILA", "32"))
+
+
+class PoolSenhasOcupado(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Servidor ocupado processando autenticações. Tente novamente em instantes.",
+            headers={"Retry-After": "1"}
+        )
+
+
+class PoolSenhas:
+    def __init__(self, workers: int = SENHA_WORKERS, max_fila: int = SENHA_MAX_FILA):
+        self.workers = workers
+        self.max_fila = max_fila
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="senha")
+        self.pendentes = 0
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.tempo_total = 0.0
+
+    async def executar(self, funcao, *args):
+        if self.pendentes >= self.max_fila:
+            self.rejeitadas += 1
+            raise PoolSenhasOcupado()
+
+        self.pendentes += 1
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+        finally:
+            self.pendentes -= 1
+            self.concluidas += 1
+            self.tempo_total += time.perf_counter() - inicio
+
+    def metricas(self):
+        return {
+            "workers": self.workers,
+            "max_fila": self.max_fila,
+            "pendentes": self.pendentes,
+            "concluidas": self.concluidas,
+            "rejeitadas": self.rejeitadas,
+            "tempo_medio_ms": round(self.tempo_total / self.concluidas * 1000, 2) if self.concluidas else 0.0
+        }
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool_senhas = PoolSenhas()
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -15,6 +73,14 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def verificar_senha(plain_password, hashed_password):
+    return await pool_senhas.executar(verify_password, plain_password, hashed_password)
+
+
+async def gerar_hash_senha(password):
+    return await pool_senhas.executar(get_password_hash, password)
+
+
 async def authenticate_user(username: str, password: str):
     async with get_db('hareware') as db:
         try:
@@ -39,11 +105,15 @@ async def authenticate_user(username: str, password: str):
                 if enterprise.status is False:
                     return False
 
-                if not verify_password(password, user_data['senha']):
+                user_data["cnpj"] = enterprise.cnpj
+
+                if not await verificar_senha(password, user_data['senha']):
                     return False
 
                 return user_data
 
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Erro ao processar a requisição de autenticar usuário: {str(e)}")
             return {"status": "error", "message": str(e)}
@@ -1,15 +1,37 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+import hashlib
+import secrets
+import time
+import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from app.auth2.versoes_token import versao_usuario, versao_empresa, token_revogado
+from app.utils.cache_ttl import CacheTTL
 
 SECRET_KEY = "chave secreta"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+CACHE_TOKENS_MAX_ITENS = int(os.getenv("CACHE_TOKENS_MAX_ITENS", "10000"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+cache_tokens = CacheTTL(ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60, max_itens=CACHE_TOKENS_MAX_ITENS)
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    username: str
+    cnpj: Optional[str] = None
+    empresa_id: Optional[int] = None
+    nivel_acesso: Optional[int] = None
+    versao_token: int = 0
+    versao_empresa: int = 0
+    expira_em: Optional[int] = None
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -18,17 +40,69 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+async def criar_token_usuario(username: str, cnpj: str, empresa_id: int, nivel_acesso: int):
+    return create_access_token(
+        data={
+            "sub": username,
+            "cnpj": cnpj,
+            "empresa_id": empresa_id,
+            "nivel_acesso": nivel_acesso,
+            "ver": await versao_usuario(username),
+            "ver_emp": await versao_empresa(cnpj)
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+
+def hash_refresh_token(refresh_token: str):
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+def gerar_refresh_token():
+    refresh_token = secrets.token_urlsafe(48)
+    expira_em = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return refresh_token, hash_refresh_token(refresh_token), expira_em
+
+
+def _decodificar_token(token: str):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+
+    return UsuarioAutenticado(
+        username=username,
+        cnpj=payload.get("cnpj"),
+        empresa_id=payload.get("empresa_id"),
+        nivel_acesso=payload.get("nivel_acesso"),
+        versao_token=payload.get("ver", 0),
+        versao_empresa=payload.get("ver_emp", 0),
+        expira_em=payload.get("exp")
+    )
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Credenciais inválidas',
         headers={"WWW-Authenticate": "Bearer"}
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    chave = hashlib.sha256(token.encode("utf-8")).digest()
+    usuario = cache_tokens.obter(chave)
+
+    if usuario is None:
+        try:
+            usuario = _decodificar_token(token)
+        except JWTError:
+            raise credentials_exception
+        if usuario is None:
             raise credentials_exception
-        return {"username": username}
-    except JWTError:
+
+        restante = usuario.expira_em - time.time() if usuario.expira_em else None
+        if restante is None or restante > 0:
+            cache_tokens.definir(chave, usuario, ttl=restante)
+
+    if await token_revogado(usuario.username, usuario.cnpj, usuario.versao_token, usuario.versao_empresa):
+        cache_tokens.invalidar(chave)
         raise credentials_exception
+    return usuario
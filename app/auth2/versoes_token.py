@@ -0,0 +1,48 @@
+from sqlalchemy import text
+import math
+import os
+from app.db.db import get_db
+from app.utils.cache_ttl import CacheTTL
+
+CACHE_VERSOES_TOKEN_TTL = int(os.getenv("CACHE_VERSOES_TOKEN_TTL", "30"))
+CACHE_VERSOES_TOKEN_MAX_ITENS = int(os.getenv("CACHE_VERSOES_TOKEN_MAX_ITENS", "20000"))
+
+CONSULTA_VERSAO_USUARIO = "SELECT versao_token FROM usuario WHERE usuario = :valor"
+CONSULTA_VERSAO_EMPRESA = "SELECT versao_token FROM empresa WHERE cnpj = :valor"
+
+cache_versoes_token = CacheTTL(ttl=CACHE_VERSOES_TOKEN_TTL, max_itens=CACHE_VERSOES_TOKEN_MAX_ITENS)
+
+
+async def _carregar_versao(consulta: str, valor: str):
+    async with get_db('hareware') as db:
+        result = await db.execute(text(consulta), {"valor": valor})
+        versao = result.scalar_one_or_none()
+    return math.inf if versao is None else versao
+
+
+async def versao_usuario(username: str):
+    return await cache_versoes_token.obter_ou_carregar(
+        ("usuario", username), lambda: _carregar_versao(CONSULTA_VERSAO_USUARIO, username)
+    )
+
+
+async def versao_empresa(cnpj: str):
+    if cnpj is None:
+        return 0
+    return await cache_versoes_token.obter_ou_carregar(
+        ("empresa", cnpj), lambda: _carregar_versao(CONSULTA_VERSAO_EMPRESA, cnpj)
+    )
+
+
+def invalidar_versao_usuario(username: str):
+    cache_versoes_token.invalidar(("usuario", username))
+
+
+def invalidar_versao_empresa(cnpj: str):
+    cache_versoes_token.invalidar(("empresa", cnpj))
+
+
+async def token_revogado(username: str, cnpj: str, versao: int, versao_emp: int):
+    if versao < await versao_usuario(username):
+        return True
+    return cnpj is not None and versao_emp < await versao_empresa(cnpj)
@@ -1,11 +1,50 @@
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
+from app.db.db import registro_engines
+from app.auth2.security import pool_senhas
+from app.services.join_wpp import cliente_join
+from app.services.armazenamento import armazenamento
+from app.services.disparo_campanha import motor_disparo
+from app.services.agendador import agendador
+from app.services.derivados_imagem import gerador_derivados
+from app.services.cache_credenciais import cache_credenciais
+from app.services.webhook_join import processador_webhook
+from app.services.gptOpenAI import servico_assistente, gerenciador_threads
 from app.routes import (
     auth, usuario, empresa,
     contrato, produto, campanha,
-    campanha_produto, join_wpp
+    campanha_produto, join_wpp, metricas,
+    assistente
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tarefas = [
+        asyncio.create_task(cache_credenciais.manter_atualizado()),
+        asyncio.create_task(registro_engines.monitorar_ociosas()),
+        asyncio.create_task(motor_disparo.retomar_todos()),
+        asyncio.create_task(agendador.executar())
+    ]
+    gerenciador_threads.reabastecer()
+    processador_webhook.iniciar()
+    yield
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    await processador_webhook.encerrar()
+    await motor_disparo.encerrar()
+    await gerador_derivados.encerrar()
+    await cliente_join.fechar()
+    await gerenciador_threads.encerrar()
+    await servico_assistente.fechar()
+    await armazenamento.fechar()
+    await registro_engines.descartar_todas()
+    pool_senhas.encerrar()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(usuario.router)
@@ -14,4 +53,6 @@ app.include_router(contrato.router)
 app.include_router(produto.router)
 app.include_router(campanha.router)
 app.include_router(campanha_produto.router)
-app.include_router(join_wpp.router)
\ No newline at end of file
+app.include_router(join_wpp.router)
+app.include_router(metricas.router)
+app.include_router(assistente.router)
\ No newline at end of file
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Time
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Time, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 from app.db.db import Base
+from app.utils.eventos import emitir
 
 
 class AgendamentoCampanhaProduto(Base):
@@ -12,8 +14,9 @@ class AgendamentoCampanhaProduto(Base):
     campanha_produto_id = Column(Integer, ForeignKey("campanha_produto.id"))
     data = Column(Date, nullable=False)
     hora = Column(Time, nullable=False)
+    disparado_em = Column(DateTime, nullable=True)
 
-    campanha_produto = relationship("CampanhaProduto", back_populates="campanhas_produtos_associados")
+    campanha_produto = relationship("CampanhaProduto")
 
 
 async def criar_agendamento_campanha_produto(
@@ -31,6 +34,14 @@ async def criar_agendamento_campanha_produto(
     db.add(novo_agendamento_campanha_produto)
     await db.commit()
     await db.refresh(novo_agendamento_campanha_produto)
+    emitir(
+        "agendamento_criado",
+        env=db.info.get("env"),
+        agendamento_id=novo_agendamento_campanha_produto.id,
+        campanha_produto_id=novo_agendamento_campanha_produto.campanha_produto_id,
+        data=novo_agendamento_campanha_produto.data,
+        hora=novo_agendamento_campanha_produto.hora
+    )
     return novo_agendamento_campanha_produto
 
 
@@ -48,6 +59,7 @@ async def deletar_agendamento_campanha_produto(
 
     await db.delete(agendamento_campanha_produto)
     await db.commit()
+    emitir("agendamento_removido", env=db.info.get("env"), agendamento_id=agendamento_campanha_produto_id)
     return True
 
 
@@ -82,3 +94,32 @@ async def listar_agendamentos_campanha_produto_por_cp(
         }
         for acp in agendamentos_campanhas_produtos
     ]
+
+
+async def listar_agendamentos_periodo(db: AsyncSession, data_inicio: Date, data_fim: Date):
+    result = await db.execute(
+        select(
+            AgendamentoCampanhaProduto.id,
+            AgendamentoCampanhaProduto.campanha_produto_id,
+            AgendamentoCampanhaProduto.data,
+            AgendamentoCampanhaProduto.hora
+        )
+        .where(
+            AgendamentoCampanhaProduto.data.between(data_inicio, data_fim),
+            AgendamentoCampanhaProduto.disparado_em.is_(None)
+        )
+    )
+    return result.all()
+
+
+async def reivindicar_agendamento_campanha_produto(db: AsyncSession, agendamento_id: int):
+    result = await db.execute(
+        update(AgendamentoCampanhaProduto)
+        .where(AgendamentoCampanhaProduto.id == agendamento_id, AgendamentoCampanhaProduto.disparado_em.is_(None))
+        .values(disparado_em=datetime.utcnow())
+        .returning(AgendamentoCampanhaProduto.id)
+        .execution_options(synchronize_session=False)
+    )
+    reivindicado = result.scalar_one_or_none() is not None
+    await db.commit()
+    return reivindicado
@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base, cache_database_urls
+
+
+class BancoEmpresa(Base):
+    __tablename__ = "banco_empresa"
+
+    id = Column(Integer, primary_key=True)
+    cnpj = Column(String, unique=True, nullable=False, index=True)
+    dsn = Column(String, nullable=False)
+    status = Column(Boolean, nullable=False, default=True)
+
+
+async def criar_banco_empresa(db: AsyncSession, cnpj: str, dsn: str, status: bool = True):
+    novo_banco = BancoEmpresa(cnpj=cnpj, dsn=dsn, status=status)
+
+    db.add(novo_banco)
+    await db.commit()
+    await db.refresh(novo_banco)
+
+    if status:
+        cache_database_urls.definir(cnpj, dsn)
+    return novo_banco
+
+
+async def atualizar_banco_empresa(db: AsyncSession, cnpj: str, dsn: str = None, status: bool = None):
+    result = await db.execute(select(BancoEmpresa).where(BancoEmpresa.cnpj == cnpj))
+    banco = result.scalar_one_or_none()
+
+    if banco:
+        if dsn is not None:
+            banco.dsn = dsn
+        if status is not None:
+            banco.status = status
+
+        await db.commit()
+        await db.refresh(banco)
+        cache_database_urls.invalidar(cnpj)
+        return banco
+    return None
+
+
+async def deletar_banco_empresa(db: AsyncSession, cnpj: str):
+    result = await db.execute(select(BancoEmpresa).where(BancoEmpresa.cnpj == cnpj))
+    banco = result.scalar_one_or_none()
+
+    if banco:
+        await db.delete(banco)
+        await db.commit()
+        cache_database_urls.invalidar(cnpj)
+        return True
+    return False
+
+
+async def listar_bancos_empresa(db: AsyncSession):
+    result = await db.execute(select(BancoEmpresa).where(BancoEmpresa.status.is_(True)))
+    return result.scalars().all()
+
+
+async def buscar_banco_empresa(db: AsyncSession, cnpj: str):
+    result = await db.execute(select(BancoEmpresa).where(BancoEmpresa.cnpj == cnpj))
+    return result.scalar_one_or_none()
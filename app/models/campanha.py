@@ -3,6 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 from app.db.db import Base
+from app.utils.paginacao import Paginacao, paginar, filtro_prefixo
+from app.utils.transformadores_json import campanha_to_dict
 
 
 class Campanha(Base):
@@ -77,18 +79,19 @@ async def deletar_campanha(
     return True
 
 
-async def listar_campanhas(db: AsyncSession):
-    result = await db.execute(select(Campanha))
-    campanhas = result.scalars().all()
-    return [
-        {
-            "id": campanha.id,
-            "nome": campanha.nome,
-            "inicio_campanha": campanha.inicio_campanha,
-            "fim_campanha": campanha.fim_campanha
-        }
-        for campanha in campanhas
-    ]
+async def listar_campanhas(
+        db: AsyncSession,
+        paginacao: Paginacao = None,
+        nome: str = None,
+        data_inicio = None,
+        data_fim = None
+):
+    filtros = [filtro_prefixo(Campanha.nome, nome)]
+    if data_inicio is not None:
+        filtros.append(Campanha.fim_campanha >= data_inicio)
+    if data_fim is not None:
+        filtros.append(Campanha.inicio_campanha <= data_fim)
+    return await paginar(db, Campanha, filtros, paginacao, campanha_to_dict)
 
 
 async def buscar_campanha_por_id(db: AsyncSession, campanha_id: int):
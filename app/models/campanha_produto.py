@@ -1,9 +1,19 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Numeric, insert, update, delete, bindparam, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from decimal import Decimal
 from sqlalchemy.orm import relationship
 from app.db.db import Base
+from app.models.campanha import Campanha
+from app.models.produto import Produto
+from app.utils.eventos import emitir
+from app.utils.paginacao import Paginacao, paginar
+from app.utils.transformadores_json import campanha_produto_to_dict
+
+CONSULTA_CAMPANHA_PRODUTO_REFERENCIADOS = (
+    "SELECT campanha_produto_id FROM envio_campanha WHERE campanha_produto_id = ANY(:ids) "
+    "UNION SELECT campanha_produto_id FROM agendamento_campanha_produto WHERE campanha_produto_id = ANY(:ids)"
+)
 
 
 class CampanhaProduto(Base):
@@ -38,6 +48,12 @@ async def criar_campanha_produto(
     db.add(nova_campanha_produto)
     await db.commit()
     await db.refresh(nova_campanha_produto)
+    emitir(
+        "campanha_produto_alterado",
+        env=db.info.get("env"),
+        campanha_ids={nova_campanha_produto.campanha_id},
+        campanha_produto_id=nova_campanha_produto.id
+    )
     return nova_campanha_produto
 
 
@@ -53,6 +69,7 @@ async def atualizar_campanha_produto(
     campanha_produto = result.scalar_one_or_none()
 
     if campanha_produto:
+        campanha_id_anterior = campanha_produto.campanha_id
         if campanha_id is not None:
             campanha_produto.campanha_id = campanha_id
         if produto_id is not None:
@@ -64,6 +81,12 @@ async def atualizar_campanha_produto(
 
         await db.commit()
         await db.refresh(campanha_produto)
+        emitir(
+            "campanha_produto_alterado",
+            env=db.info.get("env"),
+            campanha_ids={campanha_id_anterior, campanha_produto.campanha_id},
+            campanha_produto_id=campanha_produto.id
+        )
         return campanha_produto
     return None
 
@@ -80,24 +103,159 @@ async def deletar_campanha_produto(
     if campanha_produto is None:
         return False
 
+    campanha_id = campanha_produto.campanha_id
     await db.delete(campanha_produto)
     await db.commit()
+    emitir(
+        "campanha_produto_alterado",
+        env=db.info.get("env"),
+        campanha_ids={campanha_id},
+        campanha_produto_id=campanha_produto_id
+    )
     return True
 
 
-async def listar_todos_campanha_produto(db: AsyncSession):
-    result = await db.execute(select(CampanhaProduto))
-    campanhas_produtos = result.scalars().all()
-    return [
-        {
-            "id": campanha_produto.id,
-            "campanha_id": campanha_produto.campanha_id,
-            "produto_id": campanha_produto.produto_id,
-            "valor_promocional": campanha_produto.valor_promocional,
-            "frequencia_exibicao": campanha_produto.frequencia_exibicao
-        }
-        for campanha_produto in campanhas_produtos
-    ]
+async def aplicar_lote_campanha_produto(
+        db: AsyncSession,
+        campanha_id: int,
+        itens: list[dict]
+):
+    result = await db.execute(select(Campanha.id).where(Campanha.id == campanha_id))
+    if result.scalar_one_or_none() is None:
+        return None
+
+    produto_ids = {item["produto_id"] for item in itens}
+    result = await db.execute(select(Produto.id).where(Produto.id.in_(produto_ids)))
+    produtos_existentes = set(result.scalars().all())
+
+    result = await db.execute(
+        select(CampanhaProduto.id, CampanhaProduto.produto_id).where(
+            CampanhaProduto.campanha_id == campanha_id,
+            CampanhaProduto.produto_id.in_(produto_ids)
+        )
+    )
+    vinculados = {}
+    for campanha_produto_id, produto_id in result.all():
+        vinculados.setdefault(produto_id, []).append(campanha_produto_id)
+
+    resultados = [None] * len(itens)
+    vistos = set()
+    inclusoes, atualizacoes, remocoes = [], [], []
+
+    for indice, item in enumerate(itens):
+        produto_id = item["produto_id"]
+        if produto_id in vistos:
+            resultados[indice] = {"produto_id": produto_id, "status": "erro", "mensagem": "Produto repetido no lote."}
+            continue
+        vistos.add(produto_id)
+
+        if item.get("remover"):
+            if produto_id not in vinculados:
+                resultados[indice] = {"produto_id": produto_id, "status": "erro", "mensagem": "Produto não está na campanha."}
+            else:
+                remocoes.append(indice)
+        elif produto_id in vinculados:
+            atualizacoes.append(indice)
+        elif produto_id not in produtos_existentes:
+            resultados[indice] = {"produto_id": produto_id, "status": "erro", "mensagem": "Produto não encontrado."}
+        elif item.get("valor_promocional") is None or item.get("frequencia_exibicao") is None:
+            resultados[indice] = {
+                "produto_id": produto_id, "status": "erro",
+                "mensagem": "valor_promocional e frequencia_exibicao são obrigatórios para incluir o produto."
+            }
+        else:
+            inclusoes.append(indice)
+
+    if remocoes:
+        ids_remocao = [
+            campanha_produto_id
+            for indice in remocoes
+            for campanha_produto_id in vinculados[itens[indice]["produto_id"]]
+        ]
+        result = await db.execute(text(CONSULTA_CAMPANHA_PRODUTO_REFERENCIADOS), {"ids": ids_remocao})
+        referenciados = set(result.scalars().all())
+        for indice in remocoes:
+            produto_id = itens[indice]["produto_id"]
+            if referenciados.intersection(vinculados[produto_id]):
+                resultados[indice] = {
+                    "produto_id": produto_id, "status": "erro",
+                    "mensagem": "Produto possui envios ou agendamentos vinculados na campanha."
+                }
+        remocoes = [indice for indice in remocoes if resultados[indice] is None]
+
+    if remocoes:
+        await db.execute(
+            delete(CampanhaProduto.__table__).where(
+                CampanhaProduto.__table__.c.campanha_id == campanha_id,
+                CampanhaProduto.__table__.c.produto_id.in_([itens[indice]["produto_id"] for indice in remocoes])
+            )
+        )
+        for indice in remocoes:
+            produto_id = itens[indice]["produto_id"]
+            resultados[indice] = {"produto_id": produto_id, "status": "removido", "ids": vinculados[produto_id]}
+
+    if atualizacoes:
+        tabela = CampanhaProduto.__table__
+        await db.execute(
+            update(tabela)
+            .where(tabela.c.campanha_id == campanha_id, tabela.c.produto_id == bindparam("b_produto_id"))
+            .values(
+                valor_promocional=func.coalesce(bindparam("b_valor_promocional", type_=tabela.c.valor_promocional.type), tabela.c.valor_promocional),
+                frequencia_exibicao=func.coalesce(bindparam("b_frequencia_exibicao", type_=Integer), tabela.c.frequencia_exibicao)
+            ),
+            [
+                {
+                    "b_produto_id": itens[indice]["produto_id"],
+                    "b_valor_promocional": itens[indice].get("valor_promocional"),
+                    "b_frequencia_exibicao": itens[indice].get("frequencia_exibicao")
+                }
+                for indice in atualizacoes
+            ]
+        )
+        for indice in atualizacoes:
+            produto_id = itens[indice]["produto_id"]
+            resultados[indice] = {"produto_id": produto_id, "status": "atualizado", "ids": vinculados[produto_id]}
+
+    if inclusoes:
+        result = await db.scalars(
+            insert(CampanhaProduto).returning(CampanhaProduto.id, sort_by_parameter_order=True),
+            [
+                {
+                    "campanha_id": campanha_id,
+                    "produto_id": itens[indice]["produto_id"],
+                    "valor_promocional": itens[indice]["valor_promocional"],
+                    "frequencia_exibicao": itens[indice]["frequencia_exibicao"]
+                }
+                for indice in inclusoes
+            ]
+        )
+        for indice, campanha_produto_id in zip(inclusoes, result.all()):
+            resultados[indice] = {"produto_id": itens[indice]["produto_id"], "status": "incluido", "ids": [campanha_produto_id]}
+
+    await db.commit()
+
+    if remocoes or atualizacoes or inclusoes:
+        emitir(
+            "campanha_produto_alterado",
+            env=db.info.get("env"),
+            campanha_ids={campanha_id},
+            campanha_produto_id=None
+        )
+    return resultados
+
+
+async def listar_todos_campanha_produto(
+    db: AsyncSession,
+    paginacao: Paginacao = None,
+    campanha_id: int = None,
+    produto_id: int = None
+):
+    filtros = []
+    if campanha_id is not None:
+        filtros.append(CampanhaProduto.campanha_id == campanha_id)
+    if produto_id is not None:
+        filtros.append(CampanhaProduto.produto_id == produto_id)
+    return await paginar(db, CampanhaProduto, filtros, paginacao, campanha_produto_to_dict)
 
 
 async def listar_campanha_produto_por_campanha(
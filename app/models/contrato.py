@@ -4,6 +4,7 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 from fastapi import HTTPException
 from app.utils.transformadores_json import contrato_to_dict
+from app.utils.paginacao import Paginacao, paginar, filtros_periodo
 from app.db.db import Base
 
 
@@ -87,30 +88,55 @@ async def atualizar_contrato(
     return None
 
 
-async def listar_contratos(db: AsyncSession):
-    result = await db.execute(select(Contrato))
-    return result.scalars().all()
+def _filtros_contrato(empresa_id, data_inicio, data_fim, status, pago):
+    filtros = filtros_periodo(Contrato.inicio_contrato, data_inicio, data_fim)
+    if empresa_id is not None:
+        filtros.append(Contrato.empresa_id == empresa_id)
+    if status is not None:
+        filtros.append(Contrato.status == status)
+    if pago is not None:
+        filtros.append(Contrato.pago == pago)
+    return filtros
 
 
-async def listar_contratos_formatados(db: AsyncSession):
-    result = await db.execute(select(Contrato))
-    contratos = result.scalars().all()
+def _contrato_formatado(c):
+    return {
+        "id": c.id,
+        "empresa_id": c.empresa_id,
+        "plano": c.plano,
+        "tempo_vigencia": c.tempo_vigencia,
+        "inicio_contrato": c.inicio_contrato.isoformat() if c.inicio_contrato else None,
+        "termino_contrato": c.termino_contrato.isoformat() if c.termino_contrato else None,
+        "data_ultimo_pagamento": c.data_ultimo_pagamento.isoformat() if c.data_ultimo_pagamento else None,
+        "pago": c.pago,
+        "status": c.status,
+    }
 
-    return [
-        {
-            "id": c.id,
-            "empresa_id": c.empresa_id,
-            "plano": c.plano,
-            "tempo_vigencia": c.tempo_vigencia,
-            "inicio_contrato": c.inicio_contrato.isoformat() if c.inicio_contrato else None,
-            "termino_contrato": c.termino_contrato.isoformat() if c.termino_contrato else None,
-            "data_ultimo_pagamento": c.data_ultimo_pagamento.isoformat() if c.data_ultimo_pagamento else None,
-            "pago": c.pago,
-            "status": c.status,
-        }
-        for c in contratos
-    ]
 
+async def listar_contratos(
+        db: AsyncSession,
+        paginacao: Paginacao = None,
+        empresa_id: int = None,
+        data_inicio = None,
+        data_fim = None,
+        status: bool = None,
+        pago: bool = None
+):
+    filtros = _filtros_contrato(empresa_id, data_inicio, data_fim, status, pago)
+    return await paginar(db, Contrato, filtros, paginacao, lambda contrato: contrato)
+
+
+async def listar_contratos_formatados(
+        db: AsyncSession,
+        paginacao: Paginacao = None,
+        empresa_id: int = None,
+        data_inicio = None,
+        data_fim = None,
+        status: bool = None,
+        pago: bool = None
+):
+    filtros = _filtros_contrato(empresa_id, data_inicio, data_fim, status, pago)
+    return await paginar(db, Contrato, filtros, paginacao, _contrato_formatado)
 
 
 async def deletar_contrato(db: AsyncSession, contrato_id: int):
@@ -4,6 +4,7 @@ from sqlalchemy.future import select
 from decimal import Decimal
 from sqlalchemy.orm import relationship
 from app.db.db import Base
+from app.utils.eventos import emitir
 
 
 class Credencial(Base):
@@ -36,6 +37,7 @@ async def criar_credencial(
     db.add(nova_credencial)
     await db.commit()
     await db.refresh(nova_credencial)
+    emitir("credencial_alterada", identificador_textual=identificador_textual)
     return nova_credencial
 
 
@@ -62,6 +64,7 @@ async def atualizar_credencial(
 
         await db.commit()
         await db.refresh(credencial)
+        emitir("credencial_alterada", identificador_textual=identificador_textual)
         return credencial
     return None
 
@@ -76,6 +79,7 @@ async def deletar_credencial(
     if credencial:
         await db.delete(credencial)
         await db.commit()
+        emitir("credencial_alterada", identificador_textual=identificador_textual)
         return True
     return False
 
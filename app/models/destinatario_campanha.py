@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base
+import os
+
+DESTINATARIOS_LOTE_INSERCAO = int(os.getenv("DESTINATARIOS_LOTE_INSERCAO", "5000"))
+
+
+class DestinatarioCampanha(Base):
+    __tablename__ = "destinatario_campanha"
+    __table_args__ = (UniqueConstraint("campanha_id", "numero"),)
+
+    id = Column(Integer, primary_key=True)
+    campanha_id = Column(Integer, ForeignKey("campanha.id"), nullable=False, index=True)
+    numero = Column(String, nullable=False)
+
+
+async def incluir_destinatarios_campanha(
+        db: AsyncSession,
+        campanha_id: int,
+        numeros: list[str]
+):
+    if not numeros:
+        return 0
+
+    numeros = list(dict.fromkeys(numeros))
+    incluidos = 0
+    for inicio in range(0, len(numeros), DESTINATARIOS_LOTE_INSERCAO):
+        result = await db.execute(
+            insert(DestinatarioCampanha)
+            .values([
+                {"campanha_id": campanha_id, "numero": numero}
+                for numero in numeros[inicio:inicio + DESTINATARIOS_LOTE_INSERCAO]
+            ])
+            .on_conflict_do_nothing(index_elements=["campanha_id", "numero"])
+        )
+        incluidos += result.rowcount
+    await db.commit()
+    return incluidos
+
+
+async def listar_destinatarios_campanha(db: AsyncSession, campanha_id: int):
+    result = await db.execute(
+        select(DestinatarioCampanha.numero)
+        .where(DestinatarioCampanha.campanha_id == campanha_id)
+        .order_by(DestinatarioCampanha.id)
+    )
+    return result.scalars().all()
@@ -4,6 +4,10 @@ from sqlalchemy import Column, Integer, String, Boolean, Date
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.utils.transformadores_json import empresa_to_dict
+from app.utils.paginacao import Paginacao, paginar, filtro_prefixo, filtros_periodo
+from app.utils.cache_usuarios import invalidar_empresa
+from app.auth2.versoes_token import invalidar_versao_empresa
+from app.models.refresh_token import revogar_refresh_tokens_empresa
 from app.db.db import Base
 
 
@@ -19,6 +23,7 @@ class Empresa(Base):
     email = Column(String, nullable=False)
     data_cadastro = Column(Date, nullable=True)
     status = Column(Boolean, nullable=False, default=True)
+    versao_token = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 async def criar_empresa(
@@ -45,6 +50,7 @@ async def criar_empresa(
     db.add(nova_empresa)
     await db.commit()
     await db.refresh(nova_empresa)
+    invalidar_versao_empresa(cnpj)
     return nova_empresa
 
 
@@ -64,6 +70,7 @@ async def atualizar_empresa(
     empresa = result.scalar_one_or_none()
 
     if empresa:
+        cnpj_anterior = empresa.cnpj
         if nome_fantasia is not None:
             empresa.nome_fantasia = nome_fantasia
         if razao_social is not None:
@@ -80,9 +87,15 @@ async def atualizar_empresa(
             empresa.data_cadastro = data_cadastro
         if status is not None:
             empresa.status = status
+        if cnpj is not None or status is not None:
+            empresa.versao_token = Empresa.versao_token + 1
+            await revogar_refresh_tokens_empresa(db, cnpj_anterior)
 
         await db.commit()
         await db.refresh(empresa)
+        invalidar_empresa(cnpj=cnpj_anterior, empresa_id=empresa.id)
+        invalidar_versao_empresa(cnpj_anterior)
+        invalidar_versao_empresa(empresa.cnpj)
         return empresa
     return None
 
@@ -119,17 +132,33 @@ async def atualizar_empresa_cnpj(
             empresa.data_cadastro = data_cadastro
         if status is not None:
             empresa.status = status
+        if status is not None:
+            empresa.versao_token = Empresa.versao_token + 1
+            await revogar_refresh_tokens_empresa(db, empresa.cnpj)
 
         await db.commit()
         await db.refresh(empresa)
+        invalidar_empresa(cnpj=empresa.cnpj, empresa_id=empresa.id)
+        invalidar_versao_empresa(empresa.cnpj)
         return empresa
     return None
 
 
-async def listar_empresas(db: AsyncSession):
-    result = await db.execute(select(Empresa))
-    empresas = result.scalars().all()
-    return [empresa_to_dict(e) for e in empresas]
+async def listar_empresas(
+    db: AsyncSession,
+    paginacao: Optional[Paginacao] = None,
+    nome: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    status: Optional[bool] = None
+):
+    filtros = [
+        filtro_prefixo(Empresa.nome_fantasia, nome),
+        *filtros_periodo(Empresa.data_cadastro, data_inicio, data_fim)
+    ]
+    if status is not None:
+        filtros.append(Empresa.status == status)
+    return await paginar(db, Empresa, filtros, paginacao, empresa_to_dict)
 
 
 async def deletar_empresa(db: AsyncSession, empresa_id: int) -> bool:
@@ -137,8 +166,12 @@ async def deletar_empresa(db: AsyncSession, empresa_id: int) -> bool:
     empresa = result.scalar_one_or_none()
 
     if empresa:
+        cnpj_empresa, id_empresa = empresa.cnpj, empresa.id
         await db.delete(empresa)
+        await revogar_refresh_tokens_empresa(db, cnpj_empresa)
         await db.commit()
+        invalidar_empresa(cnpj=cnpj_empresa, empresa_id=id_empresa)
+        invalidar_versao_empresa(cnpj_empresa)
         return True
     return False
 
@@ -148,8 +181,12 @@ async def deletar_empresa_cnpj(db: AsyncSession, cnpj: str) -> bool:
     empresa = result.scalar_one_or_none()
 
     if empresa:
+        cnpj_empresa, id_empresa = empresa.cnpj, empresa.id
         await db.delete(empresa)
+        await revogar_refresh_tokens_empresa(db, cnpj_empresa)
         await db.commit()
+        invalidar_empresa(cnpj=cnpj_empresa, empresa_id=id_empresa)
+        invalidar_versao_empresa(cnpj_empresa)
         return True
     return False
 
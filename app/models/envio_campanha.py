@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, insert, update, bindparam, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base
+from app.models.campanha_produto import CampanhaProduto
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIADO = "enviado"
+STATUS_ENTREGUE = "entregue"
+STATUS_LIDO = "lido"
+STATUS_FALHOU = "falhou"
+
+STATUS_ANTERIORES = {
+    STATUS_ENTREGUE: (STATUS_ENVIADO,),
+    STATUS_LIDO: (STATUS_ENVIADO, STATUS_ENTREGUE),
+    STATUS_FALHOU: (STATUS_ENVIADO,)
+}
+
+
+class EnvioCampanha(Base):
+    __tablename__ = "envio_campanha"
+
+    id = Column(Integer, primary_key=True)
+    campanha_id = Column(Integer, ForeignKey("campanha.id"), nullable=False, index=True)
+    campanha_produto_id = Column(Integer, ForeignKey("campanha_produto.id"), nullable=True)
+    numero = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=STATUS_PENDENTE, index=True)
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa = Column(DateTime, nullable=True)
+    id_mensagem = Column(String, nullable=True, index=True)
+    erro = Column(String, nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    reivindicado_em = Column(DateTime, nullable=True, index=True)
+
+
+async def criar_envios_campanha(db: AsyncSession, envios: list[dict]):
+    if not envios:
+        return []
+
+    agora = datetime.utcnow()
+    result = await db.scalars(
+        insert(EnvioCampanha).returning(EnvioCampanha.id, sort_by_parameter_order=True),
+        [
+            {
+                "campanha_id": envio["campanha_id"],
+                "campanha_produto_id": envio["campanha_produto_id"],
+                "numero": envio["numero"],
+                "status": STATUS_PENDENTE,
+                "tentativas": 0,
+                "criado_em": agora,
+                "atualizado_em": agora,
+                "reivindicado_em": agora
+            }
+            for envio in envios
+        ]
+    )
+    ids = result.all()
+    await db.commit()
+    return ids
+
+
+async def atualizar_envios_campanha(db: AsyncSession, atualizacoes: list[dict]):
+    if not atualizacoes:
+        return
+
+    agora = datetime.utcnow()
+    await db.execute(
+        update(EnvioCampanha.__table__)
+        .where(EnvioCampanha.__table__.c.id == bindparam("envio_id"))
+        .values(
+            status=bindparam("status"),
+            tentativas=bindparam("tentativas"),
+            proxima_tentativa=bindparam("proxima_tentativa"),
+            id_mensagem=bindparam("id_mensagem"),
+            erro=bindparam("erro"),
+            atualizado_em=agora,
+            reivindicado_em=agora
+        ),
+        [
+            {
+                "envio_id": atualizacao["envio_id"],
+                "status": atualizacao["status"],
+                "tentativas": atualizacao["tentativas"],
+                "proxima_tentativa": atualizacao.get("proxima_tentativa"),
+                "id_mensagem": atualizacao.get("id_mensagem"),
+                "erro": atualizacao.get("erro")
+            }
+            for atualizacao in atualizacoes
+        ]
+    )
+    await db.commit()
+
+
+async def reivindicar_envios_pendentes(db: AsyncSession, visibilidade: int):
+    agora = datetime.utcnow()
+    disponiveis = (
+        select(EnvioCampanha.id)
+        .where(
+            EnvioCampanha.status == STATUS_PENDENTE,
+            or_(
+                EnvioCampanha.reivindicado_em.is_(None),
+                EnvioCampanha.reivindicado_em < agora - timedelta(seconds=visibilidade)
+            )
+        )
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(EnvioCampanha)
+        .where(EnvioCampanha.id.in_(disponiveis.scalar_subquery()))
+        .values(reivindicado_em=agora)
+        .returning(
+            EnvioCampanha.id,
+            EnvioCampanha.campanha_id,
+            EnvioCampanha.campanha_produto_id,
+            EnvioCampanha.numero,
+            EnvioCampanha.tentativas,
+            EnvioCampanha.proxima_tentativa
+        )
+        .execution_options(synchronize_session=False)
+    )
+    pendentes = sorted(result.mappings().all(), key=lambda pendente: pendente["id"])
+    await db.commit()
+    return pendentes
+
+
+async def resumo_envios_campanha(db: AsyncSession, campanha_id: int):
+    result = await db.execute(
+        select(EnvioCampanha.status, func.count(EnvioCampanha.id))
+        .where(EnvioCampanha.campanha_id == campanha_id)
+        .group_by(EnvioCampanha.status)
+    )
+    return {status: quantidade for status, quantidade in result.all()}
+
+
+async def atualizar_status_por_mensagem(db: AsyncSession, recibos: list[dict]):
+    grupos = {}
+    for recibo in recibos:
+        if recibo["status"] in STATUS_ANTERIORES:
+            grupos.setdefault(recibo["status"], {})[recibo["id_mensagem"]] = recibo.get("erro")
+    if not grupos:
+        return
+
+    agora = datetime.utcnow()
+    tabela = EnvioCampanha.__table__
+    for status, mensagens in grupos.items():
+        await db.execute(
+            update(tabela)
+            .where(
+                tabela.c.id_mensagem == bindparam("b_id_mensagem"),
+                tabela.c.status.in_(STATUS_ANTERIORES[status])
+            )
+            .values(status=status, erro=bindparam("b_erro"), atualizado_em=agora),
+            [{"b_id_mensagem": id_mensagem, "b_erro": erro} for id_mensagem, erro in mensagens.items()]
+        )
+    await db.commit()
+
+
+async def buscar_produto_ultimo_envio(db: AsyncSession, numero: str):
+    result = await db.execute(
+        select(CampanhaProduto.produto_id)
+        .join(EnvioCampanha, EnvioCampanha.campanha_produto_id == CampanhaProduto.id)
+        .where(EnvioCampanha.numero == numero, EnvioCampanha.status != STATUS_PENDENTE)
+        .order_by(EnvioCampanha.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, String, DateTime, delete, insert, or_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base
+
+
+class EventoWebhook(Base):
+    __tablename__ = "evento_webhook"
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String, nullable=False)
+    instancia = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    tentativas = Column(Integer, nullable=False, default=0)
+    recebido_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    reivindicado_em = Column(DateTime, nullable=True, index=True)
+
+
+async def enfileirar_eventos_webhook(db: AsyncSession, eventos: list[dict]):
+    if not eventos:
+        return
+
+    await db.execute(
+        insert(EventoWebhook),
+        [
+            {
+                "tipo": evento["tipo"],
+                "instancia": evento["instancia"],
+                "payload": evento["payload"],
+                "tentativas": 0,
+                "recebido_em": evento["recebido_em"]
+            }
+            for evento in eventos
+        ]
+    )
+    await db.commit()
+
+
+async def reivindicar_eventos_webhook(db: AsyncSession, limite: int, visibilidade: int, max_tentativas: int):
+    agora = datetime.utcnow()
+    disponiveis = (
+        select(EventoWebhook.id)
+        .where(
+            or_(
+                EventoWebhook.reivindicado_em.is_(None),
+                EventoWebhook.reivindicado_em < agora - timedelta(seconds=visibilidade)
+            ),
+            EventoWebhook.tentativas < max_tentativas
+        )
+        .order_by(EventoWebhook.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(EventoWebhook)
+        .where(EventoWebhook.id.in_(disponiveis.scalar_subquery()))
+        .values(reivindicado_em=agora, tentativas=EventoWebhook.tentativas + 1)
+        .returning(EventoWebhook.id, EventoWebhook.tipo, EventoWebhook.instancia, EventoWebhook.payload)
+        .execution_options(synchronize_session=False)
+    )
+    eventos = result.mappings().all()
+    await db.commit()
+    return eventos
+
+
+async def concluir_eventos_webhook(db: AsyncSession, ids: list[int]):
+    if not ids:
+        return
+
+    await db.execute(delete(EventoWebhook).where(EventoWebhook.id.in_(ids)))
+    await db.commit()
@@ -1,11 +1,13 @@
-from sqlalchemy import Column, Integer, String, Numeric
+from sqlalchemy import Column, Integer, String, Numeric, or_
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
 from enum import Enum
 from sqlalchemy.orm import relationship
 from app.utils.transformadores_json import produto_to_dict
+from app.utils.paginacao import Paginacao, paginar, filtro_prefixo
 from app.db.db import Base
+from app.utils.eventos import emitir
 
 
 class UnidadeMedida(str, Enum):
@@ -139,15 +141,23 @@ async def atualizar_produto(
 
         await db.commit()
         await db.refresh(produto)
+        emitir("produto_alterado", env=db.info.get("env"), produto_id=produto.id)
         return produto
 
     return None
 
 
-async def listar_produtos(db: AsyncSession):
-    result = await db.execute(select(Produto))
-    produtos = result.scalars().all()
-    return [produto_to_dict(p) for p in produtos]
+async def listar_produtos(
+    db: AsyncSession,
+    paginacao: Paginacao = None,
+    nome: str = None,
+    codigo_produto: str = None
+):
+    filtros = [
+        filtro_prefixo(Produto.nome, nome),
+        filtro_prefixo(Produto.codigo_produto, codigo_produto)
+    ]
+    return await paginar(db, Produto, filtros, paginacao, produto_to_dict)
 
 
 async def deletar_produto(db: AsyncSession, produto_id: int):
@@ -157,6 +167,7 @@ async def deletar_produto(db: AsyncSession, produto_id: int):
     if produto:
         await db.delete(produto)
         await db.commit()
+        emitir("produto_alterado", env=db.info.get("env"), produto_id=produto_id)
         return True
     return False
 
@@ -164,3 +175,21 @@ async def deletar_produto(db: AsyncSession, produto_id: int):
 async def buscar_produto(db: AsyncSession, produto_id: int):
     result = await db.execute(select(Produto).filter(Produto.id == produto_id))
     return result.scalar_one_or_none()
+
+
+def caminho_imagem_produto(cnpj: str, sha256: str, nome_arquivo: str):
+    return f"produtos/{cnpj}/{sha256[:16]}-{nome_arquivo}"
+
+
+async def caminhos_imagem_em_uso(db: AsyncSession, caminhos):
+    caminhos = set(caminho for caminho in caminhos if caminho)
+    if not caminhos:
+        return set()
+    result = await db.execute(
+        select(Produto.path_imagem1, Produto.path_imagem2, Produto.path_imagem3).where(or_(
+            Produto.path_imagem1.in_(caminhos),
+            Produto.path_imagem2.in_(caminhos),
+            Produto.path_imagem3.in_(caminhos)
+        ))
+    )
+    return caminhos & {caminho for linha in result.all() for caminho in linha}
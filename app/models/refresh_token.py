@@ -0,0 +1,99 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_token"
+
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+    familia = Column(String(32), nullable=False, index=True)
+    usuario = Column(String, nullable=False)
+    cnpj = Column(String, nullable=False)
+    empresa_id = Column(Integer, nullable=False)
+    nivel_acesso = Column(Integer, nullable=False)
+    versao_token = Column(Integer, nullable=False, default=0)
+    versao_empresa = Column(Integer, nullable=False, default=0)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expira_em = Column(DateTime, nullable=False)
+    revogado = Column(Boolean, nullable=False, default=False)
+
+
+async def criar_refresh_token(
+        db: AsyncSession,
+        token_hash: str,
+        familia: str,
+        usuario: str,
+        cnpj: str,
+        empresa_id: int,
+        nivel_acesso: int,
+        versao_token: int,
+        versao_empresa: int,
+        expira_em: datetime
+):
+    novo_refresh_token = RefreshToken(
+        token_hash=token_hash,
+        familia=familia,
+        usuario=usuario,
+        cnpj=cnpj,
+        empresa_id=empresa_id,
+        nivel_acesso=nivel_acesso,
+        versao_token=versao_token,
+        versao_empresa=versao_empresa,
+        expira_em=expira_em
+    )
+
+    db.add(novo_refresh_token)
+    await db.commit()
+    return novo_refresh_token
+
+
+async def consumir_refresh_token(db: AsyncSession, token_hash: str):
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revogado.is_(False),
+            RefreshToken.expira_em > datetime.utcnow()
+        )
+        .values(revogado=True)
+        .returning(RefreshToken)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def revogar_familia_refresh_token(db: AsyncSession, familia: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.familia == familia, RefreshToken.revogado.is_(False))
+        .values(revogado=True)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def buscar_refresh_token(db: AsyncSession, token_hash: str):
+    result = await db.execute(select(RefreshToken).where(RefreshToken.token_hash == token_hash))
+    return result.scalar_one_or_none()
+
+
+async def revogar_refresh_tokens_usuario(db: AsyncSession, usuario: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.usuario == usuario, RefreshToken.revogado.is_(False))
+        .values(revogado=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def revogar_refresh_tokens_empresa(db: AsyncSession, cnpj: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.cnpj == cnpj, RefreshToken.revogado.is_(False))
+        .values(revogado=True)
+        .execution_options(synchronize_session=False)
+    )
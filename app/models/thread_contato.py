@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.db import Base
+
+
+class ThreadContato(Base):
+    __tablename__ = "thread_contato"
+    __table_args__ = (UniqueConstraint("cnpj", "id_contato", name="uq_thread_contato_cnpj_contato"),)
+
+    id = Column(Integer, primary_key=True)
+    cnpj = Column(String, nullable=False)
+    id_contato = Column(String, nullable=False)
+    thread_id = Column(String, nullable=False)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+async def buscar_thread_contato(db: AsyncSession, cnpj: str, id_contato: str):
+    result = await db.execute(
+        select(ThreadContato.thread_id).where(ThreadContato.cnpj == cnpj, ThreadContato.id_contato == id_contato)
+    )
+    return result.scalar_one_or_none()
+
+
+async def vincular_thread_contato(db: AsyncSession, cnpj: str, id_contato: str, thread_id: str):
+    result = await db.execute(
+        insert(ThreadContato)
+        .values(cnpj=cnpj, id_contato=id_contato, thread_id=thread_id, criado_em=datetime.utcnow())
+        .on_conflict_do_nothing(constraint="uq_thread_contato_cnpj_contato")
+        .returning(ThreadContato.thread_id)
+    )
+    vinculada = result.scalar_one_or_none()
+    await db.commit()
+
+    if vinculada is None:
+        return await buscar_thread_contato(db, cnpj, id_contato)
+    return vinculada
+
+
+async def remover_thread_contato(db: AsyncSession, cnpj: str, id_contato: str, thread_id: str = None):
+    filtros = [ThreadContato.cnpj == cnpj, ThreadContato.id_contato == id_contato]
+    if thread_id is not None:
+        filtros.append(ThreadContato.thread_id == thread_id)
+
+    result = await db.execute(delete(ThreadContato).where(*filtros))
+    await db.commit()
+    return result.rowcount > 0
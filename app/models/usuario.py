@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import relationship
 from app.db.db import Base
 from app.utils.transformadores_json import usuario_to_dict
+from app.utils.paginacao import Paginacao, paginar, filtro_prefixo, filtros_periodo
+from app.utils.cache_usuarios import invalidar_usuario
+from app.auth2.versoes_token import invalidar_versao_usuario
+from app.models.refresh_token import revogar_refresh_tokens_usuario
+
+CAMPOS_PUBLICOS_USUARIO = (
+    "id", "nome", "usuario", "email", "telefone", "nivel_acesso", "ultimo_acesso", "data_cadastro", "status"
+)
 
 
 class Usuario(Base):
@@ -19,6 +27,7 @@ class Usuario(Base):
     ultimo_acesso = Column(Date, nullable=True)
     data_cadastro = Column(Date, nullable=False)
     status = Column(Boolean, nullable=False, default=True)
+    versao_token = Column(Integer, nullable=False, default=0, server_default="0")
     id_empresa = Column(Integer, ForeignKey("empresa.id"), nullable=False)
 
     empresa = relationship("Empresa")
@@ -53,6 +62,7 @@ async def criar_usuario(
     db.add(novo_usuario)
     await db.commit()
     await db.refresh(novo_usuario)
+    invalidar_versao_usuario(usuario)
     return novo_usuario
 
 
@@ -73,6 +83,7 @@ async def atualizar_usuario(
     usuario_data = result.scalar_one_or_none()
 
     if usuario_data:
+        username_anterior = usuario_data.usuario
         if nome is not None:
             usuario_data.nome = nome
         if usuario is not None:
@@ -91,9 +102,16 @@ async def atualizar_usuario(
             usuario_data.data_cadastro = data_cadastro
         if status is not None:
             usuario_data.status = status
+        if any(campo is not None for campo in (usuario, senha, nivel_acesso, status)):
+            usuario_data.versao_token = Usuario.versao_token + 1
+            await revogar_refresh_tokens_usuario(db, username_anterior)
 
         await db.commit()
         await db.refresh(usuario_data)
+        invalidar_usuario(username_anterior)
+        invalidar_usuario(usuario_data.usuario)
+        invalidar_versao_usuario(username_anterior)
+        invalidar_versao_usuario(usuario_data.usuario)
         return usuario_data
     return None
 
@@ -109,7 +127,10 @@ async def deletar_usuario(db: AsyncSession, username: str):
 
     if usuario:
         await db.delete(usuario)
+        await revogar_refresh_tokens_usuario(db, username)
         await db.commit()
+        invalidar_usuario(username)
+        invalidar_versao_usuario(username)
         return True
     return False
 
@@ -119,10 +140,30 @@ async def buscar_usuario(db: AsyncSession, usuario: str):
     return result.scalar_one_or_none()
 
 
-async def buscar_usuarios_empresa(db: AsyncSession, empresa_id: int):
-    result = await db.execute(select(Usuario).filter(Usuario.id_empresa == empresa_id))
-    usuarios = result.scalars().all()
-    return [usuario_to_dict(u) for u in usuarios]
+async def buscar_usuarios_empresa(
+        db: AsyncSession,
+        empresa_id: int,
+        paginacao: Paginacao = None,
+        nome: str = None,
+        data_inicio = None,
+        data_fim = None,
+        status: bool = None
+):
+    filtros = [
+        Usuario.id_empresa == empresa_id,
+        filtro_prefixo(Usuario.nome, nome),
+        *filtros_periodo(Usuario.data_cadastro, data_inicio, data_fim)
+    ]
+    if status is not None:
+        filtros.append(Usuario.status == status)
+    return await paginar(db, Usuario, filtros, paginacao, usuario_to_dict)
+
+
+async def contar_usuarios_empresa(db: AsyncSession, empresa_id: int):
+    result = await db.execute(
+        select(func.count()).select_from(Usuario).where(Usuario.id_empresa == empresa_id)
+    )
+    return result.scalar_one()
 
 
 async def buscar_usuario_id(db: AsyncSession, usuario_id: int):
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+from contextlib import aclosing
+import json
+import logging
+import openai
+
+from app.auth2.token import get_current_user, UsuarioAutenticado
+from app.utils.recupera_empresa import recuperar_empresa
+from app.services.gptOpenAI import servico_assistente, gerenciador_threads, ErroAssistente, MENSAGEM_TIMEOUT
+
+
+class PerguntaAssistente(BaseModel):
+    pergunta: str = Field(..., min_length=1, max_length=4000)
+    id_contato: Optional[str] = None
+
+
+router = APIRouter()
+
+
+def _evento_sse(evento: dict):
+    return f"event: {evento['evento']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+async def _eventos_sse(cnpj: str, pergunta: PerguntaAssistente):
+    try:
+        thread_id = None
+        if pergunta.id_contato:
+            thread_id = await gerenciador_threads.thread_do_contato(cnpj, pergunta.id_contato)
+        async with aclosing(servico_assistente.transmitir(pergunta.pergunta, thread_id=thread_id)) as eventos:
+            async for evento in eventos:
+                yield _evento_sse(evento)
+    except (TimeoutError, openai.APITimeoutError):
+        yield _evento_sse({"evento": "erro", "mensagem": MENSAGEM_TIMEOUT})
+    except ErroAssistente as e:
+        yield _evento_sse({"evento": "erro", "mensagem": str(e)})
+    except Exception as e:
+        logging.error(f"Erro ao transmitir resposta do assistente para a empresa {cnpj}: {str(e)}")
+        yield _evento_sse({"evento": "erro", "mensagem": "Erro ao consultar o assistente."})
+
+
+# Perguntar ao Assistente (SSE)
+@router.post("/assistente/perguntar")
+async def perguntar_assistente_endpoint(
+    pergunta: PerguntaAssistente,
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
+    cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+    if not cnpj_empresa_user:
+        raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+    return StreamingResponse(
+        _eventos_sse(cnpj_empresa_user, pergunta),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,21 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
-from app.auth2.token import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from pydantic import BaseModel
+from app.auth2.token import criar_token_usuario, gerar_refresh_token, hash_refresh_token
 from app.auth2.security import authenticate_user
+from app.auth2.versoes_token import versao_usuario, versao_empresa, token_revogado
+from app.models.refresh_token import (
+    criar_refresh_token,
+    consumir_refresh_token,
+    revogar_familia_refresh_token,
+    buscar_refresh_token
+)
+from app.db.db import get_db
+import secrets
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 
 router = APIRouter()
 
 
+async def emitir_refresh_token(db, familia: str, username: str, cnpj: str, empresa_id: int, nivel_acesso: int):
+    refresh_token, token_hash, expira_em = gerar_refresh_token()
+    await criar_refresh_token(
+        db=db,
+        token_hash=token_hash,
+        familia=familia,
+        usuario=username,
+        cnpj=cnpj,
+        empresa_id=empresa_id,
+        nivel_acesso=nivel_acesso,
+        versao_token=await versao_usuario(username),
+        versao_empresa=await versao_empresa(cnpj),
+        expira_em=expira_em
+    )
+    return refresh_token
+
+
 @router.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user['usuario']},
-        expires_delta=access_token_expires
+    access_token = await criar_token_usuario(
+        username=user['usuario'],
+        cnpj=user['cnpj'],
+        empresa_id=user['empresa'],
+        nivel_acesso=user['nivel_acesso']
+    )
+
+    async with get_db('hareware') as db:
+        refresh_token = await emitir_refresh_token(
+            db, secrets.token_hex(16), user['usuario'], user['cnpj'], user['empresa'], user['nivel_acesso']
+        )
+
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/token/refresh")
+async def renovar_token(dados: RefreshTokenRequest):
+    credenciais_invalidas = HTTPException(status_code=401, detail="Refresh token inválido ou expirado.")
+    token_hash = hash_refresh_token(dados.refresh_token)
+
+    async with get_db('hareware') as db:
+        registro = await consumir_refresh_token(db, token_hash)
+
+        if registro is None:
+            reutilizado = await buscar_refresh_token(db, token_hash)
+            if reutilizado is not None and reutilizado.revogado:
+                await revogar_familia_refresh_token(db, reutilizado.familia)
+            raise credenciais_invalidas
+
+        familia, username, cnpj = registro.familia, registro.usuario, registro.cnpj
+        empresa_id, nivel_acesso = registro.empresa_id, registro.nivel_acesso
+
+        if await token_revogado(username, cnpj, registro.versao_token, registro.versao_empresa):
+            await revogar_familia_refresh_token(db, familia)
+            raise credenciais_invalidas
+
+        refresh_token = await emitir_refresh_token(db, familia, username, cnpj, empresa_id, nivel_acesso)
+
+    access_token = await criar_token_usuario(
+        username=username,
+        cnpj=cnpj,
+        empresa_id=empresa_id,
+        nivel_acesso=nivel_acesso
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
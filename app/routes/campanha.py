@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
-from app.auth2.token import get_current_user
+from app.auth2.token import get_current_user, UsuarioAutenticado
 from pydantic import BaseModel
 from app.models.campanha import (
+    Campanha,
     criar_campanha,
     atualizar_campanha,
     deletar_campanha,
@@ -10,9 +11,12 @@ from app.models.campanha import (
     buscar_campanha_por_id
 )
 
+from app.models.envio_campanha import resumo_envios_campanha
 from app.db.db import get_db
+from app.services.disparo_campanha import motor_disparo
 from app.utils.recupera_empresa import recuperar_empresa
 from app.utils.transformadores_json import campanha_to_dict
+from app.utils.paginacao import Paginacao, parametros_paginacao
 from datetime import date
 import logging
 
@@ -29,14 +33,18 @@ class CampanhaUpdate(BaseModel):
     fim_campanha: Optional[date] = None
 
 
+class CampanhaDisparo(BaseModel):
+    numeros: Optional[list[str]] = None
+
+
 router = APIRouter()
 
 
 @router.post("/campanha/cadastrar-campanha")
-async def cadastrar_campanha(nova_campanha: CampanhaCreate, usuario_atual: dict = Depends(get_current_user)):
+async def cadastrar_campanha(nova_campanha: CampanhaCreate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f'Erro ao recuperar cnpj da empresa do usuário {str(e)}')
             return {"status": "error", "message": str(e)}
@@ -63,9 +71,9 @@ async def cadastrar_campanha(nova_campanha: CampanhaCreate, usuario_atual: dict
 
 
 @router.delete("/campanha/deletar-campanha/{campanha_id}")
-async def excluir_campanha(campanha_id: int, usuario_atual: dict = Depends(get_current_user)):
+async def excluir_campanha(campanha_id: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -81,9 +89,9 @@ async def excluir_campanha(campanha_id: int, usuario_atual: dict = Depends(get_c
 
 
 @router.patch("/campanha/atualizar-campanha/{id_campanha}")
-async def editar_campanha(id_campanha: int, dados_campanha: CampanhaUpdate, usuario_atual: dict = Depends(get_current_user)):
+async def editar_campanha(id_campanha: int, dados_campanha: CampanhaUpdate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -103,9 +111,9 @@ async def editar_campanha(id_campanha: int, dados_campanha: CampanhaUpdate, usua
 
 
 @router.get("/campanha/pesquisar-campanha/{id-campanha}")
-async def pesquisar_campanha(id_campanha: int, usuario_atual: dict = Depends(get_current_user)):
+async def pesquisar_campanha(id_campanha: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -123,18 +131,62 @@ async def pesquisar_campanha(id_campanha: int, usuario_atual: dict = Depends(get
 
 
 @router.get("/campanha/visualizar-campanhas")
-async def visualizar_campanhas(usuario_atual: dict = Depends(get_current_user)):
+async def visualizar_campanhas(
+    nome: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(Campanha.__table__.columns.keys())),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
 
         async with get_db(cnpj_empresa_user) as db:
-            campanhas = await listar_campanhas(db=db)
-            return {"status": "success", "campanha": campanhas}
+            pagina = await listar_campanhas(
+                db=db, paginacao=paginacao, nome=nome, data_inicio=data_inicio, data_fim=data_fim
+            )
+            return {"status": "success", "campanha": pagina.itens, "proximo_cursor": pagina.proximo_cursor}
     except HTTPException as e:
         logging.error(f"Erro ao listar campanhas: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao listar campanhas.")
 
 
+@router.post("/campanha/disparar-campanha/{id_campanha}")
+async def disparar_campanha(id_campanha: int, dados_disparo: CampanhaDisparo, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
+    try:
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+        if not cnpj_empresa_user:
+            raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+        envios = await motor_disparo.disparar_campanha(cnpj_empresa_user, id_campanha, dados_disparo.numeros)
+
+        if envios is None:
+            raise HTTPException(status_code=404, detail="Campanha não encontrada.")
+        return {"status": "success", "envios_agendados": envios}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao disparar campanha: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao disparar campanha.")
+
+
+@router.get("/campanha/status-disparo/{id_campanha}")
+async def status_disparo_campanha(id_campanha: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
+    try:
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+        if not cnpj_empresa_user:
+            raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+        async with get_db(cnpj_empresa_user) as db:
+            resumo = await resumo_envios_campanha(db=db, campanha_id=id_campanha)
+            return {"status": "success", "envios": resumo}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao consultar status do disparo: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao consultar status do disparo.")
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, Literal
+from fastapi.responses import StreamingResponse
 
-from sqlalchemy.testing.pickleable import User
-
-from app.auth2.token import get_current_user
-from pydantic import BaseModel
+from app.auth2.token import get_current_user, UsuarioAutenticado
+from pydantic import BaseModel, Field
 
 from app.models.campanha_produto import (
+    CampanhaProduto,
     criar_campanha_produto,
+    aplicar_lote_campanha_produto,
     atualizar_campanha_produto,
     deletar_campanha_produto,
     listar_todos_campanha_produto,
@@ -18,6 +19,8 @@ from app.models.campanha_produto import (
 from app.db.db import get_db
 from app.utils.recupera_empresa import recuperar_empresa
 from app.utils.transformadores_json import campanha_produto_to_dict
+from app.utils.paginacao import Paginacao, parametros_paginacao
+from app.utils.exportacao import exportar, FORMATOS_EXPORTACAO
 import logging
 
 
@@ -35,14 +38,25 @@ class CampanhaProdutoUpdate(BaseModel):
     frequencia_exibicao: Optional[int] = None
 
 
+class ItemLoteCampanhaProduto(BaseModel):
+    produto_id: int
+    valor_promocional: Optional[float] = Field(None, ge=0)
+    frequencia_exibicao: Optional[int] = Field(None, ge=0)
+    remover: bool = False
+
+
+class CampanhaProdutoLote(BaseModel):
+    itens: list[ItemLoteCampanhaProduto] = Field(..., min_length=1, max_length=1000)
+
+
 router = APIRouter()
 
 
 @router.post("/campanha-produto/incluir-produto-campanha")
-async def incluir_produto_campanha(novo_produto_campanha: CampanhaProdutoCreate, usuario_atual: dict = Depends(get_current_user)):
+async def incluir_produto_campanha(novo_produto_campanha: CampanhaProdutoCreate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f'Erro ao recuperar cnpj da empresa do usuário {str(e)}')
             return {"status": "error", "message": str(e)}
@@ -69,10 +83,31 @@ async def incluir_produto_campanha(novo_produto_campanha: CampanhaProdutoCreate,
         return {"status": "error", "message": str(e)}
 
 
+@router.post("/campanha-produto/aplicar-lote-campanha/{campanha_id}")
+async def aplicar_lote_produtos_campanha(campanha_id: int, lote: CampanhaProdutoLote, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
+    try:
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+        if not cnpj_empresa_user:
+            raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+        async with get_db(cnpj_empresa_user) as db:
+            resultados = await aplicar_lote_campanha_produto(
+                db=db, campanha_id=campanha_id, itens=[item.model_dump() for item in lote.itens]
+            )
+    except Exception as e:
+        logging.error(f'Erro ao aplicar lote de produtos na campanha: {str(e)}')
+        return {"status": "error", "message": str(e)}
+
+    if resultados is None:
+        raise HTTPException(status_code=404, detail="Campanha não encontrada.")
+    return {"status": "success", "resultados": resultados}
+
+
 @router.delete("/campanha-produto/deletar-produto-campanha/{campanha_produto_id}")
-async def deletar_produto_campanha(campanha_produto_id: int, usuario_atual: dict = Depends(get_current_user)):
+async def deletar_produto_campanha(campanha_produto_id: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='CNPJ da empresa não encontrado.')
@@ -88,9 +123,9 @@ async def deletar_produto_campanha(campanha_produto_id: int, usuario_atual: dict
 
 
 @router.patch("/campanha-produto/atualizar-produto-campanha/{campanha_produto_id}")
-async def editar_produto_campanha(campanha_produto_id: int, dados_produto_campanha: CampanhaProdutoUpdate, usuario_atual: dict = Depends(get_current_user)):
+async def editar_produto_campanha(campanha_produto_id: int, dados_produto_campanha: CampanhaProdutoUpdate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='CNPJ da empresa não encontrada.')
@@ -115,25 +150,32 @@ async def editar_produto_campanha(campanha_produto_id: int, dados_produto_campan
 
 
 @router.get("/campanha_produto/visualizar_campanhas_produtos")
-async def visualizar_campanhas_produtos(usuario_atual: dict = Depends(get_current_user)):
+async def visualizar_campanhas_produtos(
+    campanha_id: Optional[int] = Query(None),
+    produto_id: Optional[int] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(CampanhaProduto.__table__.columns.keys())),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
 
         async with get_db(cnpj_empresa_user) as db:
-            campanhas_produtos = await listar_todos_campanha_produto(db=db)
-            return {"status": "success", "campanhas_produtos": campanhas_produtos}
+            pagina = await listar_todos_campanha_produto(
+                db=db, paginacao=paginacao, campanha_id=campanha_id, produto_id=produto_id
+            )
+            return {"status": "success", "campanhas_produtos": pagina.itens, "proximo_cursor": pagina.proximo_cursor}
     except HTTPException as e:
         logging.error(f"Erro ao listar os produtos de todas as campanhas: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao listar os produtos de todas as campanhas.")
 
 
 @router.get("/campanha_produto/visualizar_produtos_campanha/{campanha_id}")
-async def visualizar_produtos_campanha(campanha_id: int, usuario_atual: dict = Depends(get_current_user)):
+async def visualizar_produtos_campanha(campanha_id: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await  recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await  recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -147,9 +189,9 @@ async def visualizar_produtos_campanha(campanha_id: int, usuario_atual: dict = D
 
 
 @router.get("/campanha_produto/visualizar_campanhas_produto/{produto_id}")
-async def visualizar_campanhas_produto(produto_id: int, usuario: User = Depends(get_current_user)):
+async def visualizar_campanhas_produto(produto_id: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -161,3 +203,28 @@ async def visualizar_campanhas_produto(produto_id: int, usuario: User = Depends(
         logging.error(f"Erro listar campanhas do produto: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao listar campanhas do produto.")
 
+
+
+@router.get("/campanha_produto/exportar")
+async def exportar_campanhas_produtos(
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    campanha_id: Optional[int] = Query(None),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
+    cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+    if not cnpj_empresa_user:
+        raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+    filtros = []
+    if campanha_id is not None:
+        filtros.append(CampanhaProduto.campanha_id == campanha_id)
+
+    return StreamingResponse(
+        exportar(
+            cnpj_empresa_user, formato, CampanhaProduto, campanha_produto_to_dict,
+            CampanhaProduto.__table__.columns.keys(), filtros
+        ),
+        media_type=FORMATOS_EXPORTACAO[formato],
+        headers={"Content-Disposition": f'attachment; filename="campanhas_produtos.{formato}"'}
+    )
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from app.auth2.token import get_current_user
+from app.auth2.token import get_current_user, UsuarioAutenticado
 from app.auth2.security import get_password_hash
 from pydantic import BaseModel
-from app.models.contrato import criar_contrato, atualizar_contrato, deletar_contrato, buscar_contrato, buscar_contrato_formatado, listar_contratos, buscar_contratos_empresa, buscar_contratos_empresa_formatado, listar_contratos_formatados
+from app.models.contrato import Contrato, criar_contrato, atualizar_contrato, deletar_contrato, buscar_contrato, buscar_contrato_formatado, listar_contratos, buscar_contratos_empresa, buscar_contratos_empresa_formatado, listar_contratos_formatados
 from app.db.db import get_db
 from datetime import datetime, date, timedelta
 from app.utils.transformadores_json import contrato_to_dict
+from app.utils.paginacao import Paginacao, parametros_paginacao
 from typing import Optional
 import logging
 
@@ -29,7 +30,7 @@ router = APIRouter()
 
 
 @router.post("/contrato/cadastrar-contrato")
-async def cadastrar_contrato(novo_contrato: ContratoCreate, usuario_atual: dict = Depends(get_current_user)):
+async def cadastrar_contrato(novo_contrato: ContratoCreate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             data_atual = date.today()
@@ -53,7 +54,7 @@ async def cadastrar_contrato(novo_contrato: ContratoCreate, usuario_atual: dict
 
 
 @router.delete("/contrato/deletar-contrato/{id_contrato}")
-async def deletar_contrato(id_contrato: int, usuario_atual: dict = Depends(get_current_user)):
+async def deletar_contrato(id_contrato: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -81,7 +82,7 @@ async def deletar_contrato(id_contrato: int, usuario_atual: dict = Depends(get_c
 
 
 @router.patch("/contrato/editar-contrato/{id_contrato}")
-async def editar_contrato(id_contrato: int, dados: ContratoUpdate, usuario_atual: dict = Depends(get_current_user)):
+async def editar_contrato(id_contrato: int, dados: ContratoUpdate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -121,7 +122,7 @@ async def editar_contrato(id_contrato: int, dados: ContratoUpdate, usuario_atual
 
 
 @router.get("/contrato/pesquisar-contrato/{id_contrato}")
-async def pesquisar_contrato(id_contrato: int, usuario_atual: dict = Depends(get_current_user)):
+async def pesquisar_contrato(id_contrato: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -140,7 +141,7 @@ async def pesquisar_contrato(id_contrato: int, usuario_atual: dict = Depends(get
 
 
 @router.get("/contrato/pesquisar-contratos-empresa/{id_empresa}")
-async def pesquisar_contrato_empresa(id_empresa: int, usuario_atual: dict = Depends(get_current_user)):
+async def pesquisar_contrato_empresa(id_empresa: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -159,11 +160,26 @@ async def pesquisar_contrato_empresa(id_empresa: int, usuario_atual: dict = Depe
 
 
 @router.get("/contrato/visualizar-contratos")
-async def visualizar_contratos_empresa(usuario_atual: dict = Depends(get_current_user)):
+async def visualizar_contratos_empresa(
+    response: Response,
+    empresa_id: Optional[int] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    status: Optional[bool] = Query(None),
+    pago: Optional[bool] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(Contrato.__table__.columns.keys())),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     async with get_db('hareware') as db:
         try:
             try:
-                contratos = await listar_contratos_formatados(db)
+                pagina = await listar_contratos_formatados(
+                    db, paginacao=paginacao, empresa_id=empresa_id, data_inicio=data_inicio,
+                    data_fim=data_fim, status=status, pago=pago
+                )
+                contratos = pagina.itens
+                if pagina.proximo_cursor is not None:
+                    response.headers["X-Proximo-Cursor"] = str(pagina.proximo_cursor)
             except Exception as e:
                 logging.error(f"Erro ao buscar contrato: {str(e)}")
                 return {"status": "error", "message": str(e)}
@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 from datetime import date
 
-from app.auth2.token import get_current_user
+from app.auth2.token import get_current_user, UsuarioAutenticado
 from app.models.empresa import (
+    Empresa,
     criar_empresa,
     buscar_empresa_cnpj,
     listar_empresas,
     deletar_empresa_cnpj,
     atualizar_empresa_cnpj
 )
-from app.db.db import get_db
+from app.models.banco_empresa import criar_banco_empresa, deletar_banco_empresa
+from app.db.db import get_db, montar_database_url
 from app.utils.validador_cnpj import validar_cnpj
 from app.utils.transformadores_json import empresa_to_dict
+from app.utils.paginacao import Paginacao, parametros_paginacao
 import logging
 
 
@@ -40,7 +43,7 @@ router = APIRouter()
 
 
 @router.post("/empresa/cadastrar-empresa")
-async def cadastrar_empresa(nova_empresa: EmpresaCreate, usuario_atual: dict = Depends(get_current_user)):
+async def cadastrar_empresa(nova_empresa: EmpresaCreate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             data_atual = date.today()
@@ -61,6 +64,11 @@ async def cadastrar_empresa(nova_empresa: EmpresaCreate, usuario_atual: dict = D
             )
 
             if nova_empresa_obj is not None:
+                await criar_banco_empresa(
+                    db=db,
+                    cnpj=nova_empresa_obj.cnpj,
+                    dsn=montar_database_url(nova_empresa_obj.cnpj)
+                )
                 nova_empresa_dict = empresa_to_dict(nova_empresa_obj)
                 return {"status": "success", "empresa": nova_empresa_dict}
             else:
@@ -71,13 +79,14 @@ async def cadastrar_empresa(nova_empresa: EmpresaCreate, usuario_atual: dict = D
 
 
 @router.delete("/empresa/deletar-empresa/{cnpj}")
-async def deletar_empresa(cnpj: str, usuario_atual: dict = Depends(get_current_user)):
+async def deletar_empresa(cnpj: str, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             empresa = await buscar_empresa_cnpj(db=db, cnpj=cnpj)
             if empresa:
                 sucesso = await deletar_empresa_cnpj(db=db, cnpj=cnpj)
                 if sucesso:
+                    await deletar_banco_empresa(db=db, cnpj=cnpj)
                     return {"status": "success"}
                 else:
                     return {"status": "error", "message": "Erro ao deletar empresa."}
@@ -89,7 +98,7 @@ async def deletar_empresa(cnpj: str, usuario_atual: dict = Depends(get_current_u
 
 
 @router.patch("/empresa/editar-empresa/{cnpj}")
-async def editar_empresa(cnpj: str, dados: EmpresaUpdate, usuario_atual: dict = Depends(get_current_user)):
+async def editar_empresa(cnpj: str, dados: EmpresaUpdate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             empresa_existente = await buscar_empresa_cnpj(db=db, cnpj=cnpj)
@@ -118,7 +127,7 @@ async def editar_empresa(cnpj: str, dados: EmpresaUpdate, usuario_atual: dict =
 
 
 @router.get("/empresa/pesquisar-empresa/{cnpj}")
-async def visualizar_empresa(cnpj: str, usuario_atual: dict = Depends(get_current_user)):
+async def visualizar_empresa(cnpj: str, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             empresa = await buscar_empresa_cnpj(db=db, cnpj=cnpj)
@@ -132,11 +141,20 @@ async def visualizar_empresa(cnpj: str, usuario_atual: dict = Depends(get_curren
 
 
 @router.get("/empresa/listar")
-async def listar_empresas_route(usuario_atual: dict = Depends(get_current_user)):
+async def listar_empresas_route(
+    nome: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    status: Optional[bool] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(Empresa.__table__.columns.keys())),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     async with get_db('hareware') as db:
         try:
-            empresas = await listar_empresas(db=db)
-            return {"status": "success", "empresas": empresas}
+            pagina = await listar_empresas(
+                db=db, paginacao=paginacao, nome=nome, data_inicio=data_inicio, data_fim=data_fim, status=status
+            )
+            return {"status": "success", "empresas": pagina.itens, "proximo_cursor": pagina.proximo_cursor}
         except Exception as e:
             logging.error(f"Erro ao listar empresas: {str(e)}")
             return {"status": "error", "message": str(e)}
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.auth2.token import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from app.auth2.token import get_current_user, UsuarioAutenticado
 from pydantic import BaseModel
-from app.services.join_wpp import criar_instancia_jd, verificar_status_conexao_jd, deslogar_instancia_jd, configurar_webhook_jd
+from app.services.join_wpp import criar_instancia_jd, verificar_status_conexao_jd, deslogar_instancia_jd, configurar_webhook_jd, JD_WEBHOOK_SEGREDO
+from app.services.webhook_join import processador_webhook, ErroWebhook
 from datetime import datetime, date, timedelta
 from app.db.db import get_db
 from typing import Optional
 from app.utils.recupera_empresa import recuperar_empresa
+import hmac
+import json
 import logging
 
 
 router = APIRouter()
 
+if not JD_WEBHOOK_SEGREDO:
+    logging.error("JOIN_WEBHOOK_SEGREDO não configurado: o webhook da JoinDeveloper recusará todos os eventos.")
+
 
 @router.post("/join_wpp/criar-instancia")
-async def criar_instancia(usuario_atual: dict = Depends(get_current_user)):
+async def criar_instancia(usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f'Erro ao recuperar CNPJ da empresa do usuário: {str(e)}')
             return {"status": "error", "message": str(e)}
@@ -24,19 +31,19 @@ async def criar_instancia(usuario_atual: dict = Depends(get_current_user)):
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='Erro ao encontrar CNPJ da empresa correspondente.')
 
-        qr_code = criar_instancia_jd(cnpj_empresa_user)
+        qr_code = await criar_instancia_jd(cnpj_empresa_user)
 
-        return qr_code
+        return qr_code.para_dict()
     except Exception as e:
         logging.error(f'Erro ao criar instancia do WhatsApp da empresa: {str(e)}')
         return {"status": "error", "message": str(e)}
 
 
-@router.post("join_wpp/configurar-webhook")
-async def configurar_webhook(usuario_atual: dict = Depends(get_current_user)):
+@router.post("/join_wpp/configurar-webhook")
+async def configurar_webhook(usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f'Erro ao recuperar CNPJ da empresa do usuário: {str(e)}')
             return {"status": "error", "message": str(e)}
@@ -44,19 +51,19 @@ async def configurar_webhook(usuario_atual: dict = Depends(get_current_user)):
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='Erro ao CNPJ da empresa correspondente.')
 
-        webhook_return = configurar_webhook_jd(cnpj_empresa_user)
+        webhook_return = await configurar_webhook_jd(cnpj_empresa_user)
 
-        return webhook_return
+        return webhook_return.para_dict()
     except Exception as e:
         logging.error(f'Erro ao configurar webhook da instancia: {str(e)}')
         return {"status": "error", "message": str(e)}
 
 
 @router.get("/join_wpp/verificar-status-instancia")
-async def recuperar_instancia_jd(usuario_atual: dict = Depends(get_current_user)):
+async def recuperar_instancia_jd(usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f"Erro ao recuperar CNPJ da empresa do usuário: {str(e)}")
             return {"status": "error", "message": str(e)}
@@ -64,19 +71,19 @@ async def recuperar_instancia_jd(usuario_atual: dict = Depends(get_current_user)
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='Erro ao encontrar CNPJ da empresa correspondente.')
 
-        status_instancia = verificar_status_conexao_jd(cnpj_empresa_user)
+        status_instancia = await verificar_status_conexao_jd(cnpj_empresa_user)
 
-        return status_instancia
+        return status_instancia.para_dict()
     except Exception as e:
         logging.error(f"Erro ao criar instancia do WhatsApp da empresa: {str(e)}")
         return {"status": "error", "message": str(e)}
 
 
 @router.delete("/join_wpp/deslogar-instancia")
-async def deslogar_instancia_jd_route(usuario_atual: dict = Depends(get_current_user)):
+async def deslogar_instancia_jd_route(usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
         try:
-            cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+            cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         except Exception as e:
             logging.error(f"Erro ao recuperar CNPJ da empresa do usuário: {str(e)}")
             return {"status": "error", "message": str(e)}
@@ -84,9 +91,31 @@ async def deslogar_instancia_jd_route(usuario_atual: dict = Depends(get_current_
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='Erro ao encontrar CNPJ da empresa correspondente.')
 
-        resultado = deslogar_instancia_jd(cnpj_empresa_user)
+        resultado = await deslogar_instancia_jd(cnpj_empresa_user)
 
-        return resultado
+        return resultado.para_dict()
     except Exception as e:
         logging.error(f"Erro ao deslogar instancia do WhatsApp da empresa: {str(e)}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+
+@router.post("/webhook-join", status_code=202)
+async def receber_webhook_join(request: Request, token: Optional[str] = None):
+    if not JD_WEBHOOK_SEGREDO:
+        raise HTTPException(status_code=503, detail="Webhook não configurado.")
+    if not hmac.compare_digest(token or "", JD_WEBHOOK_SEGREDO):
+        raise HTTPException(status_code=401, detail="Token do webhook inválido.")
+
+    try:
+        payload = json.loads(await request.body())
+        aceito = processador_webhook.receber(payload)
+    except (ValueError, ErroWebhook) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not aceito:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "message": "Fila de eventos cheia."},
+            headers={"Retry-After": "1"}
+        )
+    return {"status": "success"}
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth2.token import get_current_user, UsuarioAutenticado, cache_tokens
+from app.auth2.security import pool_senhas
+from app.db.db import registro_engines, cache_database_urls
+from app.services.disparo_campanha import motor_disparo
+from app.services.agendador import agendador
+from app.services.rotacao_produtos import motor_rotacao
+from app.services.derivados_imagem import gerador_derivados
+from app.services.cache_credenciais import cache_credenciais
+from app.services.gptOpenAI import servico_assistente, gerenciador_threads
+from app.services.cache_respostas import cache_respostas
+from app.services.webhook_join import processador_webhook
+import logging
+import os
+
+METRICAS_NIVEIS_ACESSO = {
+    int(nivel) for nivel in os.getenv("METRICAS_NIVEIS_ACESSO", "").split(",") if nivel.strip()
+}
+
+router = APIRouter()
+
+if not METRICAS_NIVEIS_ACESSO:
+    logging.warning("METRICAS_NIVEIS_ACESSO não configurado: as rotas de métricas recusarão todos os usuários.")
+
+
+async def usuario_metricas(usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
+    if usuario_atual.nivel_acesso not in METRICAS_NIVEIS_ACESSO:
+        raise HTTPException(status_code=403, detail="Acesso restrito às métricas.")
+    return usuario_atual
+
+
+@router.get("/metricas/pools")
+async def metricas_pools(usuario_atual: UsuarioAutenticado = Depends(usuario_metricas)):
+    return {
+        "status": "success",
+        "gerenciador": registro_engines.metricas(),
+        "pools": registro_engines.estatisticas(),
+        "cache_database_urls": cache_database_urls.metricas()
+    }
+
+
+@router.get("/metricas/senhas")
+async def metricas_senhas(usuario_atual: UsuarioAutenticado = Depends(usuario_metricas)):
+    return {
+        "status": "success",
+        "pool_senhas": pool_senhas.metricas(),
+        "cache_tokens": cache_tokens.metricas(),
+        "cache_credenciais": cache_credenciais.metricas()
+    }
+
+
+@router.get("/metricas/disparos")
+async def metricas_disparos(usuario_atual: UsuarioAutenticado = Depends(usuario_metricas)):
+    return {"status": "success", "disparos": motor_disparo.metricas(), "agendador": agendador.metricas(),
+            "rotacao": motor_rotacao.metricas(), "derivados_imagem": gerador_derivados.metricas()}
+
+
+@router.get("/metricas/assistente")
+async def metricas_assistente(usuario_atual: UsuarioAutenticado = Depends(usuario_metricas)):
+    return {"status": "success", "assistente": servico_assistente.metricas(),
+            "threads": gerenciador_threads.metricas(), "cache_respostas": cache_respostas.metricas()}
+
+
+@router.get("/metricas/webhook")
+async def metricas_webhook(usuario_atual: UsuarioAutenticado = Depends(usuario_metricas)):
+    return {"status": "success", "webhook": processador_webhook.metricas()}
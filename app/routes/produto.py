@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Literal
+from fastapi.responses import StreamingResponse
 
-from app.auth2.token import get_current_user
+from app.auth2.token import get_current_user, UsuarioAutenticado
 from app.models.produto import (
+    Produto,
     criar_produto,
     buscar_produto,
     listar_produtos,
     deletar_produto,
-    atualizar_produto
+    atualizar_produto,
+    caminho_imagem_produto,
+    caminhos_imagem_em_uso
 )
 from app.db.db import get_db
 from app.utils.recupera_empresa import recuperar_empresa
 from app.utils.transformadores_json import produto_to_dict
-from app.services.supabase_db import upload_base64_image, delete_file
+from app.utils.paginacao import Paginacao, parametros_paginacao
+from app.utils.exportacao import exportar, FORMATOS_EXPORTACAO
+from app.services.supabase_db import upload_arquivo_stream, delete_file
+from app.services.importacao_produtos import preparar_importacao, ErroValidacao
+from app.services.derivados_imagem import gerador_derivados
+import asyncio
+import hashlib
 import logging
-import base64
 
 
 class ProdutoUpdate(BaseModel):
@@ -31,6 +40,36 @@ class ProdutoUpdate(BaseModel):
 router = APIRouter()
 
 
+def _sha256_arquivo(arquivo):
+    arquivo.seek(0)
+    resumo = hashlib.sha256()
+    for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+        resumo.update(bloco)
+    arquivo.seek(0)
+    return resumo.hexdigest()
+
+
+async def _enviar_imagem_produto(cnpj: str, imagem: UploadFile):
+    sha256 = await asyncio.to_thread(_sha256_arquivo, imagem.file)
+    upload = await upload_arquivo_stream(
+        arquivo=imagem,
+        file_name=caminho_imagem_produto(cnpj, sha256, imagem.filename),
+        bucket_name="hareblast",
+        content_type=imagem.content_type,
+        overwrite=True
+    )
+    if upload['status'] != 'success':
+        raise HTTPException(status_code=502, detail=f"Erro ao enviar imagem: {upload['message']}")
+    return upload
+
+
+async def _remover_imagens_sem_uso(db, caminhos):
+    caminhos = set(caminho for caminho in caminhos if caminho)
+    caminhos -= await caminhos_imagem_em_uso(db, caminhos)
+    if caminhos:
+        await delete_file('hareblast', list(caminhos))
+
+
 # Cadastrar Produto
 @router.post("/produto/cadastrar-produto")
 async def cadastrar_produto(
@@ -42,25 +81,14 @@ async def cadastrar_produto(
     qtd_estoque: int = Form(...),
     link: str = Form(...),
     imagem1: UploadFile = File(...),
-    usuario_atual: dict = Depends(get_current_user)
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
 ):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail='Erro ao encontrar o cnpj da empresa correspondente.')
 
-        conteudo_binario_i1 = await imagem1.read()
-
-        imagem1_b64 = base64.b64encode(conteudo_binario_i1).decode("utf-8")
-
-        upload_img1 = await upload_base64_image(
-            base64_string=imagem1_b64,
-            file_name=imagem1.filename,
-            bucket_name="hareblast",
-            storage_path=f"produtos/{cnpj_empresa_user}",
-            content_type=imagem1.content_type,
-            overwrite=True
-        )
+        upload_img1 = await _enviar_imagem_produto(cnpj_empresa_user, imagem1)
 
         async with get_db(cnpj_empresa_user) as db:
             try:
@@ -80,11 +108,15 @@ async def cadastrar_produto(
                     path_imagem2=None,
                     path_imagem3=None
                 )
-                produto_dict = produto_to_dict(produto)
-                return {"status": "success", "produto": produto_dict}
             except Exception as e:
                 logging.error(f'Erro ao cadastrar produto: {str(e)}')
+                await db.rollback()
+                await _remover_imagens_sem_uso(db, [upload_img1['path']])
                 raise HTTPException(status_code=500, detail='Erro ao cadastrar produto.')
+            produto_dict = produto_to_dict(produto)
+
+        gerador_derivados.agendar(upload_img1)
+        return {"status": "success", "produto": produto_dict}
     except HTTPException as e:
         logging.info(f"Erro ao processar a requisição: {str(e)}")
         return {"status": "error", "message": str(e.detail)}
@@ -92,27 +124,30 @@ async def cadastrar_produto(
 
 # Deletar Produto
 @router.delete("/produto/deletar-produto/{id_produto}")
-async def deletar_produto_endpoint(id_produto: int, usuario_atual: dict = Depends(get_current_user)):
+async def deletar_produto_endpoint(id_produto: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
 
         async with get_db(cnpj_empresa_user) as db:
             produto = await buscar_produto(db, id_produto)
+            if not produto:
+                raise HTTPException(status_code=404, detail="Produto não encontrado.")
 
-            if produto.url_imagem1:
-                resultado_deletar = await delete_file('hareblast', [produto.path_imagem1])
-            if produto.url_imagem2:
-                resultado_deletar = await delete_file('hareblast', [produto.path_imagem2])
-            if produto.url_imagem3:
-                resultado_deletar = await delete_file('hareblast', [produto.path_imagem3])
+            caminhos_imagens = [
+                caminho for caminho in (produto.path_imagem1, produto.path_imagem2, produto.path_imagem3) if caminho
+            ]
 
             sucesso = await deletar_produto(db=db, produto_id=id_produto)
             if not sucesso:
                 raise HTTPException(status_code=404, detail="Produto não encontrado.")
-            return {"status": "success", "message": "Produto deletado com sucesso."}
+
+            await _remover_imagens_sem_uso(db, caminhos_imagens)
+        return {"status": "success", "message": "Produto deletado com sucesso."}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao deletar produto: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao deletar produto.")
@@ -130,63 +165,65 @@ async def atualizar_produto_endpoint(
     qtd_estoque: Optional[int] = Form(None),
     link: Optional[str] = Form(None),
     imagem1: Optional[UploadFile] = File(None),
-    usuario_atual: dict = Depends(get_current_user)
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
 ):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
 
         async with get_db(cnpj_empresa_user) as db:
+            path_anterior = None
+            url_i1 = None
+            path_i1 = None
 
             if imagem1:
-                conteudo_binario_i1 = await imagem1.read()
-                imagem1_b64 = base64.b64encode(conteudo_binario_i1).decode("utf-8")
-
                 produto_versao_atual = await buscar_produto(db, id_produto)
+                if not produto_versao_atual:
+                    raise HTTPException(status_code=404, detail="Produto não encontrado.")
+                path_anterior = produto_versao_atual.path_imagem1
 
-                if produto_versao_atual.url_imagem1:
-                    resultado_deletar = await delete_file('hareblast', produto_versao_atual.path_imagem1)
-
-                upload_img1 = await upload_base64_image(
-                    base64_string=imagem1_b64,
-                    file_name=imagem1.filename,
-                    bucket_name="hareblast",
-                    storage_path=f"produtos/{cnpj_empresa_user}",
-                    content_type=imagem1.content_type,
-                    overwrite=True
-                )
-
+                upload_img1 = await _enviar_imagem_produto(cnpj_empresa_user, imagem1)
                 url_i1 = upload_img1['public_url']
                 path_i1 = upload_img1['path']
-            else:
-                url_i1 = None
-                path_i1 = None
-
-            produto_atualizado = await atualizar_produto(
-                db=db,
-                produto_id=id_produto,
-                nome=nome,
-                descricao=descricao,
-                codigo_produto=codigo_produto,
-                unidade_medida=unidade_medida,
-                preco_venda=preco_venda,
-                qtd_estoque=qtd_estoque,
-                link=link,
-                url_imagem1=url_i1,
-                url_imagem2=None,
-                url_imagem3=None,
-                path_imagem1=path_i1,
-                path_imagem2=None,
-                path_imagem3=None
-            )
+
+            try:
+                produto_atualizado = await atualizar_produto(
+                    db=db,
+                    produto_id=id_produto,
+                    nome=nome,
+                    descricao=descricao,
+                    codigo_produto=codigo_produto,
+                    unidade_medida=unidade_medida,
+                    preco_venda=preco_venda,
+                    qtd_estoque=qtd_estoque,
+                    link=link,
+                    url_imagem1=url_i1,
+                    url_imagem2=None,
+                    url_imagem3=None,
+                    path_imagem1=path_i1,
+                    path_imagem2=None,
+                    path_imagem3=None
+                )
+            except Exception:
+                if path_i1 and path_i1 != path_anterior:
+                    await db.rollback()
+                    await _remover_imagens_sem_uso(db, [path_i1])
+                raise
 
             if not produto_atualizado:
                 raise HTTPException(status_code=404, detail="Produto não encontrado.")
 
+            if path_i1:
+                gerador_derivados.agendar(upload_img1)
+                if path_anterior and path_anterior != path_i1:
+                    await _remover_imagens_sem_uso(db, [path_anterior])
+
             produto_dict = produto_to_dict(produto_atualizado)
             return {"status": "success", "produto": produto_dict}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao atualizar produto: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao atualizar produto.")
@@ -194,9 +231,9 @@ async def atualizar_produto_endpoint(
 
 # Buscar Produto por ID
 @router.get("/produto/buscar-produto/{id_produto}")
-async def buscar_produto_endpoint(id_produto: int, usuario_atual: dict = Depends(get_current_user)):
+async def buscar_produto_endpoint(id_produto: int, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
@@ -214,16 +251,65 @@ async def buscar_produto_endpoint(id_produto: int, usuario_atual: dict = Depends
 
 # Listar Todos os Produtos
 @router.get("/produto/listar-produtos")
-async def listar_produtos_endpoint(usuario_atual: dict = Depends(get_current_user)):
+async def listar_produtos_endpoint(
+    nome: Optional[str] = Query(None),
+    codigo_produto: Optional[str] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(Produto.__table__.columns.keys())),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     try:
-        cnpj_empresa_user = await recuperar_empresa(usuario_atual['username'])
+        cnpj_empresa_user = await recuperar_empresa(usuario_atual)
 
         if not cnpj_empresa_user:
             raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
 
         async with get_db(cnpj_empresa_user) as db:
-            produtos = await listar_produtos(db=db)
-            return {"status": "success", "produtos": produtos}
+            pagina = await listar_produtos(db=db, paginacao=paginacao, nome=nome, codigo_produto=codigo_produto)
+            return {"status": "success", "produtos": pagina.itens, "proximo_cursor": pagina.proximo_cursor}
     except Exception as e:
         logging.error(f"Erro ao listar produtos: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao listar produtos.")
+
+
+# Exportar Produtos
+@router.get("/produto/exportar")
+async def exportar_produtos_endpoint(
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
+    cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+    if not cnpj_empresa_user:
+        raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+    return StreamingResponse(
+        exportar(cnpj_empresa_user, formato, Produto, produto_to_dict, Produto.__table__.columns.keys()),
+        media_type=FORMATOS_EXPORTACAO[formato],
+        headers={"Content-Disposition": f'attachment; filename="produtos.{formato}"'}
+    )
+
+
+# Importar Produtos em Lote
+@router.post("/produto/importar")
+async def importar_produtos_endpoint(
+    arquivo: UploadFile = File(...),
+    formato: Optional[Literal["csv", "ndjson"]] = Form(None),
+    imagens: Optional[UploadFile] = File(None),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
+    cnpj_empresa_user = await recuperar_empresa(usuario_atual)
+
+    if not cnpj_empresa_user:
+        raise HTTPException(status_code=400, detail="CNPJ da empresa não encontrado.")
+
+    if formato is None:
+        formato = "csv" if (arquivo.filename or "").lower().endswith(".csv") else "ndjson"
+
+    try:
+        importacao = await preparar_importacao(
+            cnpj_empresa_user, arquivo.file, formato, imagens.file if imagens else None
+        )
+    except ErroValidacao as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(importacao.eventos_ndjson(), media_type="application/x-ndjson")
@@ -1,15 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from app.auth2.token import get_current_user
-from app.auth2.security import get_password_hash
+from app.auth2.token import get_current_user, UsuarioAutenticado
+from app.auth2.security import gerar_hash_senha, PoolSenhasOcupado
 from pydantic import BaseModel, EmailStr
-from app.models.usuario import buscar_usuario, buscar_usuarios_empresa, criar_usuario, deletar_usuario, atualizar_usuario
+from app.models.usuario import CAMPOS_PUBLICOS_USUARIO, buscar_usuario, buscar_usuarios_empresa, contar_usuarios_empresa, criar_usuario, deletar_usuario, atualizar_usuario
 from app.models.empresa import buscar_empresa
 from app.models.contrato import buscar_contratos_empresa
 from app.db.db import get_db
 from datetime import datetime, date
 from app.utils.verificar_planos import verificar_planos_contrato
 from app.utils.transformadores_json import usuario_to_dict
+from app.utils.paginacao import Paginacao, parametros_paginacao
 from typing import Optional
 import logging
 
@@ -38,7 +39,7 @@ router = APIRouter()
 
 
 @router.post("/usuario/cadastrar-usuario")
-async def cadastrar_usuario(novo_usuario: UsuarioCreate, usuario_atual: dict = Depends(get_current_user)):
+async def cadastrar_usuario(novo_usuario: UsuarioCreate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -67,20 +68,18 @@ async def cadastrar_usuario(novo_usuario: UsuarioCreate, usuario_atual: dict = D
                 quantidade_usuarios_permitido = verificar_planos_contrato(contrato.plano)
 
                 try:
-                    usuarios_empresa = await buscar_usuarios_empresa(db, empresa.id)
+                    quantidade_usuarios_cadastrados = await contar_usuarios_empresa(db, empresa.id)
                 except Exception as e:
                     logging.error(f"Erro ao processar a operação de buscar usuarios pelo código de Empresa: {str(e)}")
                     return {"status": "error", "message": str(e)}
 
-                quantidade_usuarios_cadastrados = len(usuarios_empresa)
-
                 if quantidade_usuarios_cadastrados >= quantidade_usuarios_permitido:
                     return {"status": "error", "message": f"Essa Empresa já atingiu o limite de usuários cadastrados."}
 
                 data_atual = date.today()
 
                 if novo_usuario.senha is not None:
-                    senha_hash = get_password_hash(novo_usuario.senha)
+                    senha_hash = await gerar_hash_senha(novo_usuario.senha)
                 else:
                     senha_hash = None
                 status = 1
@@ -94,13 +93,15 @@ async def cadastrar_usuario(novo_usuario: UsuarioCreate, usuario_atual: dict = D
                     return {"status": "error", "message": str(e)}
             else:
                 raise HTTPException(status_code=400, detail="Empresa informada não encontrada")
+        except PoolSenhasOcupado:
+            raise
         except Exception as e:
             logging.error(f"Erro ao processar a requisição: {str(e)}")
             return {"status": "error", "message": str(e)}
 
 
 @router.delete("/usuario/excluir_usuario/{username}")
-async def excluir_usuario(username: str, usuario_atual: dict = Depends(get_current_user)):
+async def excluir_usuario(username: str, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -128,7 +129,7 @@ async def excluir_usuario(username: str, usuario_atual: dict = Depends(get_curre
 
 
 @router.patch("/usuario/editar_usuario/{username}")
-async def editar_usuario(username: str, dados: UsuarioUpdate, usuario_atual: dict = Depends(get_current_user)):
+async def editar_usuario(username: str, dados: UsuarioUpdate, usuario_atual: UsuarioAutenticado = Depends(get_current_user)):
     async with get_db('hareware') as db:
         try:
             try:
@@ -149,7 +150,7 @@ async def editar_usuario(username: str, dados: UsuarioUpdate, usuario_atual: dic
                         raise HTTPException(status_code=409, detail="Já existe um usuário com esse nome.")
 
                 if dados.senha is not None:
-                    senha_hash = get_password_hash(dados.senha)
+                    senha_hash = await gerar_hash_senha(dados.senha)
                 else:
                     senha_hash = None
 
@@ -166,13 +167,24 @@ async def editar_usuario(username: str, dados: UsuarioUpdate, usuario_atual: dic
                     return {"status": "error", "message": "Erro ao atualizar o usuário."}
             else:
                 raise HTTPException(status_code=400, detail="Usuário não encontrado.")
+        except PoolSenhasOcupado:
+            raise
         except HTTPException as e:
             logging.error(f"Erro ao processar a requisição: {str(e)}")
             return {"status": "error", "message": str(e)}
 
 
 @router.get("/usuarios/listar_usuarios_empresa/{id_empresa}")
-async def listar_usuarios_empresa(id_empresa: int, usuario_atual: dict = Depends(get_current_user)):
+async def listar_usuarios_empresa(
+    id_empresa: int,
+    response: Response,
+    nome: Optional[str] = Query(None),
+    data_inicio: Optional[date] = Query(None),
+    data_fim: Optional[date] = Query(None),
+    status: Optional[bool] = Query(None),
+    paginacao: Paginacao = Depends(parametros_paginacao(CAMPOS_PUBLICOS_USUARIO)),
+    usuario_atual: UsuarioAutenticado = Depends(get_current_user)
+):
     async with get_db('hareware') as db:
         try:
             try:
@@ -183,7 +195,13 @@ async def listar_usuarios_empresa(id_empresa: int, usuario_atual: dict = Depends
 
             if empresa:
                 try:
-                    usuarios_empresa = await buscar_usuarios_empresa(db, id_empresa)
+                    pagina = await buscar_usuarios_empresa(
+                        db, id_empresa, paginacao=paginacao, nome=nome, data_inicio=data_inicio,
+                        data_fim=data_fim, status=status
+                    )
+                    usuarios_empresa = pagina.itens
+                    if pagina.proximo_cursor is not None:
+                        response.headers["X-Proximo-Cursor"] = str(pagina.proximo_cursor)
                 except Exception as e:
                     logging.error(f"Erro ao obter usuários de empresa {str(e)}")
                     return {"status": "error", "message": str(e)}
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from app.db.db import get_db
+from app.models.agendamento_campanha_produto import listar_agendamentos_periodo, reivindicar_agendamento_campanha_produto
+from app.services.disparo_campanha import motor_disparo
+from app.utils.ambientes import listar_ambientes_empresas
+from app.utils import eventos
+
+AGENDADOR_JANELA_HORAS = int(os.getenv("AGENDADOR_JANELA_HORAS", "24"))
+AGENDADOR_TOLERANCIA_SEGUNDOS = int(os.getenv("AGENDADOR_TOLERANCIA_SEGUNDOS", "60"))
+AGENDADOR_ESPERA_RECARGA_SEGUNDOS = int(os.getenv("AGENDADOR_ESPERA_RECARGA_SEGUNDOS", "30"))
+
+
+class Agendador:
+    def __init__(self, janela: timedelta = timedelta(hours=AGENDADOR_JANELA_HORAS)):
+        self.janela = janela
+        self._heap = []
+        self._ativos = set()
+        self._sequencia = itertools.count()
+        self._acordar = asyncio.Event()
+        self._limite_janela = None
+        self._recarga_adiada_ate = datetime.min
+        self._empresas_pendentes = {}
+        self._disparos = set()
+        self.disparados = 0
+        self.cancelados = 0
+
+    def agendar(self, cnpj: str, agendamento_id: int, campanha_produto_id: int, data, hora):
+        quando = datetime.combine(data, hora)
+        chave = (cnpj, agendamento_id)
+
+        if chave in self._ativos:
+            return False
+        if self._limite_janela is None or quando > self._limite_janela:
+            return False
+        if quando < datetime.now() - timedelta(seconds=AGENDADOR_TOLERANCIA_SEGUNDOS):
+            return False
+
+        heapq.heappush(self._heap, (quando, next(self._sequencia), cnpj, agendamento_id, campanha_produto_id))
+        self._ativos.add(chave)
+        if self._heap[0][3] == agendamento_id and self._heap[0][2] == cnpj:
+            self._acordar.set()
+        return True
+
+    def cancelar(self, cnpj: str, agendamento_id: int):
+        chave = (cnpj, agendamento_id)
+        if chave in self._ativos:
+            self._ativos.discard(chave)
+            self.cancelados += 1
+
+    def ao_criar_agendamento(self, env, agendamento_id, campanha_produto_id, data, hora):
+        if env and env != "hareware":
+            self.agendar(env, agendamento_id, campanha_produto_id, data, hora)
+
+    def ao_remover_agendamento(self, env, agendamento_id):
+        if env and env != "hareware":
+            self.cancelar(env, agendamento_id)
+
+    async def carregar_janela(self, inicio: datetime, fim: datetime):
+        ambientes = await listar_ambientes_empresas()
+        self._limite_janela = fim
+        self._empresas_pendentes = {
+            cnpj: pendente for cnpj, pendente in self._empresas_pendentes.items() if cnpj in ambientes
+        }
+        carregados = 0
+
+        for cnpj in ambientes:
+            inicio_empresa = min(self._empresas_pendentes.get(cnpj, inicio), inicio)
+            try:
+                async with get_db(cnpj) as db:
+                    agendamentos = await listar_agendamentos_periodo(db, inicio_empresa.date(), fim.date())
+            except Exception as e:
+                logging.error(f"Erro ao carregar agendamentos da empresa {cnpj}: {str(e)}")
+                self._empresas_pendentes[cnpj] = inicio_empresa
+                continue
+            self._empresas_pendentes.pop(cnpj, None)
+
+            for agendamento_id, campanha_produto_id, data, hora in agendamentos:
+                if inicio_empresa < datetime.combine(data, hora) and self.agendar(cnpj, agendamento_id, campanha_produto_id, data, hora):
+                    carregados += 1
+
+        if self._empresas_pendentes:
+            self._recarga_adiada_ate = datetime.now() + timedelta(seconds=AGENDADOR_ESPERA_RECARGA_SEGUNDOS)
+        self._acordar.set()
+        return carregados
+
+    async def _recarregar(self, inicio: datetime, fim: datetime):
+        try:
+            await self.carregar_janela(inicio, fim)
+            return True
+        except Exception as e:
+            logging.error(f"Erro ao recarregar a janela de agendamentos: {str(e)}")
+            self._recarga_adiada_ate = datetime.now() + timedelta(seconds=AGENDADOR_ESPERA_RECARGA_SEGUNDOS)
+            return False
+
+    async def _disparar(self, cnpj: str, agendamento_id: int, campanha_produto_id: int):
+        try:
+            async with get_db(cnpj) as db:
+                reivindicado = await reivindicar_agendamento_campanha_produto(db, agendamento_id)
+            if not reivindicado:
+                logging.info(f"Agendamento {agendamento_id} da empresa {cnpj} já foi disparado.")
+                return
+            envios = await motor_disparo.disparar_produto(cnpj, campanha_produto_id)
+            self.disparados += 1
+            logging.info(f"Agendamento {agendamento_id} da empresa {cnpj} disparou {envios or 0} envios.")
+        except Exception as e:
+            logging.error(f"Erro ao disparar agendamento {agendamento_id} da empresa {cnpj}: {str(e)}")
+
+    async def executar(self):
+        inicio = datetime.now() - timedelta(seconds=AGENDADOR_TOLERANCIA_SEGUNDOS)
+        while not await self._recarregar(inicio, datetime.now() + self.janela):
+            await asyncio.sleep(AGENDADOR_ESPERA_RECARGA_SEGUNDOS)
+
+        while True:
+            agora = datetime.now()
+            recarga = max(self._limite_janela - self.janela / 2, self._recarga_adiada_ate)
+            if self._empresas_pendentes:
+                recarga = self._recarga_adiada_ate
+
+            if agora >= recarga:
+                await self._recarregar(self._limite_janela, agora + self.janela)
+                continue
+
+            proxima_recarga = (recarga - agora).total_seconds()
+
+            while self._heap and (self._heap[0][2], self._heap[0][3]) not in self._ativos:
+                heapq.heappop(self._heap)
+
+            if self._heap and self._heap[0][0] <= agora:
+                _, _, cnpj, agendamento_id, campanha_produto_id = heapq.heappop(self._heap)
+                self._ativos.discard((cnpj, agendamento_id))
+                tarefa = asyncio.create_task(self._disparar(cnpj, agendamento_id, campanha_produto_id))
+                self._disparos.add(tarefa)
+                tarefa.add_done_callback(self._disparos.discard)
+                continue
+
+            espera = proxima_recarga
+            if self._heap:
+                espera = min(espera, (self._heap[0][0] - agora).total_seconds())
+
+            self._acordar.clear()
+            try:
+                await asyncio.wait_for(self._acordar.wait(), max(espera, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def metricas(self):
+        return {
+            "pendentes": len(self._ativos),
+            "tamanho_heap": len(self._heap),
+            "proximo": self._heap[0][0].isoformat() if self._heap else None,
+            "limite_janela": self._limite_janela.isoformat() if self._limite_janela else None,
+            "empresas_pendentes": len(self._empresas_pendentes),
+            "disparados": self.disparados,
+            "cancelados": self.cancelados
+        }
+
+
+agendador = Agendador()
+
+eventos.registrar("agendamento_criado", agendador.ao_criar_agendamento)
+eventos.registrar("agendamento_removido", agendador.ao_remover_agendamento)
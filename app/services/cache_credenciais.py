@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Optional
+import asyncio
+import logging
+import os
+from app.db.db import get_db
+from app.models.credenciais import Credencial, buscar_credencial, listar_credenciais
+from app.utils.cache_ttl import CacheTTL
+from app.utils import eventos
+
+CREDENCIAIS_CACHE_TTL = int(os.getenv("CREDENCIAIS_CACHE_TTL", "600"))
+CREDENCIAIS_INTERVALO_RECARGA = int(os.getenv("CREDENCIAIS_INTERVALO_RECARGA", "300"))
+
+_SEM_CREDENCIAL = object()
+
+
+@dataclass(frozen=True)
+class DadosCredencial:
+    identificador_textual: str
+    url_api: Optional[str] = None
+    token_api: Optional[str] = field(default=None, repr=False)
+    instancia: Optional[str] = None
+    assistant_id: Optional[str] = None
+
+    @classmethod
+    def de_modelo(cls, credencial: Credencial):
+        return cls(
+            identificador_textual=credencial.identificador_textual,
+            url_api=credencial.url_api,
+            token_api=credencial.token_api,
+            instancia=credencial.instancia,
+            assistant_id=credencial.assistant_id
+        )
+
+
+class CacheCredenciais:
+    def __init__(self, ttl: float = CREDENCIAIS_CACHE_TTL, intervalo_recarga: float = CREDENCIAIS_INTERVALO_RECARGA):
+        self.intervalo_recarga = intervalo_recarga
+        self._cache = CacheTTL(ttl=ttl)
+        self.recargas = 0
+
+    async def _carregar(self, identificador_textual: str):
+        async with get_db('hareware') as db:
+            credencial = await buscar_credencial(db, identificador_textual)
+        if credencial is None:
+            return _SEM_CREDENCIAL
+        return DadosCredencial.de_modelo(credencial)
+
+    async def obter(self, identificador_textual: str):
+        dados = await self._cache.obter_ou_carregar(
+            identificador_textual, lambda: self._carregar(identificador_textual)
+        )
+        return None if dados is _SEM_CREDENCIAL else dados
+
+    async def carregar_todas(self):
+        async with get_db('hareware') as db:
+            credenciais = await listar_credenciais(db)
+
+        identificadores = set()
+        for credencial in credenciais:
+            self._cache.definir(credencial.identificador_textual, DadosCredencial.de_modelo(credencial))
+            identificadores.add(credencial.identificador_textual)
+        self._cache.invalidar_onde(
+            lambda chave, valor: chave not in identificadores and valor is not _SEM_CREDENCIAL
+        )
+        self.recargas += 1
+        return len(identificadores)
+
+    async def manter_atualizado(self):
+        while True:
+            try:
+                await self.carregar_todas()
+            except Exception as e:
+                logging.error(f"Erro ao recarregar cache de credenciais: {str(e)}")
+            await asyncio.sleep(self.intervalo_recarga)
+
+    def invalidar(self, identificador_textual: str = None):
+        if identificador_textual is None:
+            self._cache.limpar()
+        else:
+            self._cache.invalidar(identificador_textual)
+
+    def ao_alterar_credencial(self, identificador_textual, **_):
+        self.invalidar(identificador_textual)
+
+    def metricas(self):
+        return {**self._cache.metricas(), "recargas": self.recargas}
+
+
+cache_credenciais = CacheCredenciais()
+
+eventos.registrar("credencial_alterada", cache_credenciais.ao_alterar_credencial)
@@ -0,0 +1,241 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import hashlib
+import os
+import random
+import re
+import time
+import unicodedata
+from app.utils import eventos
+
+CACHE_RESPOSTAS_TTL = int(os.getenv("CACHE_RESPOSTAS_TTL", "3600"))
+CACHE_RESPOSTAS_MAX_ITENS = int(os.getenv("CACHE_RESPOSTAS_MAX_ITENS", "20000"))
+CACHE_RESPOSTAS_MAX_CARACTERES = int(os.getenv("CACHE_RESPOSTAS_MAX_CARACTERES", "300"))
+CACHE_RESPOSTAS_SIMILARIDADE = float(os.getenv("CACHE_RESPOSTAS_SIMILARIDADE", "0.8"))
+CACHE_RESPOSTAS_NGRAMA = int(os.getenv("CACHE_RESPOSTAS_NGRAMA", "3"))
+CACHE_RESPOSTAS_BANDAS = int(os.getenv("CACHE_RESPOSTAS_BANDAS", "16"))
+CACHE_RESPOSTAS_LINHAS_BANDA = int(os.getenv("CACHE_RESPOSTAS_LINHAS_BANDA", "4"))
+
+_PRIMO = (1 << 61) - 1
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+_NUMEROS = re.compile(r"\d+")
+TERMOS_POLARIDADE = frozenset({
+    "nao", "sem", "com", "nunca", "nem", "jamais", "nenhum", "nenhuma", "ninguem", "nada", "tambem", "so", "apenas"
+})
+
+
+def normalizar_pergunta(pergunta: str):
+    texto = unicodedata.normalize("NFKD", pergunta.lower())
+    texto = "".join(caractere for caractere in texto if not unicodedata.combining(caractere))
+    return _NAO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def ngramas(texto: str, tamanho: int = CACHE_RESPOSTAS_NGRAMA):
+    texto = f" {texto} "
+    if len(texto) <= tamanho:
+        return frozenset([texto])
+    return frozenset(texto[inicio:inicio + tamanho] for inicio in range(len(texto) - tamanho + 1))
+
+
+def numeros(texto: str):
+    return tuple(_NUMEROS.findall(texto))
+
+
+def polaridade(texto: str):
+    return frozenset(termo for termo in texto.split() if termo in TERMOS_POLARIDADE)
+
+
+def jaccard(a: frozenset, b: frozenset):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHash:
+    def __init__(self, bandas: int = CACHE_RESPOSTAS_BANDAS, linhas_banda: int = CACHE_RESPOSTAS_LINHAS_BANDA,
+                 semente: int = 1):
+        self.bandas = bandas
+        self.linhas_banda = linhas_banda
+        gerador = random.Random(semente)
+        self._coeficientes = [
+            (gerador.randrange(1, _PRIMO), gerador.randrange(0, _PRIMO))
+            for _ in range(bandas * linhas_banda)
+        ]
+
+    def assinatura(self, conjunto: frozenset):
+        valores = [
+            int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+            for item in conjunto
+        ]
+        return tuple(min((a * valor + b) % _PRIMO for valor in valores) for a, b in self._coeficientes)
+
+    def faixas(self, assinatura: tuple):
+        return [
+            (banda, assinatura[banda * self.linhas_banda:(banda + 1) * self.linhas_banda])
+            for banda in range(self.bandas)
+        ]
+
+
+@dataclass
+class _Entrada:
+    resposta: str
+    ngramas: frozenset
+    numeros: tuple
+    polaridade: frozenset
+    faixas: list
+    expira_em: float
+
+
+class CacheRespostas:
+    def __init__(
+            self,
+            ttl: float = CACHE_RESPOSTAS_TTL,
+            max_itens: int = CACHE_RESPOSTAS_MAX_ITENS,
+            similaridade: float = CACHE_RESPOSTAS_SIMILARIDADE,
+            max_caracteres: int = CACHE_RESPOSTAS_MAX_CARACTERES
+    ):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.similaridade = similaridade
+        self.max_caracteres = max_caracteres
+        self.minhash = MinHash()
+        self._entradas = OrderedDict()
+        self._indices = {}
+        self.acertos_exatos = 0
+        self.acertos_similares = 0
+        self.falhas = 0
+        self.ignoradas = 0
+        self.invalidacoes = 0
+
+    def _normalizar(self, pergunta: str):
+        if not pergunta or len(pergunta) > self.max_caracteres:
+            return None
+        return normalizar_pergunta(pergunta) or None
+
+    def _remover(self, chave: tuple):
+        entrada = self._entradas.pop(chave, None)
+        if entrada is None:
+            return
+        escopo = chave[:2]
+        indice = self._indices.get(escopo)
+        if indice is None:
+            return
+        for faixa in entrada.faixas:
+            chaves = indice.get(faixa)
+            if chaves is not None:
+                chaves.discard(chave[2])
+                if not chaves:
+                    del indice[faixa]
+        if not indice:
+            del self._indices[escopo]
+
+    def _valida(self, chave: tuple, agora: float):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada.expira_em <= agora:
+            self._remover(chave)
+            return None
+        return entrada
+
+    def _similar(self, escopo: tuple, normalizada: str, agora: float):
+        indice = self._indices.get(escopo)
+        if not indice:
+            return None
+
+        conjunto = ngramas(normalizada)
+        numeros_pergunta = numeros(normalizada)
+        polaridade_pergunta = polaridade(normalizada)
+        candidatas = set()
+        for faixa in self.minhash.faixas(self.minhash.assinatura(conjunto)):
+            candidatas.update(indice.get(faixa, ()))
+
+        melhor, melhor_similaridade = None, self.similaridade
+        for candidata in candidatas:
+            chave = (*escopo, candidata)
+            entrada = self._valida(chave, agora)
+            if entrada is None or entrada.numeros != numeros_pergunta or entrada.polaridade != polaridade_pergunta:
+                continue
+            similaridade = jaccard(conjunto, entrada.ngramas)
+            if similaridade >= melhor_similaridade:
+                melhor, melhor_similaridade = chave, similaridade
+        return melhor
+
+    def buscar(self, cnpj: str, produto_id: Optional[int], pergunta: str):
+        normalizada = self._normalizar(pergunta)
+        if normalizada is None:
+            self.ignoradas += 1
+            return None
+
+        agora = time.monotonic()
+        escopo = (cnpj, produto_id)
+        chave = (*escopo, normalizada)
+        if self._valida(chave, agora) is not None:
+            self.acertos_exatos += 1
+        else:
+            chave = self._similar(escopo, normalizada, agora)
+            if chave is None:
+                self.falhas += 1
+                return None
+            self.acertos_similares += 1
+
+        self._entradas.move_to_end(chave)
+        return self._entradas[chave].resposta
+
+    def guardar(self, cnpj: str, produto_id: Optional[int], pergunta: str, resposta: str):
+        normalizada = self._normalizar(pergunta)
+        if normalizada is None or not resposta:
+            return
+
+        escopo = (cnpj, produto_id)
+        chave = (*escopo, normalizada)
+        self._remover(chave)
+
+        conjunto = ngramas(normalizada)
+        faixas = self.minhash.faixas(self.minhash.assinatura(conjunto))
+        self._entradas[chave] = _Entrada(
+            resposta, conjunto, numeros(normalizada), polaridade(normalizada), faixas, time.monotonic() + self.ttl
+        )
+        indice = self._indices.setdefault(escopo, {})
+        for faixa in faixas:
+            indice.setdefault(faixa, set()).add(normalizada)
+
+        while len(self._entradas) > self.max_itens:
+            self._remover(next(iter(self._entradas)))
+
+    def invalidar(self, cnpj: str, produto_id: Optional[int] = None, todos_produtos: bool = False):
+        chaves = [
+            chave for chave in self._entradas
+            if chave[0] == cnpj and (todos_produtos or chave[1] == produto_id)
+        ]
+        for chave in chaves:
+            self._remover(chave)
+        self.invalidacoes += len(chaves)
+        return len(chaves)
+
+    def ao_alterar_produto(self, env, produto_id, **_):
+        if produto_id is None:
+            self.invalidar(env, todos_produtos=True)
+        else:
+            self.invalidar(env, produto_id)
+            self.invalidar(env, None)
+
+    def metricas(self):
+        acertos = self.acertos_exatos + self.acertos_similares
+        consultas = acertos + self.falhas
+        return {
+            "itens": len(self._entradas),
+            "escopos": len(self._indices),
+            "acertos_exatos": self.acertos_exatos,
+            "acertos_similares": self.acertos_similares,
+            "falhas": self.falhas,
+            "ignoradas": self.ignoradas,
+            "taxa_acerto": round(acertos / consultas, 4) if consultas else 0.0,
+            "invalidacoes": self.invalidacoes
+        }
+
+
+cache_respostas = CacheRespostas()
+
+eventos.registrar("produto_alterado", cache_respostas.ao_alterar_produto)
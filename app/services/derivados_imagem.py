@@ -0,0 +1,188 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+from app.services.armazenamento import armazenamento, ErroArmazenamento
+from app.utils.cache_ttl import CacheTTL
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+DERIVADOS_WORKERS = int(os.getenv("DERIVADOS_WORKERS", "2"))
+DERIVADOS_BUCKET = os.getenv("DERIVADOS_BUCKET", "hareblast")
+DERIVADOS_PREFIXO = os.getenv("DERIVADOS_PREFIXO", "derivados")
+DERIVADOS_CACHE_HASH_TTL = int(os.getenv("DERIVADOS_CACHE_HASH_TTL", "86400"))
+DERIVADOS_CACHE_HASH_MAX_ITENS = int(os.getenv("DERIVADOS_CACHE_HASH_MAX_ITENS", "10000"))
+
+DERIVADOS_IMAGEM = {
+    "whatsapp": {"lado_maximo": 1280, "formato": "JPEG", "qualidade": 80, "extensao": "jpg", "content_type": "image/jpeg"},
+    "miniatura": {"lado_maximo": 320, "formato": "WEBP", "qualidade": 75, "extensao": "webp", "content_type": "image/webp"}
+}
+
+
+def caminho_derivado(sha256: str, nome: str):
+    return f"{DERIVADOS_PREFIXO}/{sha256[:2]}/{sha256}/{nome}.{DERIVADOS_IMAGEM[nome]['extensao']}"
+
+
+def gerar_derivados(conteudo: bytes):
+    with Image.open(io.BytesIO(conteudo)) as original:
+        imagem = ImageOps.exif_transpose(original)
+        if imagem.mode in ("RGBA", "LA", "P"):
+            imagem = imagem.convert("RGBA")
+            fundo = Image.new("RGB", imagem.size, (255, 255, 255))
+            fundo.paste(imagem, mask=imagem.getchannel("A"))
+            imagem = fundo
+        elif imagem.mode != "RGB":
+            imagem = imagem.convert("RGB")
+
+        derivados = {}
+        for nome, configuracao in DERIVADOS_IMAGEM.items():
+            copia = imagem.copy()
+            copia.thumbnail((configuracao["lado_maximo"], configuracao["lado_maximo"]), Image.LANCZOS)
+            buffer = io.BytesIO()
+            copia.save(buffer, format=configuracao["formato"], quality=configuracao["qualidade"], optimize=True)
+            derivados[nome] = buffer.getvalue()
+        return derivados
+
+
+class GeradorDerivados:
+    def __init__(self, workers: int = DERIVADOS_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._em_andamento = {}
+        self._tarefas = set()
+        self._hashes = CacheTTL(ttl=DERIVADOS_CACHE_HASH_TTL, max_itens=DERIVADOS_CACHE_HASH_MAX_ITENS)
+        self.gerados = 0
+        self.reaproveitados = 0
+        self.falhas = 0
+
+    @property
+    def disponivel(self):
+        return Image is not None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def _existentes(self, sha256: str):
+        try:
+            nomes = set(await armazenamento.listar(DERIVADOS_BUCKET, f"{DERIVADOS_PREFIXO}/{sha256[:2]}/{sha256}"))
+        except ErroArmazenamento:
+            return False
+        return all(caminho_derivado(sha256, nome).rsplit("/", 1)[-1] in nomes for nome in DERIVADOS_IMAGEM)
+
+    async def _gerar_e_armazenar(self, sha256: str, conteudo):
+        if await self._existentes(sha256):
+            self.reaproveitados += 1
+            return None
+
+        loop = asyncio.get_running_loop()
+        derivados = await loop.run_in_executor(self.pool, gerar_derivados, bytes(conteudo))
+        await asyncio.gather(*[
+            armazenamento.enviar(
+                DERIVADOS_BUCKET, caminho_derivado(sha256, nome), dados,
+                content_type=DERIVADOS_IMAGEM[nome]["content_type"], sobrescrever=True
+            )
+            for nome, dados in derivados.items()
+        ])
+        self.gerados += 1
+        return derivados
+
+    async def processar(self, conteudo, sha256: str = None):
+        if not self.disponivel:
+            return None, None
+
+        sha256 = sha256 or hashlib.sha256(conteudo).hexdigest()
+        futuro = self._em_andamento.get(sha256)
+        if futuro is not None:
+            return sha256, await asyncio.shield(futuro)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_andamento[sha256] = futuro
+        try:
+            derivados = await self._gerar_e_armazenar(sha256, conteudo)
+            futuro.set_result(derivados)
+            return sha256, derivados
+        except BaseException as e:
+            self.falhas += 1
+            futuro.set_exception(e)
+            futuro.exception()
+            raise
+        finally:
+            del self._em_andamento[sha256]
+
+    async def _processar_armazenado(self, bucket: str, caminho: str, url: str, sha256: str):
+        try:
+            if not await self._existentes(sha256):
+                conteudo = await armazenamento.ler(bucket, caminho)
+                await self.processar(conteudo, sha256)
+            self._hashes.definir(url, sha256)
+        except Exception as e:
+            logging.error(f"Erro ao gerar derivados da imagem {caminho}: {str(e)}")
+
+    def agendar(self, upload: dict):
+        if not self.disponivel or not upload.get("sha256"):
+            return
+        self._hashes.definir(upload["public_url"], upload["sha256"])
+        tarefa = asyncio.create_task(self._processar_armazenado(
+            upload.get("bucket", DERIVADOS_BUCKET), upload["path"], upload["public_url"], upload["sha256"]
+        ))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _resolver_hash(self, url_original: str, baixar_original):
+        original = await baixar_original()
+        sha256 = hashlib.sha256(original).hexdigest()
+        if self.disponivel:
+            try:
+                await self.processar(original, sha256)
+            except Exception as e:
+                logging.error(f"Erro ao gerar derivados de {url_original}: {str(e)}")
+        return sha256
+
+    async def resolver_hash(self, url_original: str, baixar_original):
+        return await self._hashes.obter_ou_carregar(
+            url_original, lambda: self._resolver_hash(url_original, baixar_original)
+        )
+
+    async def derivado(self, sha256: str, nome: str = "whatsapp"):
+        if not self.disponivel:
+            return None
+        try:
+            return bytes(await armazenamento.ler(DERIVADOS_BUCKET, caminho_derivado(sha256, nome)))
+        except ErroArmazenamento:
+            return None
+
+    def nome_arquivo(self, nome_original: str, nome: str = "whatsapp"):
+        return f"{nome_original.rsplit('.', 1)[0]}.{DERIVADOS_IMAGEM[nome]['extensao']}"
+
+    def metricas(self):
+        return {
+            "disponivel": self.disponivel,
+            "gerados": self.gerados,
+            "reaproveitados": self.reaproveitados,
+            "falhas": self.falhas,
+            "em_andamento": len(self._em_andamento),
+            "cache_hashes": self._hashes.metricas()
+        }
+
+    async def encerrar(self):
+        for tarefa in list(self._tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+gerador_derivados = GeradorDerivados()
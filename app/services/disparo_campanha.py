@@ -0,0 +1,457 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import random
+import time
+import os
+import httpx
+from sqlalchemy.future import select
+from app.db.db import get_db
+from app.models.campanha import buscar_campanha_por_id
+from app.models.campanha_produto import CampanhaProduto
+from app.models.produto import Produto
+from app.models.destinatario_campanha import incluir_destinatarios_campanha, listar_destinatarios_campanha
+from app.models.envio_campanha import (
+    criar_envios_campanha,
+    atualizar_envios_campanha,
+    reivindicar_envios_pendentes,
+    STATUS_PENDENTE,
+    STATUS_ENVIADO,
+    STATUS_FALHOU
+)
+from app.services.join_wpp import cliente_join, montar_fragmento_midia
+from app.services.derivados_imagem import gerador_derivados
+from app.services.rotacao_produtos import motor_rotacao
+from app.utils.cache_ttl import CacheTTL
+from app.utils.cache_bytes import CacheBytes
+from app.utils.ambientes import listar_ambientes_empresas
+from app.utils import eventos
+
+DISPARO_WORKERS_POR_INSTANCIA = int(os.getenv("DISPARO_WORKERS_POR_INSTANCIA", "20"))
+DISPARO_MENSAGENS_POR_MINUTO = int(os.getenv("DISPARO_MENSAGENS_POR_MINUTO", "3000"))
+DISPARO_MAX_TENTATIVAS = int(os.getenv("DISPARO_MAX_TENTATIVAS", "5"))
+DISPARO_BACKOFF_BASE = float(os.getenv("DISPARO_BACKOFF_BASE", "2"))
+DISPARO_BACKOFF_MAXIMO = float(os.getenv("DISPARO_BACKOFF_MAXIMO", "300"))
+DISPARO_VISIBILIDADE_SEGUNDOS = int(os.getenv("DISPARO_VISIBILIDADE_SEGUNDOS", "3600"))
+DISPARO_LOTE_GRAVACAO = int(os.getenv("DISPARO_LOTE_GRAVACAO", "200"))
+DISPARO_INTERVALO_GRAVACAO = float(os.getenv("DISPARO_INTERVALO_GRAVACAO", "0.5"))
+DISPARO_CACHE_CONTEUDO_TTL = int(os.getenv("DISPARO_CACHE_CONTEUDO_TTL", "600"))
+DISPARO_CACHE_MIDIA_BYTES = int(os.getenv("DISPARO_CACHE_MIDIA_BYTES", str(256 * 1024 * 1024)))
+DISPARO_CACHE_MIDIA_DIRETORIO = os.getenv("DISPARO_CACHE_MIDIA_DIRETORIO")
+DISPARO_CACHE_MIDIA_BYTES_DISCO = int(os.getenv("DISPARO_CACHE_MIDIA_BYTES_DISCO", str(4 * 1024 * 1024 * 1024)))
+DISPARO_CACHE_DERIVADO_AUSENTE_TTL = int(os.getenv("DISPARO_CACHE_DERIVADO_AUSENTE_TTL", "60"))
+
+
+def formatar_preco(valor):
+    return f"R$ {valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def montar_mensagem_produto(produto, campanha_produto):
+    linhas = [f"*{produto.nome}*"]
+    if produto.descricao:
+        linhas.append(produto.descricao)
+    if campanha_produto.valor_promocional and campanha_produto.valor_promocional > 0:
+        linhas.append(
+            f"De {formatar_preco(produto.preco_venda)} por {formatar_preco(campanha_produto.valor_promocional)}"
+        )
+    else:
+        linhas.append(formatar_preco(produto.preco_venda))
+    if produto.link:
+        linhas.append(produto.link)
+    return "\n".join(linhas)
+
+
+def extrair_id_mensagem(dados):
+    if not isinstance(dados, dict):
+        return None
+    chave = dados.get("key")
+    if isinstance(chave, dict) and chave.get("id"):
+        return str(chave["id"])
+    return str(dados["id"]) if dados.get("id") else None
+
+
+class LimitadorTaxa:
+    def __init__(self, por_minuto: int, rajada: Optional[float] = None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = rajada or max(1.0, self.taxa)
+        self._tokens = self.capacidade
+        self._atualizado = time.monotonic()
+        self._trava = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._trava:
+            while True:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+                self._atualizado = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+@dataclass
+class TarefaEnvio:
+    envio_id: int
+    campanha_id: int
+    campanha_produto_id: Optional[int]
+    numero: str
+    tentativas: int = 0
+
+
+class InstanciaDisparo:
+    def __init__(self, cnpj: str, mensagens_por_minuto: int):
+        self.cnpj = cnpj
+        self.fila = asyncio.Queue()
+        self.limitador = LimitadorTaxa(mensagens_por_minuto)
+        self.gravacoes = []
+        self.evento_gravacao = asyncio.Event()
+        self.tarefas = []
+        self.agendadas = 0
+
+
+class MotorDisparo:
+    def __init__(
+            self,
+            workers_por_instancia: int = DISPARO_WORKERS_POR_INSTANCIA,
+            mensagens_por_minuto: int = DISPARO_MENSAGENS_POR_MINUTO,
+            max_tentativas: int = DISPARO_MAX_TENTATIVAS
+    ):
+        self.workers_por_instancia = workers_por_instancia
+        self.mensagens_por_minuto = mensagens_por_minuto
+        self.max_tentativas = max_tentativas
+        self._instancias = {}
+        self._conteudos = CacheTTL(ttl=DISPARO_CACHE_CONTEUDO_TTL)
+        self._derivados_ausentes = CacheTTL(ttl=DISPARO_CACHE_DERIVADO_AUSENTE_TTL)
+        self._midias = CacheBytes(
+            DISPARO_CACHE_MIDIA_BYTES,
+            diretorio_disco=DISPARO_CACHE_MIDIA_DIRETORIO,
+            max_bytes_disco=DISPARO_CACHE_MIDIA_BYTES_DISCO
+        )
+        self._cliente_midia = None
+        self.enviados = 0
+        self.falhas = 0
+        self.retentativas = 0
+
+    @property
+    def cliente_midia(self):
+        if self._cliente_midia is None or self._cliente_midia.is_closed:
+            self._cliente_midia = httpx.AsyncClient(timeout=30, follow_redirects=True)
+        return self._cliente_midia
+
+    def _instancia(self, cnpj: str):
+        instancia = self._instancias.get(cnpj)
+        if instancia is None:
+            instancia = InstanciaDisparo(cnpj, self.mensagens_por_minuto)
+            instancia.tarefas = [
+                asyncio.create_task(self._worker(instancia))
+                for _ in range(self.workers_por_instancia)
+            ]
+            instancia.tarefas.append(asyncio.create_task(self._gravador(instancia)))
+            self._instancias[cnpj] = instancia
+        return instancia
+
+    async def disparar_campanha(self, cnpj: str, campanha_id: int, numeros: Optional[list[str]] = None):
+        async with get_db(cnpj) as db:
+            campanha = await buscar_campanha_por_id(db, campanha_id)
+            if campanha is None:
+                return None
+
+            if numeros:
+                await incluir_destinatarios_campanha(db, campanha_id, numeros)
+
+            destinatarios = await listar_destinatarios_campanha(db, campanha_id)
+
+        rotacao = await motor_rotacao.obter(cnpj, campanha_id)
+        if not destinatarios or not len(rotacao):
+            return 0
+
+        envios = [
+            {"campanha_id": campanha_id, "campanha_produto_id": rotacao.proximo()["id"], "numero": numero}
+            for numero in destinatarios
+        ]
+
+        async with get_db(cnpj) as db:
+            ids = await criar_envios_campanha(db, envios)
+
+        self._enfileirar(cnpj, ids, envios)
+        return len(ids)
+
+    async def disparar_produto(self, cnpj: str, campanha_produto_id: int):
+        async with get_db(cnpj) as db:
+            campanha_produto = await db.get(CampanhaProduto, campanha_produto_id)
+            if campanha_produto is None:
+                return None
+
+            campanha_id = campanha_produto.campanha_id
+            destinatarios = await listar_destinatarios_campanha(db, campanha_id)
+            if not destinatarios:
+                return 0
+
+            envios = [
+                {"campanha_id": campanha_id, "campanha_produto_id": campanha_produto_id, "numero": numero}
+                for numero in destinatarios
+            ]
+            ids = await criar_envios_campanha(db, envios)
+
+        self._enfileirar(cnpj, ids, envios)
+        return len(ids)
+
+    def _enfileirar(self, cnpj: str, ids: list[int], envios: list[dict]):
+        instancia = self._instancia(cnpj)
+        for envio_id, envio in zip(ids, envios):
+            instancia.fila.put_nowait(TarefaEnvio(
+                envio_id=envio_id,
+                campanha_id=envio["campanha_id"],
+                campanha_produto_id=envio["campanha_produto_id"],
+                numero=envio["numero"]
+            ))
+
+    async def retomar(self, cnpj: str):
+        async with get_db(cnpj) as db:
+            pendentes = await reivindicar_envios_pendentes(db, DISPARO_VISIBILIDADE_SEGUNDOS)
+
+        if not pendentes:
+            return 0
+
+        instancia = self._instancia(cnpj)
+        agora = datetime.utcnow()
+        for pendente in pendentes:
+            tarefa = TarefaEnvio(
+                envio_id=pendente["id"],
+                campanha_id=pendente["campanha_id"],
+                campanha_produto_id=pendente["campanha_produto_id"],
+                numero=pendente["numero"],
+                tentativas=pendente["tentativas"]
+            )
+            if pendente["proxima_tentativa"] and pendente["proxima_tentativa"] > agora:
+                self._reagendar(instancia, tarefa, (pendente["proxima_tentativa"] - agora).total_seconds())
+            else:
+                instancia.fila.put_nowait(tarefa)
+        return len(pendentes)
+
+    async def retomar_todos(self):
+        for cnpj in await listar_ambientes_empresas():
+            try:
+                retomados = await self.retomar(cnpj)
+                if retomados:
+                    logging.info(f"{retomados} envios retomados para a empresa {cnpj}.")
+            except Exception as e:
+                logging.error(f"Erro ao retomar envios da empresa {cnpj}: {str(e)}")
+
+    async def _carregar_conteudo(self, cnpj: str, campanha_produto_id: int):
+        async with get_db(cnpj) as db:
+            result = await db.execute(
+                select(CampanhaProduto, Produto)
+                .join(Produto, CampanhaProduto.produto_id == Produto.id)
+                .where(CampanhaProduto.id == campanha_produto_id)
+            )
+            linha = result.first()
+
+        if linha is None:
+            return None
+
+        campanha_produto, produto = linha
+        return {
+            "texto": montar_mensagem_produto(produto, campanha_produto),
+            "url_imagem": produto.url_imagem1,
+            "nome_arquivo": (produto.path_imagem1 or produto.url_imagem1).rsplit("/", 1)[-1]
+            if produto.url_imagem1 else None
+        }
+
+    async def _baixar_imagem(self, url: str):
+        response = await self.cliente_midia.get(url)
+        response.raise_for_status()
+        return response.content
+
+    async def _fragmento_midia(self, conteudo: dict):
+        url = conteudo["url_imagem"]
+        try:
+            sha256 = await gerador_derivados.resolver_hash(url, lambda: self._baixar_imagem(url))
+            if not self._derivados_ausentes.obter(sha256):
+                fragmento = await self._midias.obter_ou_carregar(
+                    ("whatsapp", sha256),
+                    lambda: self._carregar_fragmento(sha256, conteudo["nome_arquivo"])
+                )
+                if fragmento is not None:
+                    return fragmento
+                self._derivados_ausentes.definir(sha256, True)
+            return await self._midias.obter_ou_carregar(
+                ("original", sha256, conteudo["nome_arquivo"]),
+                lambda: self._carregar_original(url, conteudo["nome_arquivo"])
+            )
+        except httpx.HTTPError as e:
+            logging.error(f"Erro ao baixar imagem {url}: {str(e)}")
+            return None
+
+    async def _carregar_fragmento(self, sha256: str, nome_arquivo: str):
+        dados = await gerador_derivados.derivado(sha256)
+        if dados is None:
+            return None
+        return montar_fragmento_midia(dados, gerador_derivados.nome_arquivo(nome_arquivo))
+
+    async def _carregar_original(self, url: str, nome_arquivo: str):
+        return montar_fragmento_midia(await self._baixar_imagem(url), nome_arquivo)
+
+    async def _conteudo(self, cnpj: str, campanha_produto_id: int):
+        return await self._conteudos.obter_ou_carregar(
+            (cnpj, campanha_produto_id),
+            lambda: self._carregar_conteudo(cnpj, campanha_produto_id)
+        )
+
+    def invalidar_conteudo(self, cnpj: str, campanha_produto_id: Optional[int] = None):
+        if campanha_produto_id is None:
+            self._conteudos.invalidar_onde(lambda chave, _: chave[0] == cnpj)
+        else:
+            self._conteudos.invalidar((cnpj, campanha_produto_id))
+
+    def ao_alterar_campanha_produto(self, env, campanha_produto_id, **_):
+        self.invalidar_conteudo(env, campanha_produto_id)
+
+    def ao_alterar_produto(self, env, **_):
+        self.invalidar_conteudo(env)
+
+    async def _worker(self, instancia: InstanciaDisparo):
+        while True:
+            tarefa = await instancia.fila.get()
+            try:
+                await instancia.limitador.adquirir()
+                await self._processar(instancia, tarefa)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erro ao processar envio {tarefa.envio_id}: {str(e)}")
+                self._tratar_falha(instancia, tarefa, str(e), retentavel=True)
+            finally:
+                instancia.fila.task_done()
+
+    async def _processar(self, instancia: InstanciaDisparo, tarefa: TarefaEnvio):
+        tarefa.tentativas += 1
+        conteudo = await self._conteudo(instancia.cnpj, tarefa.campanha_produto_id)
+
+        if conteudo is None:
+            self._tratar_falha(instancia, tarefa, "Produto da campanha não encontrado.", retentavel=False)
+            return
+
+        fragmento = await self._fragmento_midia(conteudo) if conteudo["url_imagem"] else None
+        if fragmento is not None:
+            resposta = await cliente_join.enviar_imagem_fragmento(
+                instancia.cnpj, tarefa.numero, fragmento, legenda=conteudo["texto"], max_tentativas=1
+            )
+        else:
+            resposta = await cliente_join.enviar_texto(
+                instancia.cnpj, tarefa.numero, conteudo["texto"], max_tentativas=1
+            )
+
+        if resposta.sucesso:
+            self.enviados += 1
+            self._registrar(instancia, {
+                "envio_id": tarefa.envio_id,
+                "status": STATUS_ENVIADO,
+                "tentativas": tarefa.tentativas,
+                "id_mensagem": extrair_id_mensagem(resposta.dados)
+            })
+        else:
+            retentavel = (
+                (resposta.status_code == 0 and not resposta.talvez_entregue)
+                or resposta.status_code == 429
+                or resposta.status_code >= 500
+            )
+            self._tratar_falha(instancia, tarefa, resposta.erro or str(resposta.dados), retentavel=retentavel)
+
+    def _tratar_falha(self, instancia: InstanciaDisparo, tarefa: TarefaEnvio, erro: str, retentavel: bool):
+        if retentavel and tarefa.tentativas < self.max_tentativas:
+            self.retentativas += 1
+            espera = random.uniform(0, min(DISPARO_BACKOFF_MAXIMO, DISPARO_BACKOFF_BASE * 2 ** tarefa.tentativas))
+            self._registrar(instancia, {
+                "envio_id": tarefa.envio_id,
+                "status": STATUS_PENDENTE,
+                "tentativas": tarefa.tentativas,
+                "proxima_tentativa": datetime.utcnow() + timedelta(seconds=espera),
+                "erro": erro
+            })
+            self._reagendar(instancia, tarefa, espera)
+        else:
+            self.falhas += 1
+            self._registrar(instancia, {
+                "envio_id": tarefa.envio_id,
+                "status": STATUS_FALHOU,
+                "tentativas": tarefa.tentativas,
+                "erro": erro
+            })
+
+    def _reagendar(self, instancia: InstanciaDisparo, tarefa: TarefaEnvio, atraso: float):
+        instancia.agendadas += 1
+
+        def reenfileirar():
+            instancia.agendadas -= 1
+            instancia.fila.put_nowait(tarefa)
+
+        asyncio.get_running_loop().call_later(atraso, reenfileirar)
+
+    def _registrar(self, instancia: InstanciaDisparo, atualizacao: dict):
+        instancia.gravacoes.append(atualizacao)
+        if len(instancia.gravacoes) >= DISPARO_LOTE_GRAVACAO:
+            instancia.evento_gravacao.set()
+
+    async def _gravar(self, instancia: InstanciaDisparo):
+        if not instancia.gravacoes:
+            return
+
+        lote, instancia.gravacoes = instancia.gravacoes, []
+        try:
+            async with get_db(instancia.cnpj) as db:
+                await atualizar_envios_campanha(db, lote)
+        except Exception as e:
+            logging.error(f"Erro ao gravar estado dos envios da empresa {instancia.cnpj}: {str(e)}")
+            instancia.gravacoes = lote + instancia.gravacoes
+
+    async def _gravador(self, instancia: InstanciaDisparo):
+        while True:
+            try:
+                await asyncio.wait_for(instancia.evento_gravacao.wait(), DISPARO_INTERVALO_GRAVACAO)
+            except asyncio.TimeoutError:
+                pass
+            instancia.evento_gravacao.clear()
+            await self._gravar(instancia)
+
+    def metricas(self):
+        return {
+            "enviados": self.enviados,
+            "falhas": self.falhas,
+            "retentativas": self.retentativas,
+            "cache_conteudo": self._conteudos.metricas(),
+            "cache_midia": self._midias.metricas(),
+            "instancias": {
+                cnpj: {
+                    "na_fila": instancia.fila.qsize(),
+                    "aguardando_retentativa": instancia.agendadas,
+                    "gravacoes_pendentes": len(instancia.gravacoes),
+                    "workers": self.workers_por_instancia
+                }
+                for cnpj, instancia in self._instancias.items()
+            }
+        }
+
+    async def encerrar(self):
+        instancias = list(self._instancias.values())
+        self._instancias.clear()
+
+        for instancia in instancias:
+            for tarefa in instancia.tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*instancia.tarefas, return_exceptions=True)
+            await self._gravar(instancia)
+
+        if self._cliente_midia is not None:
+            await self._cliente_midia.aclose()
+            self._cliente_midia = None
+        await asyncio.to_thread(self._midias.fechar)
+
+
+motor_disparo = MotorDisparo()
+
+eventos.registrar("campanha_produto_alterado", motor_disparo.ao_alterar_campanha_produto)
+eventos.registrar("produto_alterado", motor_disparo.ao_alterar_produto)
@@ -1,77 +1,385 @@
-from openai import OpenAI
-import requests
-import json
+from collections import deque
+from contextlib import aclosing
+from typing import Optional
+import asyncio
+import logging
+import os
+import httpx
+import openai
+from openai import AsyncOpenAI
 from app.db.db import get_db
-from app.models.credenciais import buscar_credencial
+from app.models.thread_contato import buscar_thread_contato, vincular_thread_contato, remover_thread_contato
+from app.services.cache_credenciais import cache_credenciais
+from app.services.cache_respostas import cache_respostas
+from app.utils.cache_ttl import CacheTTL
+from app.utils import eventos
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_TIMEOUT_CONEXAO = float(os.getenv("OPENAI_TIMEOUT_CONEXAO", "5"))
+OPENAI_MAX_CONEXOES = int(os.getenv("OPENAI_MAX_CONEXOES", "100"))
+OPENAI_MAX_CONCORRENCIA_POR_CHAVE = int(os.getenv("OPENAI_MAX_CONCORRENCIA_POR_CHAVE", "20"))
+OPENAI_ESPERA_FILA = float(os.getenv("OPENAI_ESPERA_FILA", "10"))
+OPENAI_MAX_TENTATIVAS = int(os.getenv("OPENAI_MAX_TENTATIVAS", "2"))
+OPENAI_THREADS_RESERVA = int(os.getenv("OPENAI_THREADS_RESERVA", "20"))
+OPENAI_THREADS_RESERVA_MINIMA = int(os.getenv("OPENAI_THREADS_RESERVA_MINIMA", "5"))
+OPENAI_THREADS_CACHE_TTL = int(os.getenv("OPENAI_THREADS_CACHE_TTL", "3600"))
+OPENAI_THREADS_CACHE_MAX_ITENS = int(os.getenv("OPENAI_THREADS_CACHE_MAX_ITENS", "50000"))
+
+MENSAGEM_FALHA = "Desculpa, mas meu sistema cognitivo falhou. Poderia escrever novamente sua mensagem?"
+MENSAGEM_INCOMPLETA = "Desculpa, não consegui compreender. Poderia reformular sua pergunta?"
+MENSAGEM_TIMEOUT = "Erro de conexão: O tempo de espera pela resposta da API excedeu o limite."
+MENSAGEM_OCUPADO = "Estamos com muitas conversas no momento. Poderia tentar novamente em instantes?"
+
+STATUS_FINAIS_RUN = {"completed", "failed", "incomplete", "expired", "cancelled", "requires_action"}
+
+
+class ErroAssistente(Exception):
+    pass
 
 
 async def get_credentials(code):
-    async with get_db('hareware') as db:
+    credencial = await cache_credenciais.obter(code)
+    if credencial is None:
+        raise KeyError(code)
+    return credencial.token_api, credencial.assistant_id, credencial.instancia
+
+
+class ServicoAssistente:
+    def __init__(
+            self,
+            timeout: float = OPENAI_TIMEOUT,
+            max_concorrencia_por_chave: int = OPENAI_MAX_CONCORRENCIA_POR_CHAVE,
+            espera_fila: float = OPENAI_ESPERA_FILA
+    ):
+        self.timeout = timeout
+        self.max_concorrencia_por_chave = max_concorrencia_por_chave
+        self.espera_fila = espera_fila
+        self._http = None
+        self._clientes = {}
+        self._semaforos = {}
+        self.em_andamento = 0
+        self.concluidos = 0
+        self.falhas = 0
+        self.timeouts = 0
+        self.rejeitados = 0
+
+    @property
+    def http(self):
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=OPENAI_TIMEOUT_CONEXAO),
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONEXOES,
+                    max_keepalive_connections=OPENAI_MAX_CONEXOES
+                )
+            )
+            self._clientes.clear()
+        return self._http
+
+    def cliente(self, api_key: str):
+        http = self.http
+        cliente = self._clientes.get(api_key)
+        if cliente is None:
+            cliente = AsyncOpenAI(api_key=api_key, http_client=http, max_retries=OPENAI_MAX_TENTATIVAS)
+            self._clientes[api_key] = cliente
+        return cliente
+
+    def _semaforo(self, api_key: str):
+        semaforo = self._semaforos.get(api_key)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.max_concorrencia_por_chave)
+            self._semaforos[api_key] = semaforo
+        return semaforo
+
+    async def _reservar(self, api_key: str):
+        semaforo = self._semaforo(api_key)
         try:
-            credencial = await buscar_credencial(db, code)
-            return credencial.token_api, credencial.assistant_id, credencial.instancia
-        except Exception as e:
-            return f"Erro ao buscar contrato: {str(e)}"
+            await asyncio.wait_for(semaforo.acquire(), timeout=self.espera_fila)
+        except asyncio.TimeoutError:
+            self.rejeitados += 1
+            raise ErroAssistente(MENSAGEM_OCUPADO)
+        return semaforo
 
+    @staticmethod
+    def _textos(evento):
+        for parte in evento.data.delta.content or []:
+            if parte.type == "text" and parte.text is not None and parte.text.value:
+                yield parte.text.value
 
-async def ask_to_openai(pergunta, env, id_contato):
-    try:
-        api_key, assistant_id, thread_id_hw = await get_credentials('openaiHW')
+    async def _cancelar_run(self, cliente: AsyncOpenAI, run):
+        try:
+            await cliente.beta.threads.runs.cancel(run.id, thread_id=run.thread_id)
+        except openai.OpenAIError as e:
+            logging.error(f"Erro ao cancelar run {run.id} da thread {run.thread_id}: {str(e)}")
+
+    async def transmitir(self, pergunta: str, thread_id: Optional[str] = None, codigo: str = 'openaiHW'):
+        api_key, assistant_id, _ = await get_credentials(codigo)
+        cliente = self.cliente(api_key)
+        semaforo = await self._reservar(api_key)
+        prazo = asyncio.get_running_loop().time() + self.timeout
+        run = None
+        self.em_andamento += 1
+        try:
+            if thread_id is None:
+                async with asyncio.timeout_at(prazo):
+                    thread = await cliente.beta.threads.create()
+                thread_id = thread.id
+            yield {"evento": "thread", "thread_id": thread_id}
+
+            gerenciador = cliente.beta.threads.runs.stream(
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                additional_messages=[{"role": "user", "content": pergunta}]
+            )
+            async with gerenciador as stream:
+                eventos = stream.__aiter__()
+                while True:
+                    try:
+                        async with asyncio.timeout_at(prazo):
+                            evento = await anext(eventos)
+                    except StopAsyncIteration:
+                        break
+
+                    if evento.event == "thread.message.delta":
+                        for texto in self._textos(evento):
+                            yield {"evento": "texto", "texto": texto}
+                    elif evento.event.startswith("thread.run.") and not evento.event.startswith("thread.run.step"):
+                        run = evento.data
+
+            status = run.status if run is not None else "failed"
+            if status == "requires_action":
+                await self._cancelar_run(cliente, run)
+            if status == "completed":
+                self.concluidos += 1
+            else:
+                self.falhas += 1
+            yield {"evento": "fim", "thread_id": thread_id, "status": status}
+        except TimeoutError:
+            self.timeouts += 1
+            if run is not None and run.status not in STATUS_FINAIS_RUN:
+                await self._cancelar_run(cliente, run)
+            raise
+        except openai.APITimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.falhas += 1
+            raise
+        finally:
+            self.em_andamento -= 1
+            semaforo.release()
+
+    async def perguntar(self, pergunta: str, thread_id: Optional[str] = None, codigo: str = 'openaiHW'):
+        partes, status = [], "failed"
+        async with aclosing(self.transmitir(pergunta, thread_id=thread_id, codigo=codigo)) as fluxo:
+            async for evento in fluxo:
+                if evento["evento"] == "thread":
+                    thread_id = evento["thread_id"]
+                elif evento["evento"] == "texto":
+                    partes.append(evento["texto"])
+                elif evento["evento"] == "fim":
+                    status = evento["status"]
+
+        if status == "completed":
+            return "".join(partes), thread_id, status
+        if status == "incomplete":
+            return MENSAGEM_INCOMPLETA, thread_id, status
+        if status == "failed":
+            return MENSAGEM_FALHA, thread_id, status
+        return f"Erro: {status}", thread_id, status
+
+    async def registrar_troca(self, thread_id: str, pergunta: str, resposta: str, codigo: str = 'openaiHW'):
+        api_key, _, _ = await get_credentials(codigo)
+        mensagens = self.cliente(api_key).beta.threads.messages
+        async with asyncio.timeout(self.timeout):
+            await mensagens.create(thread_id, role="user", content=pergunta)
+            await mensagens.create(thread_id, role="assistant", content=resposta)
+
+    def ao_alterar_credencial(self, **_):
+        self._clientes.clear()
+
+    async def criar_thread(self, codigo: str = 'openaiHW'):
+        api_key, _, _ = await get_credentials(codigo)
+        async with asyncio.timeout(self.timeout):
+            thread = await self.cliente(api_key).beta.threads.create()
+        return thread.id
+
+    def metricas(self):
+        return {
+            "chaves": len(self._semaforos),
+            "max_concorrencia_por_chave": self.max_concorrencia_por_chave,
+            "em_andamento": self.em_andamento,
+            "concluidos": self.concluidos,
+            "falhas": self.falhas,
+            "timeouts": self.timeouts,
+            "rejeitados": self.rejeitados
+        }
+
+    async def fechar(self):
+        self._clientes.clear()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+servico_assistente = ServicoAssistente()
+
+eventos.registrar("credencial_alterada", servico_assistente.ao_alterar_credencial)
 
-        client = OpenAI(api_key=api_key)
 
-        if thread_id_hw is None:
-            thread = client.beta.threads.create()
-            thread_id = thread.id
+class GerenciadorThreads:
+    def __init__(
+            self,
+            tamanho_reserva: int = OPENAI_THREADS_RESERVA,
+            reserva_minima: int = OPENAI_THREADS_RESERVA_MINIMA,
+            ttl: float = OPENAI_THREADS_CACHE_TTL,
+            max_itens: int = OPENAI_THREADS_CACHE_MAX_ITENS
+    ):
+        self.tamanho_reserva = tamanho_reserva
+        self.reserva_minima = min(reserva_minima, tamanho_reserva)
+        self._cache = CacheTTL(ttl=ttl, max_itens=max_itens)
+        self._reservas = {}
+        self._reabastecimentos = {}
+        self.criadas_reserva = 0
+        self.retiradas_reserva = 0
+        self.criadas_sob_demanda = 0
+
+    def _reserva(self, codigo: str):
+        reserva = self._reservas.get(codigo)
+        if reserva is None:
+            reserva = deque()
+            self._reservas[codigo] = reserva
+        return reserva
+
+    async def _reabastecer(self, codigo: str):
+        reserva = self._reserva(codigo)
+        try:
+            while len(reserva) < self.tamanho_reserva:
+                reserva.append(await servico_assistente.criar_thread(codigo))
+                self.criadas_reserva += 1
+        except Exception as e:
+            logging.error(f"Erro ao pré-criar threads do assistente {codigo}: {str(e)}")
+
+    def reabastecer(self, codigo: str = 'openaiHW'):
+        tarefa = self._reabastecimentos.get(codigo)
+        if self.tamanho_reserva <= 0 or (tarefa is not None and not tarefa.done()):
+            return tarefa
+        tarefa = asyncio.create_task(self._reabastecer(codigo))
+        self._reabastecimentos[codigo] = tarefa
+        return tarefa
+
+    async def _nova_thread(self, codigo: str):
+        reserva = self._reserva(codigo)
+        if reserva:
+            thread_id = reserva.popleft()
+            self.retiradas_reserva += 1
         else:
-            thread_id = thread_id_hw
+            thread_id = await servico_assistente.criar_thread(codigo)
+            self.criadas_sob_demanda += 1
+        if len(reserva) < self.reserva_minima:
+            self.reabastecer(codigo)
+        return thread_id
 
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=pergunta
-        )
+    async def _carregar(self, cnpj: str, id_contato: str, codigo: str):
+        async with get_db('hareware') as db:
+            thread_id = await buscar_thread_contato(db, cnpj, id_contato)
+        if thread_id is not None:
+            return thread_id
+
+        nova = await self._nova_thread(codigo)
+        async with get_db('hareware') as db:
+            thread_id = await vincular_thread_contato(db, cnpj, id_contato, nova)
 
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread_id,
-            assistant_id=assistant_id
+        if thread_id != nova:
+            self._reserva(codigo).append(nova)
+        return thread_id
+
+    async def thread_do_contato(self, cnpj: str, id_contato: str, codigo: str = 'openaiHW'):
+        return await self._cache.obter_ou_carregar(
+            (cnpj, str(id_contato)), lambda: self._carregar(cnpj, str(id_contato), codigo)
         )
 
-        if run.status == "completed":
-            messages = client.beta.threads.messages.list(thread_id=thread_id)
-            latest_message = messages.data[0]
-
-            if hasattr(latest_message, "content") and latest_message.content[0].type == "text":
-                return latest_message.content[0].text.value, thread_id
-            elif hasattr(latest_message, "content") and latest_message.content[0].type == "function_call":
-                function_call = latest_message.content[0].function_call
-                function_name = function_call.name
-                function_args = json.loads(function_call.arguments)
-
-                #if function_name == "suporte_humano":
-                #    print('Entrei no suporte humano')
-                #    reason = function_args.get("reason", "Motivo não especificado.")
-                #    resposta = await suporte_humano(env, id_contato, reason)
-                #    print(resposta)
-                #    return resposta, thread_id
-                #else:
-                #    return f"Função desconhecida: {function_name}", thread_id
-
-            return messages.data[0].content[0].text.value, thread_id
-        elif run.status == "failed":
-            return "Desculpa, mas meu sistema cognitivo falhou. Poderia escrever novamente sua mensagem?", thread_id
-        elif run.status == "incomplete":
-            return "Desculpa, não consegui compreender. Poderia reformular sua pergunta?"
-        else:
-            return f"Erro: {run.status}", thread_id
+    async def esquecer(self, cnpj: str, id_contato: str, thread_id: str = None):
+        self._cache.invalidar((cnpj, str(id_contato)))
+        async with get_db('hareware') as db:
+            await remover_thread_contato(db, cnpj, str(id_contato), thread_id)
+
+    def metricas(self):
+        return {
+            "cache": self._cache.metricas(),
+            "reservas": {codigo: len(reserva) for codigo, reserva in self._reservas.items()},
+            "tamanho_reserva": self.tamanho_reserva,
+            "criadas_reserva": self.criadas_reserva,
+            "retiradas_reserva": self.retiradas_reserva,
+            "criadas_sob_demanda": self.criadas_sob_demanda
+        }
+
+    async def encerrar(self):
+        tarefas = [tarefa for tarefa in self._reabastecimentos.values() if not tarefa.done()]
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        self._reabastecimentos.clear()
 
-    except requests.exceptions.Timeout:
-        return "Erro de conexão: O tempo de espera pela resposta da API excedeu o limite.", thread_id
-    except requests.exceptions.RequestException as e:
+
+gerenciador_threads = GerenciadorThreads()
+
+
+async def _perguntar_contato(pergunta, env, id_contato):
+    thread_id = await gerenciador_threads.thread_do_contato(env, id_contato)
+    try:
+        return await servico_assistente.perguntar(pergunta, thread_id=thread_id)
+    except openai.NotFoundError:
+        await gerenciador_threads.esquecer(env, id_contato, thread_id)
+        thread_id = await gerenciador_threads.thread_do_contato(env, id_contato)
+        return await servico_assistente.perguntar(pergunta, thread_id=thread_id)
+
+
+_registros_contexto = set()
+
+
+async def _registrar_no_contexto(pergunta, resposta, env, id_contato, thread_id):
+    try:
+        if thread_id is None:
+            thread_id = await gerenciador_threads.thread_do_contato(env, id_contato)
+        await servico_assistente.registrar_troca(thread_id, pergunta, resposta)
+    except Exception as e:
+        logging.error(f"Erro ao registrar resposta em cache na thread do contato {id_contato}: {str(e)}")
+
+
+async def responder(pergunta, env, id_contato, thread_id=None, produto_id=None):
+    resposta = cache_respostas.buscar(env, produto_id, pergunta)
+    if resposta is not None:
+        if thread_id is not None or id_contato is not None:
+            tarefa = asyncio.create_task(_registrar_no_contexto(pergunta, resposta, env, id_contato, thread_id))
+            _registros_contexto.add(tarefa)
+            tarefa.add_done_callback(_registros_contexto.discard)
+        return resposta, thread_id, "completed"
+
+    if thread_id is None and id_contato is not None:
+        resposta, thread_id, status = await _perguntar_contato(pergunta, env, id_contato)
+    else:
+        resposta, thread_id, status = await servico_assistente.perguntar(pergunta, thread_id=thread_id)
+
+    if status == "completed":
+        cache_respostas.guardar(env, produto_id, pergunta, resposta)
+    return resposta, thread_id, status
+
+
+async def ask_to_openai(pergunta, env, id_contato, thread_id=None, produto_id=None):
+    try:
+        resposta, thread_id, _ = await responder(pergunta, env, id_contato, thread_id, produto_id)
+        return resposta, thread_id
+    except (TimeoutError, openai.APITimeoutError):
+        return MENSAGEM_TIMEOUT, thread_id
+    except ErroAssistente as e:
+        return str(e), thread_id
+    except openai.APIError as e:
         return f"Erro de requisição: {str(e)}", thread_id
     except KeyError:
         return "Erro: Código do assistente inválido.", thread_id
     except Exception as e:
+        logging.error(f"Erro inesperado ao consultar o assistente para {env}/{id_contato}: {str(e)}")
         return f"Erro inesperado: {str(e)}", thread_id
 
 
@@ -102,5 +410,3 @@ async def transcrever_audio_whisper(id_contrato, caminho_arquivo):
     except Exception as e:
         return {'Erro': f"Erro inesperado: {str(e)}"}
 '''
-
-
@@ -0,0 +1,330 @@
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import zipfile
+from app.db.db import get_db
+from app.models.produto import Produto, UnidadeMedida, caminho_imagem_produto, caminhos_imagem_em_uso
+from app.services.armazenamento import armazenamento, ErroArmazenamento
+from app.services.derivados_imagem import gerador_derivados
+from app.utils.eventos import emitir
+
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))
+IMPORTACAO_UPLOADS_SIMULTANEOS = int(os.getenv("IMPORTACAO_UPLOADS_SIMULTANEOS", "8"))
+
+PRECO_MAXIMO = Decimal("99999999.99")
+UNIDADES_VALIDAS = {unidade.value for unidade in UnidadeMedida}
+
+
+class ErroValidacao(ValueError):
+    pass
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def validar_linha(registro: dict):
+    nome = _texto(registro.get("nome"))
+    codigo_produto = _texto(registro.get("codigo_produto"))
+    unidade_medida = _texto(registro.get("unidade_medida"))
+
+    if not nome:
+        raise ErroValidacao("nome é obrigatório.")
+    if not codigo_produto:
+        raise ErroValidacao("codigo_produto é obrigatório.")
+    if unidade_medida not in UNIDADES_VALIDAS:
+        raise ErroValidacao(f"unidade_medida inválida: {unidade_medida}.")
+
+    try:
+        preco_venda = Decimal(str(registro.get("preco_venda") or "0").replace(",", "."))
+    except InvalidOperation:
+        raise ErroValidacao("preco_venda inválido.")
+    if not preco_venda.is_finite() or preco_venda < 0 or preco_venda > PRECO_MAXIMO:
+        raise ErroValidacao("preco_venda fora do intervalo permitido.")
+    if preco_venda != preco_venda.quantize(Decimal("0.01")):
+        raise ErroValidacao("preco_venda aceita no máximo duas casas decimais.")
+
+    try:
+        qtd_estoque = Decimal(str(registro.get("qtd_estoque") or "0").replace(",", "."))
+    except InvalidOperation:
+        raise ErroValidacao("qtd_estoque inválido.")
+    if not qtd_estoque.is_finite() or qtd_estoque != qtd_estoque.to_integral_value():
+        raise ErroValidacao("qtd_estoque deve ser um número inteiro.")
+    if qtd_estoque < 0:
+        raise ErroValidacao("qtd_estoque não pode ser negativo.")
+
+    return {
+        "nome": nome,
+        "descricao": _texto(registro.get("descricao")),
+        "codigo_produto": codigo_produto,
+        "unidade_medida": unidade_medida,
+        "preco_venda": preco_venda,
+        "qtd_estoque": int(qtd_estoque),
+        "link": _texto(registro.get("link"))
+    }
+
+
+def ler_registros(arquivo, formato: str):
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        amostra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        for numero, registro in enumerate(csv.DictReader(texto, dialect=dialeto), start=2):
+            yield numero, registro
+    else:
+        for numero, linha in enumerate(texto, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                yield numero, None
+                continue
+            yield numero, registro if isinstance(registro, dict) else None
+
+
+def _lotes(registros, tamanho: int):
+    lote = []
+    for item in registros:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class ImportacaoProdutos:
+    def __init__(self, cnpj: str, arquivo, formato: str, imagens=None):
+        self.cnpj = cnpj
+        self.arquivo = arquivo
+        self.formato = formato
+        self._arquivo_imagens = imagens
+        self.imagens = zipfile.ZipFile(imagens) if imagens is not None else None
+        self.codigos_vistos = set()
+        self.processadas = 0
+        self.importadas = 0
+        self.erros = 0
+        self._uploads = asyncio.Semaphore(IMPORTACAO_UPLOADS_SIMULTANEOS)
+
+    def _erro(self, numero: int, mensagem: str, codigo_produto=None):
+        self.erros += 1
+        return {"evento": "erro", "linha": numero, "codigo_produto": codigo_produto, "mensagem": mensagem}
+
+    def _validar_lote(self, lote):
+        validas, erros = [], []
+        for numero, registro in lote:
+            if registro is None:
+                erros.append(self._erro(numero, "Linha mal formada."))
+                continue
+            try:
+                produto = validar_linha(registro)
+            except ErroValidacao as e:
+                erros.append(self._erro(numero, str(e), _texto(registro.get("codigo_produto"))))
+                continue
+
+            if produto["codigo_produto"] in self.codigos_vistos:
+                erros.append(self._erro(numero, "codigo_produto repetido no arquivo.", produto["codigo_produto"]))
+                continue
+            self.codigos_vistos.add(produto["codigo_produto"])
+
+            validas.append((numero, produto, _texto(registro.get("imagem"))))
+        return validas, erros
+
+    def _ler_imagem(self, nome_imagem: str):
+        conteudo = self.imagens.read(nome_imagem)
+        return conteudo, hashlib.sha256(conteudo).hexdigest()
+
+    async def _enviar_imagem(self, numero: int, produto: dict, nome_imagem: str):
+        try:
+            conteudo, sha256 = await asyncio.to_thread(self._ler_imagem, nome_imagem)
+        except KeyError:
+            return self._erro(numero, f"Imagem {nome_imagem} não encontrada no zip.", produto["codigo_produto"]), None
+
+        try:
+            async with self._uploads:
+                upload = await armazenamento.enviar(
+                    "hareblast",
+                    caminho_imagem_produto(self.cnpj, sha256, os.path.basename(nome_imagem)),
+                    conteudo,
+                    content_type=mimetypes.guess_type(nome_imagem)[0] or "image/jpeg",
+                    sobrescrever=True
+                )
+        except ErroArmazenamento as e:
+            return self._erro(numero, f"Erro ao enviar imagem: {str(e)}", produto["codigo_produto"]), None
+
+        produto["url_imagem1"] = upload["public_url"]
+        produto["path_imagem1"] = upload["path"]
+        return None, upload
+
+    async def _enviar_imagens(self, validas):
+        if self.imagens is None:
+            return validas, [], {}
+
+        pendentes = [(numero, produto, imagem) for numero, produto, imagem in validas if imagem]
+        resultados = await asyncio.gather(*[
+            self._enviar_imagem(numero, produto, imagem) for numero, produto, imagem in pendentes
+        ])
+        com_erro = {numero for (numero, _, _), (erro, _) in zip(pendentes, resultados) if erro is not None}
+        return (
+            [item for item in validas if item[0] not in com_erro],
+            [erro for erro, _ in resultados if erro is not None],
+            {numero: upload for (numero, _, _), (_, upload) in zip(pendentes, resultados) if upload is not None}
+        )
+
+    @staticmethod
+    async def _caminhos_anteriores(db, validas, uploads):
+        codigos = {produto["codigo_produto"]: numero for numero, produto, _ in validas if numero in uploads}
+        if not codigos:
+            return {}
+        result = await db.execute(
+            select(Produto.codigo_produto, Produto.path_imagem1).where(Produto.codigo_produto.in_(list(codigos)))
+        )
+        return {codigos[codigo]: caminho for codigo, caminho in result.all() if caminho}
+
+    async def _descartar_imagens(self, db, caminhos):
+        caminhos = set(caminhos)
+        if not caminhos:
+            return
+        try:
+            caminhos -= await caminhos_imagem_em_uso(db, caminhos)
+            if caminhos:
+                await armazenamento.deletar("hareblast", list(caminhos))
+        except Exception as e:
+            logging.error(f"Erro ao remover imagens não utilizadas da importação da empresa {self.cnpj}: {str(e)}")
+
+    @staticmethod
+    def _instrucao(colunas):
+        instrucao = insert(Produto)
+        return instrucao.on_conflict_do_update(
+            index_elements=[Produto.codigo_produto],
+            set_={coluna: instrucao.excluded[coluna] for coluna in colunas if coluna != "codigo_produto"}
+        )
+
+    async def _gravar(self, db, validas):
+        grupos = {}
+        for _, produto, _ in validas:
+            grupos.setdefault(tuple(produto), []).append(produto)
+
+        try:
+            for colunas, linhas in grupos.items():
+                await db.execute(self._instrucao(colunas), linhas)
+            await db.commit()
+            return len(validas), []
+        except (IntegrityError, DBAPIError):
+            await db.rollback()
+
+        gravadas, erros = 0, []
+        for numero, produto, _ in validas:
+            try:
+                async with db.begin_nested():
+                    await db.execute(self._instrucao(tuple(produto)), [produto])
+                gravadas += 1
+            except (IntegrityError, DBAPIError) as e:
+                erros.append(self._erro(numero, str(e.orig), produto["codigo_produto"]))
+        await db.commit()
+        return gravadas, erros
+
+    def _progresso(self):
+        return {
+            "evento": "progresso",
+            "processadas": self.processadas,
+            "importadas": self.importadas,
+            "erros": self.erros
+        }
+
+    async def executar(self):
+        lotes = _lotes(ler_registros(self.arquivo, self.formato), IMPORTACAO_LOTE)
+        try:
+            async with get_db(self.cnpj) as db:
+                while True:
+                    lote = await asyncio.to_thread(next, lotes, None)
+                    if lote is None:
+                        break
+
+                    self.processadas += len(lote)
+                    validas, erros = self._validar_lote(lote)
+                    validas, erros_imagem, uploads = await self._enviar_imagens(validas)
+                    erros.extend(erros_imagem)
+
+                    if validas:
+                        try:
+                            anteriores = await self._caminhos_anteriores(db, validas, uploads)
+                            gravadas, erros_gravacao = await self._gravar(db, validas)
+                        except Exception:
+                            await db.rollback()
+                            await self._descartar_imagens(db, [upload["path"] for upload in uploads.values()])
+                            raise
+                        self.importadas += gravadas
+                        erros.extend(erros_gravacao)
+
+                        falhas = {erro["linha"] for erro in erros_gravacao}
+                        descartar = []
+                        for numero, upload in uploads.items():
+                            if numero in falhas:
+                                descartar.append(upload["path"])
+                                continue
+                            if anteriores.get(numero, upload["path"]) != upload["path"]:
+                                descartar.append(anteriores[numero])
+                            gerador_derivados.agendar(upload)
+                        await self._descartar_imagens(db, descartar)
+
+                    for erro in erros:
+                        yield erro
+                    yield self._progresso()
+        except Exception as e:
+            logging.error(f"Erro ao importar produtos da empresa {self.cnpj}: {str(e)}")
+            yield {"evento": "falha", "mensagem": str(e), **self._progresso()}
+            return
+        finally:
+            self.arquivo.close()
+            if self.imagens is not None:
+                self.imagens.close()
+                self._arquivo_imagens.close()
+            if self.importadas:
+                emitir("produto_alterado", env=self.cnpj, produto_id=None)
+
+        yield {**self._progresso(), "evento": "concluido"}
+
+    async def eventos_ndjson(self):
+        async for evento in self.executar():
+            yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+
+def _copiar_para_temporario(origem):
+    destino = tempfile.TemporaryFile()
+    origem.seek(0)
+    shutil.copyfileobj(origem, destino, 1024 * 1024)
+    destino.seek(0)
+    return destino
+
+
+async def preparar_importacao(cnpj: str, arquivo, formato: str, imagens=None):
+    arquivo_local = await asyncio.to_thread(_copiar_para_temporario, arquivo)
+    imagens_local = None
+    if imagens is not None:
+        imagens_local = await asyncio.to_thread(_copiar_para_temporario, imagens)
+    try:
+        return ImportacaoProdutos(cnpj, arquivo_local, formato, imagens_local)
+    except zipfile.BadZipFile:
+        arquivo_local.close()
+        imagens_local.close()
+        raise ErroValidacao("Arquivo de imagens não é um zip válido.")
@@ -1,120 +1,289 @@
-import requests
-
-
-def criar_instancia_jd(nome_instancia, token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/instancias/criarinstancia'
-    headers = {
-        'tokenCliente': token_cliente,
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        "instancia": nome_instancia
-    }
-
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"erro": f"Erro ao criar {e}"}
-
-
-def configurar_webhook_jd(instancia, url_webhook='https://service-api.hareinteract.com.br/webhook-join', token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/webhook/configurarinstancia'
-
-    headers = {
-        'tokenCliente': token_cliente,
-        'instancia': instancia
-    }
-
-    payload = {
-        "url": url_webhook
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-
-    return response.status_code, response.json()
-
-
-def verificar_status_conexao_jd(instancia: str, token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/instancias/statusconexao'
-
-    headers = {
-        'tokenCliente': token_cliente,
-        'instancia': instancia
-    }
-
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"erro": str(e)}
-
-
-def deslogar_instancia_jd(instancia: str, token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/instancias/deslogar'
-
-    headers = {
-        'tokenCliente': token_cliente,
-        'instancia': instancia
-    }
-
-    try:
-        response = requests.delete(url, headers=headers, data='')
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"erro": str(e)}
-
-
-def enviar_imagem_jd(instancia, numero, media_base64, nome_arquivo, legenda=None, delay_ms=0,
-                  presence="composing", token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/mensagens/enviarimagem'
-
-    headers = {
-        'tokenCliente': token_cliente,
-        'instancia': instancia
-    }
-
-    payload = {
-        "number": numero,
-        "options": {
-            "delay": delay_ms,
-            "presence": presence
-        },
-        "mediaMessage": {
-            "mediatype": "image",
-            "fileName": nome_arquivo,
-            "caption": legenda or "",
-            "media": media_base64
-        }
-    }
+from dataclasses import dataclass
+from typing import Any, Optional
+import asyncio
+import base64
+import json as json_lib
+import logging
+import random
+import os
+import httpx
+from app.services.cache_credenciais import cache_credenciais
+
+URL_BASE_JD = os.getenv("JOIN_URL_BASE", "https://api-prd.joindeveloper.com.br")
+URL_WEBHOOK_JD = os.getenv("JOIN_URL_WEBHOOK", "https://service-api.hareinteract.com.br/webhook-join")
+JD_WEBHOOK_SEGREDO = os.getenv("JOIN_WEBHOOK_SEGREDO")
+TOKEN_CLIENTE_JD = os.getenv("JOIN_TOKEN_CLIENTE")
+CREDENCIAL_JD = os.getenv("JOIN_CREDENCIAL", "joinDeveloperHW")
+
+JD_TIMEOUT = float(os.getenv("JOIN_TIMEOUT", "15"))
+JD_TIMEOUT_CONEXAO = float(os.getenv("JOIN_TIMEOUT_CONEXAO", "5"))
+JD_MAX_TENTATIVAS = int(os.getenv("JOIN_MAX_TENTATIVAS", "3"))
+JD_MAX_CONEXOES = int(os.getenv("JOIN_MAX_CONEXOES", "100"))
+JD_BACKOFF_BASE = float(os.getenv("JOIN_BACKOFF_BASE", "0.5"))
+JD_BACKOFF_MAXIMO = float(os.getenv("JOIN_BACKOFF_MAXIMO", "8"))
+
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+ERROS_ANTES_DO_ENVIO = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass
+class RespostaJoin:
+    status_code: int
+    dados: Any = None
+    erro: Optional[str] = None
+    talvez_entregue: bool = False
+
+    @property
+    def sucesso(self):
+        return self.erro is None and 200 <= self.status_code < 300
+
+    def para_dict(self):
+        if self.sucesso:
+            return self.dados
+        return {"erro": self.erro or self.dados, "status_code": self.status_code}
+
+
+class ClienteJoinDeveloper:
+    def __init__(
+            self,
+            url_base: str = URL_BASE_JD,
+            token_cliente: Optional[str] = TOKEN_CLIENTE_JD,
+            credencial: str = CREDENCIAL_JD,
+            timeout: float = JD_TIMEOUT,
+            max_tentativas: int = JD_MAX_TENTATIVAS,
+            max_conexoes: int = JD_MAX_CONEXOES
+    ):
+        self.url_base = url_base
+        self.token_cliente = token_cliente
+        self.credencial = credencial
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.max_conexoes = max_conexoes
+        self._cliente = None
+
+    @property
+    def cliente(self):
+        if self._cliente is None or self._cliente.is_closed:
+            self._cliente = httpx.AsyncClient(
+                base_url=self.url_base,
+                http2=True,
+                timeout=httpx.Timeout(self.timeout, connect=JD_TIMEOUT_CONEXAO),
+                limits=httpx.Limits(
+                    max_connections=self.max_conexoes,
+                    max_keepalive_connections=self.max_conexoes
+                )
+            )
+        return self._cliente
+
+    async def _token_padrao(self):
+        try:
+            credencial = await cache_credenciais.obter(self.credencial)
+        except Exception as e:
+            logging.error(f"Erro ao buscar credencial {self.credencial} da JoinDeveloper: {str(e)}")
+            credencial = None
+        if credencial is not None and credencial.token_api:
+            return credencial.token_api
+        if not self.token_cliente:
+            logging.error(
+                f"Token da JoinDeveloper indisponível: credencial {self.credencial} ausente e JOIN_TOKEN_CLIENTE não configurado."
+            )
+        return self.token_cliente
+
+    def _espera(self, tentativa: int, resposta: Optional[httpx.Response] = None):
+        if resposta is not None:
+            retry_after = resposta.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), JD_BACKOFF_MAXIMO)
+        return random.uniform(0, min(JD_BACKOFF_MAXIMO, JD_BACKOFF_BASE * 2 ** (tentativa - 1)))
+
+    async def requisitar(
+            self,
+            metodo: str,
+            caminho: str,
+            instancia: Optional[str] = None,
+            token_cliente: Optional[str] = None,
+            json: Any = None,
+            content: Optional[bytes] = None,
+            timeout: Optional[float] = None,
+            max_tentativas: Optional[int] = None
+    ):
+        token_cliente = token_cliente or await self._token_padrao()
+        if not token_cliente:
+            return RespostaJoin(status_code=0, erro="Token da JoinDeveloper não configurado.")
+        headers = {'tokenCliente': token_cliente}
+        if instancia is not None:
+            headers['instancia'] = instancia
+        if content is not None:
+            headers['Content-Type'] = 'application/json'
+
+        extras = {}
+        if timeout is not None:
+            extras['timeout'] = timeout
+
+        max_tentativas = max_tentativas or self.max_tentativas
+        idempotente = metodo.upper() in METODOS_IDEMPOTENTES
+        for tentativa in range(1, max_tentativas + 1):
+            try:
+                response = await self.cliente.request(
+                    metodo, caminho, headers=headers, json=json, content=content, **extras
+                )
+            except httpx.HTTPError as e:
+                antes_do_envio = isinstance(e, ERROS_ANTES_DO_ENVIO)
+                if tentativa == max_tentativas or not (idempotente or antes_do_envio):
+                    logging.error(f"Erro de comunicação com a JoinDeveloper em {caminho}: {str(e)}")
+                    return RespostaJoin(
+                        status_code=0, erro=str(e) or e.__class__.__name__, talvez_entregue=not antes_do_envio
+                    )
+                await asyncio.sleep(self._espera(tentativa))
+                continue
+
+            if response.status_code in STATUS_RETENTAVEIS and tentativa < max_tentativas:
+                await asyncio.sleep(self._espera(tentativa, response))
+                continue
+
+            try:
+                dados = response.json()
+            except ValueError:
+                dados = response.text
 
-    response = requests.post(url, json=payload, headers=headers)
+            if response.is_success:
+                return RespostaJoin(status_code=response.status_code, dados=dados)
+            return RespostaJoin(status_code=response.status_code, dados=dados, erro=f"HTTP {response.status_code}")
 
-    return response.status_code, response.json()
+    async def criar_instancia(self, nome_instancia: str, token_cliente: Optional[str] = None):
+        return await self.requisitar(
+            'POST', '/instancias/criarinstancia',
+            token_cliente=token_cliente,
+            json={"instancia": nome_instancia}
+        )
 
+    async def configurar_webhook(self, instancia: str, url_webhook: str = URL_WEBHOOK_JD, token_cliente: Optional[str] = None):
+        if JD_WEBHOOK_SEGREDO:
+            url_webhook = f"{url_webhook}{'&' if '?' in url_webhook else '?'}token={JD_WEBHOOK_SEGREDO}"
+        return await self.requisitar(
+            'POST', '/webhook/configurarinstancia',
+            instancia=instancia,
+            token_cliente=token_cliente,
+            json={"url": url_webhook}
+        )
 
-def enviar_texto_jd(instancia, numero, mensagem, delay_ms=0, presence="composing", token_cliente='ea49bd3e-652d-4cfd-be9d-4aea210d73b0'):
-    url = 'https://api-prd.joindeveloper.com.br/mensagens/enviartexto'
+    async def verificar_status_conexao(self, instancia: str, token_cliente: Optional[str] = None):
+        return await self.requisitar(
+            'GET', '/instancias/statusconexao',
+            instancia=instancia,
+            token_cliente=token_cliente
+        )
 
-    headers = {
-        'tokenCliente': token_cliente,
-        'instancia': instancia
-    }
+    async def deslogar_instancia(self, instancia: str, token_cliente: Optional[str] = None):
+        return await self.requisitar(
+            'DELETE', '/instancias/deslogar',
+            instancia=instancia,
+            token_cliente=token_cliente
+        )
 
-    payload = {
-        "number": numero,
-        "options": {
-            "delay": delay_ms,
-            "presence": presence
-        },
-        "textMessage": {
-            "text": mensagem
+    async def enviar_imagem(self, instancia, numero, media_base64, nome_arquivo, legenda=None, delay_ms=0,
+                            presence="composing", token_cliente: Optional[str] = None,
+                            max_tentativas: Optional[int] = None):
+        payload = {
+            "number": numero,
+            "options": {
+                "delay": delay_ms,
+                "presence": presence
+            },
+            "mediaMessage": {
+                "mediatype": "image",
+                "fileName": nome_arquivo,
+                "caption": legenda or "",
+                "media": media_base64
+            }
         }
-    }
+        return await self.requisitar(
+            'POST', '/mensagens/enviarimagem',
+            instancia=instancia,
+            token_cliente=token_cliente,
+            json=payload,
+            max_tentativas=max_tentativas
+        )
+
+    async def enviar_imagem_fragmento(self, instancia, numero, fragmento_midia, legenda=None, delay_ms=0,
+                                      presence="composing", token_cliente: Optional[str] = None,
+                                      max_tentativas: Optional[int] = None):
+        corpo = b"".join([
+            b'{"number":', json_lib.dumps(numero).encode(),
+            b',"options":', json_lib.dumps({"delay": delay_ms, "presence": presence}).encode(),
+            b',"mediaMessage":{"mediatype":"image","caption":', json_lib.dumps(legenda or "").encode(),
+            b',', fragmento_midia, b'}}'
+        ])
+        return await self.requisitar(
+            'POST', '/mensagens/enviarimagem',
+            instancia=instancia,
+            token_cliente=token_cliente,
+            content=corpo,
+            max_tentativas=max_tentativas
+        )
+
+    async def enviar_texto(self, instancia, numero, mensagem, delay_ms=0, presence="composing",
+                           token_cliente: Optional[str] = None, max_tentativas: Optional[int] = None):
+        payload = {
+            "number": numero,
+            "options": {
+                "delay": delay_ms,
+                "presence": presence
+            },
+            "textMessage": {
+                "text": mensagem
+            }
+        }
+        return await self.requisitar(
+            'POST', '/mensagens/enviartexto',
+            instancia=instancia,
+            token_cliente=token_cliente,
+            json=payload,
+            max_tentativas=max_tentativas
+        )
+
+    async def fechar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+cliente_join = ClienteJoinDeveloper()
+
+
+def montar_fragmento_midia(conteudo: bytes, nome_arquivo: str):
+    return b"".join([
+        b'"fileName":', json_lib.dumps(nome_arquivo).encode(),
+        b',"media":"', base64.b64encode(conteudo), b'"'
+    ])
+
+
+async def criar_instancia_jd(nome_instancia, token_cliente=None):
+    return await cliente_join.criar_instancia(nome_instancia, token_cliente=token_cliente)
+
+
+async def configurar_webhook_jd(instancia, url_webhook=URL_WEBHOOK_JD, token_cliente=None):
+    return await cliente_join.configurar_webhook(instancia, url_webhook=url_webhook, token_cliente=token_cliente)
+
+
+async def verificar_status_conexao_jd(instancia: str, token_cliente=None):
+    return await cliente_join.verificar_status_conexao(instancia, token_cliente=token_cliente)
+
+
+async def deslogar_instancia_jd(instancia: str, token_cliente=None):
+    return await cliente_join.deslogar_instancia(instancia, token_cliente=token_cliente)
+
+
+async def enviar_imagem_jd(instancia, numero, media_base64, nome_arquivo, legenda=None, delay_ms=0,
+                           presence="composing", token_cliente=None):
+    return await cliente_join.enviar_imagem(
+        instancia, numero, media_base64, nome_arquivo, legenda=legenda, delay_ms=delay_ms,
+        presence=presence, token_cliente=token_cliente
+    )
 
-    response = requests.post(url, json=payload, headers=headers)
 
-    return response.status_code, response.json()
\ No newline at end of file
+async def enviar_texto_jd(instancia, numero, mensagem, delay_ms=0, presence="composing", token_cliente=None):
+    return await cliente_join.enviar_texto(
+        instancia, numero, mensagem, delay_ms=delay_ms, presence=presence, token_cliente=token_cliente
+    )
@@ -0,0 +1,93 @@
+from fractions import Fraction
+from math import gcd
+from functools import reduce
+import heapq
+import os
+from app.db.db import get_db
+from app.models.campanha_produto import listar_campanha_produto_por_campanha
+from app.utils.cache_ttl import CacheTTL
+from app.utils import eventos
+
+ROTACAO_TAMANHO_MAXIMO = int(os.getenv("ROTACAO_TAMANHO_MAXIMO", "10000"))
+ROTACAO_CACHE_TTL = int(os.getenv("ROTACAO_CACHE_TTL", "86400"))
+ROTACAO_CACHE_MAX_ITENS = int(os.getenv("ROTACAO_CACHE_MAX_ITENS", "5000"))
+
+
+def normalizar_pesos(pesos: list[int], tamanho_maximo: int = ROTACAO_TAMANHO_MAXIMO):
+    pesos = [1 if peso is None else max(int(peso), 0) for peso in pesos]
+    divisor = reduce(gcd, [peso for peso in pesos if peso], 0) or 1
+    pesos = [peso // divisor for peso in pesos]
+
+    total = sum(pesos)
+    if total > tamanho_maximo:
+        pesos = [max(1, peso * tamanho_maximo // total) if peso else 0 for peso in pesos]
+    return pesos
+
+
+def intercalar_por_peso(itens: list, pesos: list[int]):
+    pesos = normalizar_pesos(pesos)
+    heap = [(Fraction(1, 2 * peso), indice) for indice, peso in enumerate(pesos) if peso]
+    heapq.heapify(heap)
+
+    sequencia = []
+    for _ in range(sum(pesos)):
+        instante, indice = heapq.heappop(heap)
+        sequencia.append(itens[indice])
+        heapq.heappush(heap, (instante + Fraction(1, pesos[indice]), indice))
+    return sequencia
+
+
+class Rotacao:
+    def __init__(self, produtos_campanha: list[dict]):
+        self.produtos_campanha = produtos_campanha
+        self.sequencia = intercalar_por_peso(
+            produtos_campanha,
+            [produto["frequencia_exibicao"] for produto in produtos_campanha]
+        )
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self.sequencia)
+
+    def proximo(self):
+        if not self.sequencia:
+            return None
+        item = self.sequencia[self._cursor]
+        self._cursor = (self._cursor + 1) % len(self.sequencia)
+        return item
+
+
+class MotorRotacao:
+    def __init__(self):
+        self._rotacoes = CacheTTL(ttl=ROTACAO_CACHE_TTL, max_itens=ROTACAO_CACHE_MAX_ITENS)
+        self.reconstrucoes = 0
+
+    async def _construir(self, cnpj: str, campanha_id: int):
+        async with get_db(cnpj) as db:
+            produtos_campanha = await listar_campanha_produto_por_campanha(db, campanha_id)
+        self.reconstrucoes += 1
+        return Rotacao(produtos_campanha)
+
+    async def obter(self, cnpj: str, campanha_id: int):
+        return await self._rotacoes.obter_ou_carregar(
+            (cnpj, campanha_id), lambda: self._construir(cnpj, campanha_id)
+        )
+
+    async def proximo_produto(self, cnpj: str, campanha_id: int):
+        rotacao = await self.obter(cnpj, campanha_id)
+        return rotacao.proximo()
+
+    def invalidar(self, cnpj: str, campanha_id: int):
+        self._rotacoes.invalidar((cnpj, campanha_id))
+
+    def ao_alterar_campanha_produto(self, env, campanha_ids, **_):
+        for campanha_id in campanha_ids:
+            self.invalidar(env, campanha_id)
+
+    def metricas(self):
+        return {"reconstrucoes": self.reconstrucoes, "cache": self._rotacoes.metricas()}
+
+
+motor_rotacao = MotorRotacao()
+
+eventos.registrar("campanha_produto_alterado", motor_rotacao.ao_alterar_campanha_produto)
@@ -0,0 +1,349 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import os
+import weakref
+from app.db.db import get_db
+from app.models.envio_campanha import (
+    atualizar_status_por_mensagem,
+    buscar_produto_ultimo_envio,
+    STATUS_ENTREGUE,
+    STATUS_LIDO,
+    STATUS_FALHOU
+)
+from app.models.evento_webhook import (
+    enfileirar_eventos_webhook,
+    reivindicar_eventos_webhook,
+    concluir_eventos_webhook
+)
+from app.services.gptOpenAI import responder, ErroAssistente, MENSAGEM_FALHA
+from app.services.join_wpp import cliente_join
+from app.utils.eventos import emitir
+
+WEBHOOK_FILA_MAXIMA = int(os.getenv("WEBHOOK_FILA_MAXIMA", "10000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_LOTE = int(os.getenv("WEBHOOK_LOTE", "200"))
+WEBHOOK_RESPOSTAS_SIMULTANEAS = int(os.getenv("WEBHOOK_RESPOSTAS_SIMULTANEAS", "50"))
+WEBHOOK_FILA_DURAVEL = os.getenv("WEBHOOK_FILA_DURAVEL", "false").lower() == "true"
+WEBHOOK_INTERVALO_DURAVEL = float(os.getenv("WEBHOOK_INTERVALO_DURAVEL", "1"))
+WEBHOOK_VISIBILIDADE = int(os.getenv("WEBHOOK_VISIBILIDADE", "300"))
+WEBHOOK_MAX_TENTATIVAS = int(os.getenv("WEBHOOK_MAX_TENTATIVAS", "5"))
+
+TIPOS_EVENTO = {
+    "messages.update": "recibo",
+    "messages.upsert": "mensagem",
+    "connection.update": "conexao"
+}
+
+STATUS_RECIBO = {
+    "DELIVERY_ACK": STATUS_ENTREGUE,
+    "READ": STATUS_LIDO,
+    "PLAYED": STATUS_LIDO,
+    "ERROR": STATUS_FALHOU,
+    "3": STATUS_ENTREGUE,
+    "4": STATUS_LIDO,
+    "5": STATUS_LIDO,
+    "0": STATUS_FALHOU
+}
+
+
+class ErroWebhook(ValueError):
+    pass
+
+
+@dataclass
+class EventoRecebido:
+    tipo: str
+    instancia: str
+    payload: dict
+    recebido_em: datetime = field(default_factory=datetime.utcnow)
+    id: Optional[int] = None
+
+
+def classificar_evento(payload):
+    if not isinstance(payload, dict):
+        raise ErroWebhook("Payload deve ser um objeto JSON.")
+
+    evento, instancia = payload.get("event"), payload.get("instance")
+    if not isinstance(evento, str) or not isinstance(instancia, str):
+        raise ErroWebhook("Campos event e instance são obrigatórios.")
+    if not instancia.isdigit():
+        raise ErroWebhook("Instância inválida.")
+
+    tipo = TIPOS_EVENTO.get(evento.lower().replace("_", "."))
+    return EventoRecebido(tipo, instancia, payload) if tipo else None
+
+
+def extrair_recibos(dados):
+    recibos = []
+    for item in dados if isinstance(dados, list) else [dados]:
+        if not isinstance(item, dict):
+            continue
+        chave = item.get("key") if isinstance(item.get("key"), dict) else {}
+        id_mensagem = item.get("keyId") or chave.get("id")
+        status = STATUS_RECIBO.get(str(item.get("status", "")).upper())
+        if id_mensagem and status:
+            recibos.append({"id_mensagem": str(id_mensagem), "status": status, "erro": None})
+    return recibos
+
+
+def extrair_mensagem(dados):
+    if not isinstance(dados, dict):
+        return None
+
+    chave = dados.get("key") if isinstance(dados.get("key"), dict) else {}
+    remetente = chave.get("remoteJid") or ""
+    if chave.get("fromMe") or not remetente.endswith("@s.whatsapp.net"):
+        return None
+
+    mensagem = dados.get("message") if isinstance(dados.get("message"), dict) else {}
+    texto = mensagem.get("conversation") or (mensagem.get("extendedTextMessage") or {}).get("text")
+    if not isinstance(texto, str) or not texto.strip():
+        return None
+    return remetente.split("@", 1)[0], texto.strip()
+
+
+class ProcessadorWebhook:
+    def __init__(
+            self,
+            max_fila: int = WEBHOOK_FILA_MAXIMA,
+            workers: int = WEBHOOK_WORKERS,
+            respostas_simultaneas: int = WEBHOOK_RESPOSTAS_SIMULTANEAS,
+            duravel: bool = WEBHOOK_FILA_DURAVEL
+    ):
+        self.max_fila = max_fila
+        self.workers = workers
+        self.duravel = duravel
+        self.fila = asyncio.Queue(maxsize=max_fila)
+        self._respostas = asyncio.Semaphore(respostas_simultaneas)
+        self._em_resposta = set()
+        self._travas_contato = weakref.WeakValueDictionary()
+        self._sinal = asyncio.Event()
+        self._tarefas = []
+        self.estados_conexao = {}
+        self.aceitos = 0
+        self.descartados = 0
+        self.ignorados = 0
+        self.recibos = 0
+        self.mensagens = 0
+        self.falhas = 0
+
+    def receber(self, payload):
+        evento = classificar_evento(payload)
+        if evento is None:
+            self.ignorados += 1
+            return True
+
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.descartados += 1
+            return False
+        self.aceitos += 1
+        return True
+
+    def iniciar(self):
+        if self._tarefas:
+            return
+        if self.duravel:
+            self._tarefas.append(asyncio.create_task(self._gravador()))
+            trabalhador = self._worker_duravel
+        else:
+            trabalhador = self._worker
+        self._tarefas.extend(asyncio.create_task(trabalhador()) for _ in range(self.workers))
+
+    async def _coletar(self):
+        lote = [await self.fila.get()]
+        while len(lote) < WEBHOOK_LOTE:
+            try:
+                lote.append(self.fila.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return lote
+
+    async def _aplicar_recibos(self, cnpj: str, eventos: list[EventoRecebido]):
+        recibos = [recibo for evento in eventos for recibo in extrair_recibos(evento.payload.get("data"))]
+        if recibos:
+            async with get_db(cnpj) as db:
+                await atualizar_status_por_mensagem(db, recibos)
+        self.recibos += len(recibos)
+
+    def _atualizar_conexao(self, evento: EventoRecebido):
+        dados = evento.payload.get("data") if isinstance(evento.payload.get("data"), dict) else {}
+        estado = dados.get("state") or dados.get("status")
+        if not estado:
+            return
+        self.estados_conexao[evento.instancia] = {"estado": estado, "atualizado_em": evento.recebido_em.isoformat()}
+        emitir("instancia_conexao_alterada", env=evento.instancia, estado=estado)
+
+    async def _responder(self, cnpj: str, numero: str, texto: str):
+        chave = (cnpj, numero)
+        trava = self._travas_contato.get(chave)
+        if trava is None:
+            trava = asyncio.Lock()
+            self._travas_contato[chave] = trava
+
+        async with trava:
+            try:
+                async with get_db(cnpj) as db:
+                    produto_id = await buscar_produto_ultimo_envio(db, numero)
+                resposta, _, status = await responder(texto, cnpj, numero, produto_id=produto_id)
+                if status != "completed":
+                    self.falhas += 1
+                    resposta = MENSAGEM_FALHA
+            except ErroAssistente as e:
+                resposta = str(e)
+            except Exception as e:
+                logging.error(f"Erro ao consultar o assistente para {cnpj}/{numero}: {str(e)}")
+                self.falhas += 1
+                resposta = MENSAGEM_FALHA
+
+            envio = await cliente_join.enviar_texto(cnpj, numero, resposta)
+            if not envio.sucesso:
+                self.falhas += 1
+                logging.error(f"Erro ao responder {numero} pela instância {cnpj}: {envio.erro}")
+
+    async def _agendar_resposta(self, cnpj: str, numero: str, texto: str):
+        await self._respostas.acquire()
+        tarefa = asyncio.create_task(self._responder(cnpj, numero, texto))
+        self._em_resposta.add(tarefa)
+
+        def concluir(tarefa):
+            self._em_resposta.discard(tarefa)
+            self._respostas.release()
+
+        tarefa.add_done_callback(concluir)
+        return tarefa
+
+    async def _processar_lote(self, lote: list[EventoRecebido], aguardar: bool = False):
+        recibos, respostas, com_falha = {}, [], []
+        for evento in lote:
+            if evento.tipo == "recibo":
+                recibos.setdefault(evento.instancia, []).append(evento)
+            elif evento.tipo == "conexao":
+                self._atualizar_conexao(evento)
+            elif evento.tipo == "mensagem":
+                mensagem = extrair_mensagem(evento.payload.get("data"))
+                if mensagem is not None:
+                    self.mensagens += 1
+                    respostas.append(await self._agendar_resposta(evento.instancia, *mensagem))
+
+        for cnpj, eventos in recibos.items():
+            try:
+                await self._aplicar_recibos(cnpj, eventos)
+            except Exception as e:
+                logging.error(f"Erro ao aplicar recibos de entrega da empresa {cnpj}: {str(e)}")
+                self.falhas += 1
+                com_falha.extend(eventos)
+
+        if aguardar and respostas:
+            await asyncio.gather(*respostas, return_exceptions=True)
+        return com_falha
+
+    async def _worker(self):
+        while True:
+            lote = await self._coletar()
+            try:
+                await self._processar_lote(lote)
+            except Exception as e:
+                logging.error(f"Erro ao processar eventos do webhook: {str(e)}")
+            finally:
+                for _ in lote:
+                    self.fila.task_done()
+
+    async def _gravar(self, lote: list[EventoRecebido]):
+        async with get_db('hareware') as db:
+            await enfileirar_eventos_webhook(db, [
+                {
+                    "tipo": evento.tipo,
+                    "instancia": evento.instancia,
+                    "payload": evento.payload,
+                    "recebido_em": evento.recebido_em
+                }
+                for evento in lote
+            ])
+
+    async def _gravador(self):
+        while True:
+            lote = await self._coletar()
+            try:
+                espera = 0.5
+                while True:
+                    try:
+                        await self._gravar(lote)
+                        break
+                    except Exception as e:
+                        logging.error(f"Erro ao gravar eventos do webhook na fila durável: {str(e)}")
+                        await asyncio.sleep(espera)
+                        espera = min(espera * 2, 30)
+                self._sinal.set()
+            finally:
+                for _ in lote:
+                    self.fila.task_done()
+
+    async def _worker_duravel(self):
+        while True:
+            try:
+                async with get_db('hareware') as db:
+                    registros = await reivindicar_eventos_webhook(
+                        db, WEBHOOK_LOTE, WEBHOOK_VISIBILIDADE, WEBHOOK_MAX_TENTATIVAS
+                    )
+            except Exception as e:
+                logging.error(f"Erro ao reivindicar eventos da fila durável do webhook: {str(e)}")
+                registros = []
+
+            if not registros:
+                self._sinal.clear()
+                try:
+                    await asyncio.wait_for(self._sinal.wait(), WEBHOOK_INTERVALO_DURAVEL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            lote = [
+                EventoRecebido(registro["tipo"], registro["instancia"], registro["payload"], id=registro["id"])
+                for registro in registros
+            ]
+            try:
+                com_falha = {evento.id for evento in await self._processar_lote(lote, aguardar=True)}
+                async with get_db('hareware') as db:
+                    await concluir_eventos_webhook(db, [evento.id for evento in lote if evento.id not in com_falha])
+            except Exception as e:
+                logging.error(f"Erro ao processar eventos da fila durável do webhook: {str(e)}")
+
+    def metricas(self):
+        return {
+            "duravel": self.duravel,
+            "na_fila": self.fila.qsize(),
+            "max_fila": self.max_fila,
+            "workers": self.workers,
+            "respostas_em_andamento": len(self._em_resposta),
+            "aceitos": self.aceitos,
+            "descartados": self.descartados,
+            "ignorados": self.ignorados,
+            "recibos": self.recibos,
+            "mensagens": self.mensagens,
+            "falhas": self.falhas,
+            "estados_conexao": self.estados_conexao
+        }
+
+    async def encerrar(self):
+        tarefas = self._tarefas + list(self._em_resposta)
+        self._tarefas = []
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+        if self.duravel and not self.fila.empty():
+            pendentes = []
+            while not self.fila.empty():
+                pendentes.append(self.fila.get_nowait())
+            try:
+                await self._gravar(pendentes)
+            except Exception as e:
+                logging.error(f"Erro ao gravar {len(pendentes)} eventos do webhook no encerramento: {str(e)}")
+
+
+processador_webhook = ProcessadorWebhook()
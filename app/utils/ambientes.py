@@ -0,0 +1,15 @@
+from app.db.db import get_db, BANCOS_ESTATICOS
+from app.models.banco_empresa import listar_bancos_empresa
+import logging
+
+
+async def listar_ambientes_empresas():
+    try:
+        async with get_db('hareware') as db:
+            bancos = await listar_bancos_empresa(db)
+            cnpjs = {banco.cnpj for banco in bancos}
+    except Exception as e:
+        logging.error(f"Erro ao listar bancos das empresas: {str(e)}")
+        cnpjs = set()
+
+    return sorted(cnpjs | set(BANCOS_ESTATICOS))
@@ -0,0 +1,277 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+import asyncio
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+
+
+class CacheBytes:
+    def __init__(self, max_bytes: int, diretorio_disco: Optional[str] = None, max_bytes_disco: int = 0):
+        self.max_bytes = max_bytes
+        self.diretorio_disco = diretorio_disco if diretorio_disco and max_bytes_disco > 0 else None
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._disco = OrderedDict()
+        self._carregando = {}
+        self._gravando = {}
+        self.bytes_memoria = 0
+        self.bytes_disco = 0
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+        self.carregamentos = 0
+        self.despejos = 0
+        self.despejos_disco = 0
+        self.invalidacoes = 0
+
+        if self.diretorio_disco:
+            os.makedirs(self.diretorio_disco, exist_ok=True)
+            self.diretorio_disco = tempfile.mkdtemp(prefix="cache-bytes-", dir=self.diretorio_disco)
+
+    def _guardar_memoria(self, chave: Hashable, valor: bytes):
+        if len(valor) > self.max_bytes:
+            return self._para_disco([(chave, valor)])
+
+        self._memoria[chave] = valor
+        self.bytes_memoria += len(valor)
+        despejados = []
+        while self.bytes_memoria > self.max_bytes:
+            antiga, dados = self._memoria.popitem(last=False)
+            self.bytes_memoria -= len(dados)
+            self.despejos += 1
+            despejados.append((antiga, dados))
+        return self._para_disco(despejados)
+
+    def _para_disco(self, itens):
+        if not self.diretorio_disco:
+            return []
+        return [(chave, valor) for chave, valor in itens if valor and len(valor) <= self.max_bytes_disco]
+
+    def _escrever_disco(self, valor: bytes):
+        try:
+            descritor, arquivo = tempfile.mkstemp(dir=self.diretorio_disco)
+        except OSError as e:
+            logging.error(f"Erro ao gravar cache de mídia em disco: {str(e)}")
+            return None
+
+        try:
+            with os.fdopen(descritor, "wb") as destino:
+                destino.write(valor)
+            with open(arquivo, "rb") as origem:
+                return arquivo, mmap.mmap(origem.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as e:
+            logging.error(f"Erro ao gravar cache de mídia em disco: {str(e)}")
+            self._descartar([(arquivo, None)])
+            return None
+
+    def _registrar_disco(self, chave: Hashable, arquivo: str, mapa: mmap.mmap):
+        descartes = self._retirar_disco(chave)
+        self._disco[chave] = (arquivo, mapa)
+        self.bytes_disco += len(mapa)
+        while self.bytes_disco > self.max_bytes_disco:
+            descartes += self._retirar_disco(next(iter(self._disco)))
+            self.despejos_disco += 1
+        return descartes
+
+    def _retirar_disco(self, chave: Hashable):
+        item = self._disco.pop(chave, None)
+        if item is None:
+            return []
+        self.bytes_disco -= len(item[1])
+        return [item]
+
+    @staticmethod
+    def _descartar(itens):
+        for arquivo, mapa in itens:
+            if mapa is not None:
+                try:
+                    mapa.close()
+                except BufferError:
+                    pass
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+
+    def _transbordar(self, itens):
+        for chave, valor in itens:
+            gravado = self._escrever_disco(valor)
+            if gravado is not None:
+                self._descartar(self._registrar_disco(chave, *gravado))
+
+    async def _transbordar_async(self, itens):
+        for chave, valor in itens:
+            marcador = object()
+            self._gravando[chave] = marcador
+            gravado = await asyncio.to_thread(self._escrever_disco, valor)
+            if self._gravando.get(chave) is not marcador:
+                if gravado is not None:
+                    await asyncio.to_thread(self._descartar, [gravado])
+                continue
+            del self._gravando[chave]
+            if gravado is not None:
+                descartes = self._registrar_disco(chave, *gravado)
+                if descartes:
+                    await asyncio.to_thread(self._descartar, descartes)
+
+    def _retirar(self, chave: Hashable):
+        self._gravando.pop(chave, None)
+        valor = self._memoria.pop(chave, None)
+        if valor is not None:
+            self.bytes_memoria -= len(valor)
+        return valor is not None, self._retirar_disco(chave)
+
+    def _remover(self, chave: Hashable):
+        em_memoria, descartes = self._retirar(chave)
+        self._descartar(descartes)
+        return em_memoria or bool(descartes)
+
+    def _buscar_memoria(self, chave: Hashable):
+        valor = self._memoria.get(chave)
+        if valor is not None:
+            self._memoria.move_to_end(chave)
+            self.acertos_memoria += 1
+        return valor
+
+    def _promover(self, chave: Hashable, item, valor: bytes):
+        if self._disco.get(chave) is not item:
+            return [], []
+        return self._retirar_disco(chave), self._guardar_memoria(chave, valor)
+
+    def _buscar(self, chave: Hashable):
+        valor = self._buscar_memoria(chave)
+        if valor is not None:
+            return valor
+
+        item = self._disco.get(chave)
+        if item is None:
+            return None
+
+        _, mapa = item
+        self.acertos_disco += 1
+        if len(mapa) > self.max_bytes:
+            self._disco.move_to_end(chave)
+            return mapa
+
+        valor = mapa[:]
+        descartes, transbordo = self._promover(chave, item, valor)
+        self._descartar(descartes)
+        self._transbordar(transbordo)
+        return valor
+
+    async def _buscar_async(self, chave: Hashable):
+        valor = self._buscar_memoria(chave)
+        if valor is not None:
+            return valor
+
+        item = self._disco.get(chave)
+        if item is None:
+            return None
+
+        _, mapa = item
+        if len(mapa) > self.max_bytes:
+            self.acertos_disco += 1
+            self._disco.move_to_end(chave)
+            return mapa
+
+        try:
+            valor = await asyncio.to_thread(bytes, mapa)
+        except ValueError:
+            return None
+        self.acertos_disco += 1
+
+        descartes, transbordo = self._promover(chave, item, valor)
+        if descartes:
+            await asyncio.to_thread(self._descartar, descartes)
+        await self._transbordar_async(transbordo)
+        return valor
+
+    def obter(self, chave: Hashable):
+        valor = self._buscar(chave)
+        if valor is None:
+            self.falhas += 1
+        return valor
+
+    def definir(self, chave: Hashable, valor: bytes):
+        self._remover(chave)
+        self._transbordar(self._guardar_memoria(chave, bytes(valor)))
+
+    async def definir_async(self, chave: Hashable, valor: bytes):
+        _, descartes = self._retirar(chave)
+        transbordo = self._guardar_memoria(chave, bytes(valor))
+        if descartes:
+            await asyncio.to_thread(self._descartar, descartes)
+        await self._transbordar_async(transbordo)
+
+    def invalidar(self, chave: Hashable):
+        if self._remover(chave):
+            self.invalidacoes += 1
+
+    def invalidar_onde(self, predicado: Callable[[Hashable], bool]):
+        chaves = {chave for chave in list(self._memoria) + list(self._disco) if predicado(chave)}
+        for chave in chaves:
+            self._remover(chave)
+        self.invalidacoes += len(chaves)
+        return len(chaves)
+
+    def limpar(self):
+        self._gravando.clear()
+        for chave in list(self._memoria) + list(self._disco):
+            self._remover(chave)
+
+    def fechar(self):
+        self.limpar()
+        if self.diretorio_disco:
+            shutil.rmtree(self.diretorio_disco, ignore_errors=True)
+
+    async def obter_ou_carregar(self, chave: Hashable, carregador: Callable[[], Awaitable[Optional[bytes]]]):
+        valor = await self._buscar_async(chave)
+        if valor is not None:
+            return valor
+
+        self.falhas += 1
+        futuro = self._carregando.get(chave)
+        if futuro is not None:
+            return await asyncio.shield(futuro)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._carregando[chave] = futuro
+        try:
+            valor = await carregador()
+            self.carregamentos += 1
+            if valor is not None:
+                await self.definir_async(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()
+            raise
+        finally:
+            del self._carregando[chave]
+
+    def metricas(self):
+        acertos = self.acertos_memoria + self.acertos_disco
+        consultas = acertos + self.falhas
+        return {
+            "itens_memoria": len(self._memoria),
+            "bytes_memoria": self.bytes_memoria,
+            "max_bytes": self.max_bytes,
+            "itens_disco": len(self._disco),
+            "bytes_disco": self.bytes_disco,
+            "max_bytes_disco": self.max_bytes_disco if self.diretorio_disco else 0,
+            "acertos_memoria": self.acertos_memoria,
+            "acertos_disco": self.acertos_disco,
+            "falhas": self.falhas,
+            "taxa_acerto": round(acertos / consultas, 4) if consultas else 0.0,
+            "carregamentos": self.carregamentos,
+            "despejos": self.despejos,
+            "despejos_disco": self.despejos_disco,
+            "invalidacoes": self.invalidacoes
+        }
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+import asyncio
+import time
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    def __init__(self, ttl: float, max_itens: Optional[int] = None):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._carregando = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.carregamentos = 0
+        self.invalidacoes = 0
+
+    def _buscar(self, chave: Hashable):
+        item = self._itens.get(chave)
+        if item is None:
+            return _AUSENTE
+
+        valor, expira_em = item
+        if expira_em <= time.monotonic():
+            del self._itens[chave]
+            return _AUSENTE
+
+        self._itens.move_to_end(chave)
+        return valor
+
+    def obter(self, chave: Hashable, padrao: Any = None):
+        valor = self._buscar(chave)
+        if valor is _AUSENTE:
+            self.falhas += 1
+            return padrao
+        self.acertos += 1
+        return valor
+
+    def definir(self, chave: Hashable, valor: Any, ttl: Optional[float] = None):
+        self._itens[chave] = (valor, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._itens.move_to_end(chave)
+        if self.max_itens is not None:
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave: Hashable):
+        if self._itens.pop(chave, None) is not None:
+            self.invalidacoes += 1
+
+    def invalidar_onde(self, predicado: Callable[[Hashable, Any], bool]):
+        chaves = [chave for chave, (valor, _) in self._itens.items() if predicado(chave, valor)]
+        for chave in chaves:
+            del self._itens[chave]
+        self.invalidacoes += len(chaves)
+        return len(chaves)
+
+    def limpar(self):
+        self.invalidacoes += len(self._itens)
+        self._itens.clear()
+
+    async def obter_ou_carregar(self, chave: Hashable, carregador: Callable[[], Awaitable[Any]]):
+        valor = self._buscar(chave)
+        if valor is not _AUSENTE:
+            self.acertos += 1
+            return valor
+
+        self.falhas += 1
+        futuro = self._carregando.get(chave)
+        if futuro is not None:
+            return await asyncio.shield(futuro)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._carregando[chave] = futuro
+        try:
+            valor = await carregador()
+            self.carregamentos += 1
+            if valor is not None:
+                self.definir(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()
+            raise
+        finally:
+            del self._carregando[chave]
+
+    def metricas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "itens": len(self._itens),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+            "carregamentos": self.carregamentos,
+            "invalidacoes": self.invalidacoes
+        }
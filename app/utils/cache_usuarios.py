@@ -0,0 +1,17 @@
+from app.utils.cache_ttl import CacheTTL
+import os
+
+CACHE_USUARIOS_TTL = int(os.getenv("CACHE_USUARIOS_TTL", "300"))
+CACHE_USUARIOS_MAX_ITENS = int(os.getenv("CACHE_USUARIOS_MAX_ITENS", "10000"))
+
+cache_usuarios_empresa = CacheTTL(ttl=CACHE_USUARIOS_TTL, max_itens=CACHE_USUARIOS_MAX_ITENS)
+
+
+def invalidar_usuario(username: str):
+    cache_usuarios_empresa.invalidar(username)
+
+
+def invalidar_empresa(cnpj: str = None, empresa_id: int = None):
+    return cache_usuarios_empresa.invalidar_onde(
+        lambda _, dados: dados["cnpj"] == cnpj or dados["empresa_id"] == empresa_id
+    )
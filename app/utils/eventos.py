@@ -0,0 +1,16 @@
+from collections import defaultdict
+import logging
+
+_ouvintes = defaultdict(list)
+
+
+def registrar(evento: str, callback):
+    _ouvintes[evento].append(callback)
+
+
+def emitir(evento: str, **dados):
+    for callback in _ouvintes.get(evento, ()):
+        try:
+            callback(**dados)
+        except Exception as e:
+            logging.error(f"Erro ao notificar evento {evento}: {str(e)}")
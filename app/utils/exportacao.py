@@ -0,0 +1,84 @@
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.future import select
+import csv
+import io
+import json
+import logging
+import os
+from app.db.db import get_db
+
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "1000"))
+EXPORTACAO_LINHAS_POR_BLOCO = int(os.getenv("EXPORTACAO_LINHAS_POR_BLOCO", "200"))
+
+FORMATOS_EXPORTACAO = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo {type(valor).__name__} não serializável.")
+
+
+async def _registros(cnpj: str, modelo, serializar, filtros=()):
+    consulta = (
+        select(modelo)
+        .where(*filtros)
+        .order_by(modelo.id)
+        .execution_options(yield_per=EXPORTACAO_LOTE)
+    )
+    async with get_db(cnpj) as db:
+        result = await db.stream_scalars(consulta)
+        async for registro in result:
+            yield serializar(registro)
+
+
+async def exportar_ndjson(cnpj: str, modelo, serializar, filtros=()):
+    bloco = []
+    try:
+        async for registro in _registros(cnpj, modelo, serializar, filtros):
+            bloco.append(json.dumps(registro, default=_valor_json, ensure_ascii=False))
+            if len(bloco) >= EXPORTACAO_LINHAS_POR_BLOCO:
+                yield "\n".join(bloco) + "\n"
+                bloco = []
+        if bloco:
+            yield "\n".join(bloco) + "\n"
+    except Exception as e:
+        logging.error(f"Erro ao exportar {modelo.__tablename__} da empresa {cnpj}: {str(e)}")
+        raise
+
+
+async def exportar_csv(cnpj: str, modelo, serializar, colunas, filtros=()):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=colunas, extrasaction="ignore")
+    escritor.writeheader()
+    yield buffer.getvalue()
+
+    buffer.seek(0)
+    buffer.truncate()
+    linhas = 0
+    try:
+        async for registro in _registros(cnpj, modelo, serializar, filtros):
+            escritor.writerow(registro)
+            linhas += 1
+            if linhas >= EXPORTACAO_LINHAS_POR_BLOCO:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                linhas = 0
+        if linhas:
+            yield buffer.getvalue()
+    except Exception as e:
+        logging.error(f"Erro ao exportar {modelo.__tablename__} da empresa {cnpj}: {str(e)}")
+        raise
+
+
+def exportar(cnpj: str, formato: str, modelo, serializar, colunas, filtros=()):
+    if formato == "csv":
+        return exportar_csv(cnpj, modelo, serializar, colunas, filtros)
+    return exportar_ndjson(cnpj, modelo, serializar, filtros)
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Optional
+from datetime import date
+from fastapi import HTTPException, Query
+from sqlalchemy.future import select
+import os
+
+PAGINACAO_LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "100"))
+PAGINACAO_LIMITE_MAXIMO = int(os.getenv("PAGINACAO_LIMITE_MAXIMO", "1000"))
+
+
+@dataclass
+class Paginacao:
+    cursor: Optional[int] = None
+    limite: int = PAGINACAO_LIMITE_PADRAO
+    campos: Optional[list[str]] = None
+
+
+@dataclass
+class Pagina:
+    itens: list
+    proximo_cursor: Optional[int] = None
+
+
+def parametros_paginacao(campos_permitidos):
+    campos_permitidos = set(campos_permitidos)
+
+    def dependencia(
+            cursor: Optional[int] = Query(None, ge=0),
+            limite: int = Query(PAGINACAO_LIMITE_PADRAO, ge=1, le=PAGINACAO_LIMITE_MAXIMO),
+            campos: Optional[str] = Query(None)
+    ):
+        lista_campos = None
+        if campos:
+            lista_campos = list(dict.fromkeys(campo.strip() for campo in campos.split(",") if campo.strip()))
+            invalidos = [campo for campo in lista_campos if campo not in campos_permitidos]
+            if invalidos:
+                raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalidos)}.")
+        return Paginacao(cursor=cursor, limite=limite, campos=lista_campos)
+
+    return dependencia
+
+
+def filtro_prefixo(coluna, prefixo: Optional[str]):
+    if not prefixo:
+        return None
+    escapado = prefixo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return coluna.ilike(f"{escapado}%", escape="\\")
+
+
+def filtros_periodo(coluna, inicio: Optional[date] = None, fim: Optional[date] = None):
+    filtros = []
+    if inicio is not None:
+        filtros.append(coluna >= inicio)
+    if fim is not None:
+        filtros.append(coluna <= fim)
+    return filtros
+
+
+async def paginar(db, modelo, filtros, paginacao: Optional[Paginacao], serializar):
+    filtros = [filtro for filtro in filtros if filtro is not None]
+
+    if paginacao is not None and paginacao.campos:
+        nomes = list(dict.fromkeys(["id", *paginacao.campos]))
+        consulta = select(*[getattr(modelo, nome) for nome in nomes])
+    else:
+        nomes = None
+        consulta = select(modelo)
+
+    consulta = consulta.where(*filtros).order_by(modelo.id)
+
+    if paginacao is not None:
+        if paginacao.cursor is not None:
+            consulta = consulta.where(modelo.id > paginacao.cursor)
+        consulta = consulta.limit(paginacao.limite + 1)
+
+    result = await db.execute(consulta)
+    if nomes is not None:
+        linhas = [dict(linha) for linha in result.mappings().all()]
+    else:
+        linhas = result.scalars().all()
+
+    proximo_cursor = None
+    if paginacao is not None and len(linhas) > paginacao.limite:
+        linhas = linhas[:paginacao.limite]
+        proximo_cursor = linhas[-1]["id"] if nomes is not None else linhas[-1].id
+
+    if nomes is not None:
+        itens = [_serializar_projecao(modelo, linha, nomes, serializar) for linha in linhas]
+    else:
+        itens = [serializar(linha) for linha in linhas]
+    return Pagina(itens=itens, proximo_cursor=proximo_cursor)
+
+
+def _serializar_projecao(modelo, linha: dict, nomes: list[str], serializar):
+    serializado = serializar(modelo(**linha))
+    return {nome: serializado[nome] for nome in nomes if nome in serializado}
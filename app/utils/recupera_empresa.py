@@ -1,33 +1,64 @@
 from app.db.db import get_db
+from app.auth2.token import UsuarioAutenticado
 from app.models.usuario import buscar_usuario
 from app.models.empresa import buscar_empresa
+from app.utils.cache_usuarios import cache_usuarios_empresa
 from fastapi import HTTPException
 import logging
 
 
-async def recuperar_empresa(username: str):
+async def _carregar_usuario_empresa(username: str):
     async with get_db('hareware') as db:
         try:
-            try:
-                usuario = await buscar_usuario(db, username)
-            except Exception as e:
-                logging.error(f'Erro ao buscar usuário: {str(e)}')
-                raise HTTPException(status_code=500, detail=str(e))
-
-            if usuario:
-                try:
-                    empresa = await buscar_empresa(db, usuario.id_empresa)
-                except Exception as e:
-                    logging.error(f'Erro ao buscar empresa: {str(e)}')
-                    raise HTTPException(status_code=500, detail=str(e))
-
-                if empresa:
-                    return empresa.cnpj
-                else:
-                    raise HTTPException(status_code=400, detail='Empresa não encontrada')
-
-            else:
-                raise HTTPException(status_code=400, detail='Usuário não encontrado.')
+            usuario = await buscar_usuario(db, username)
         except Exception as e:
-            logging.error(f'Erro ao recuperar empresa: {str(e)}')
-            raise HTTPException(status_code=400, detail=str(e))
+            logging.error(f'Erro ao buscar usuário: {str(e)}')
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if not usuario:
+            raise HTTPException(status_code=400, detail='Usuário não encontrado.')
+
+        try:
+            empresa = await buscar_empresa(db, usuario.id_empresa)
+        except Exception as e:
+            logging.error(f'Erro ao buscar empresa: {str(e)}')
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if not empresa:
+            raise HTTPException(status_code=400, detail='Empresa não encontrada')
+
+        return {
+            "cnpj": empresa.cnpj,
+            "empresa_id": empresa.id,
+            "status_empresa": empresa.status,
+            "status_usuario": usuario.status
+        }
+
+
+async def recuperar_dados_empresa(username: str):
+    dados = await cache_usuarios_empresa.obter_ou_carregar(
+        username, lambda: _carregar_usuario_empresa(username)
+    )
+
+    if not dados["status_usuario"]:
+        raise HTTPException(status_code=403, detail='Usuário inativo.')
+    if not dados["status_empresa"]:
+        raise HTTPException(status_code=403, detail='Empresa inativa.')
+
+    return dados
+
+
+async def recuperar_empresa(usuario):
+    username = usuario.username if isinstance(usuario, UsuarioAutenticado) else usuario
+
+    try:
+        dados = await recuperar_dados_empresa(username)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f'Erro ao recuperar empresa: {str(e)}')
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if isinstance(usuario, UsuarioAutenticado) and usuario.cnpj:
+        return usuario.cnpj
+    return dados["cnpj"]
@@ -7,7 +7,7 @@ def usuario_to_dict(usuario):
         "telefone": usuario.telefone,
         "nivel_acesso": usuario.nivel_acesso,
         "ultimo_acesso": usuario.ultimo_acesso.isoformat() if usuario.ultimo_acesso else None,
-        "data_cadastro": usuario.data_cadastro.isoformat(),
+        "data_cadastro": usuario.data_cadastro.isoformat() if usuario.data_cadastro else None,
         "status": usuario.status,
     }
 
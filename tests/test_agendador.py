@@ -0,0 +1,112 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncio
+from app.services import agendador as modulo_agendador
+from app.services.agendador import Agendador
+
+
+def test_falha_ao_listar_ambientes_nao_derruba_o_agendador(monkeypatch):
+    chamadas = []
+
+    async def listar_ambientes_empresas():
+        chamadas.append(datetime.now())
+        if len(chamadas) < 3:
+            raise RuntimeError("banco indisponível")
+        return []
+
+    monkeypatch.setattr(modulo_agendador, "listar_ambientes_empresas", listar_ambientes_empresas)
+    monkeypatch.setattr(modulo_agendador, "AGENDADOR_ESPERA_RECARGA_SEGUNDOS", 0)
+    agendador = Agendador(janela=timedelta(hours=1))
+
+    async def rodar():
+        tarefa = asyncio.create_task(agendador.executar())
+        await asyncio.sleep(0.05)
+        vivo = not tarefa.done()
+        tarefa.cancel()
+        return vivo
+
+    assert asyncio.run(rodar())
+    assert len(chamadas) == 3
+    assert agendador._limite_janela is not None
+
+
+def test_falha_na_recarga_mantem_janela_e_adia_nova_tentativa(monkeypatch):
+    async def listar_ambientes_empresas():
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(modulo_agendador, "listar_ambientes_empresas", listar_ambientes_empresas)
+    agendador = Agendador(janela=timedelta(hours=1))
+    limite = datetime.now() + timedelta(minutes=10)
+    agendador._limite_janela = limite
+
+    assert not asyncio.run(agendador._recarregar(limite, limite + timedelta(hours=1)))
+    assert agendador._limite_janela == limite
+    assert agendador._recarga_adiada_ate > datetime.now()
+
+
+def test_empresa_com_falha_e_recarregada_desde_o_inicio_original(monkeypatch):
+    consultas = []
+    falhar = {"456"}
+    agora = datetime.now()
+    horario = agora + timedelta(minutes=30)
+
+    async def listar_ambientes_empresas():
+        return ["123", "456"]
+
+    @asynccontextmanager
+    async def get_db(cnpj):
+        if cnpj in falhar:
+            raise RuntimeError("banco indisponível")
+        yield cnpj
+
+    async def listar_agendamentos_periodo(db, data_inicio, data_fim):
+        consultas.append((db, data_inicio))
+        return [(1, 10, horario.date(), horario.time())] if db == "456" else []
+
+    monkeypatch.setattr(modulo_agendador, "listar_ambientes_empresas", listar_ambientes_empresas)
+    monkeypatch.setattr(modulo_agendador, "get_db", get_db)
+    monkeypatch.setattr(modulo_agendador, "listar_agendamentos_periodo", listar_agendamentos_periodo)
+    agendador = Agendador(janela=timedelta(hours=1))
+
+    async def rodar():
+        await agendador.carregar_janela(agora - timedelta(minutes=1), agora + timedelta(hours=1))
+        assert agendador._empresas_pendentes == {"456": agora - timedelta(minutes=1)}
+        falhar.clear()
+        await agendador.carregar_janela(agora + timedelta(hours=1), agora + timedelta(hours=2))
+
+    asyncio.run(rodar())
+
+    assert ("456", (agora - timedelta(minutes=1)).date()) in consultas
+    assert agendador._empresas_pendentes == {}
+    assert ("456", 1) in agendador._ativos
+
+
+def test_agendamento_ja_reivindicado_nao_dispara(monkeypatch):
+    reivindicados, disparos = set(), []
+
+    @asynccontextmanager
+    async def get_db(cnpj):
+        yield cnpj
+
+    async def reivindicar(db, agendamento_id):
+        if agendamento_id in reivindicados:
+            return False
+        reivindicados.add(agendamento_id)
+        return True
+
+    async def disparar_produto(cnpj, campanha_produto_id):
+        disparos.append((cnpj, campanha_produto_id))
+        return 1
+
+    monkeypatch.setattr(modulo_agendador, "get_db", get_db)
+    monkeypatch.setattr(modulo_agendador, "reivindicar_agendamento_campanha_produto", reivindicar)
+    monkeypatch.setattr(modulo_agendador.motor_disparo, "disparar_produto", disparar_produto)
+    agendador = Agendador()
+
+    async def rodar():
+        await asyncio.gather(agendador._disparar("123", 1, 10), agendador._disparar("123", 1, 10))
+
+    asyncio.run(rodar())
+
+    assert disparos == [("123", 10)]
+    assert agendador.disparados == 1
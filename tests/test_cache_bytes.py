@@ -0,0 +1,70 @@
+import asyncio
+import os
+import threading
+from app.utils.cache_bytes import CacheBytes
+
+
+def test_cada_cache_usa_diretorio_proprio_e_remove_apenas_ele(tmp_path):
+    existente = tmp_path / "outro_arquivo"
+    existente.write_bytes(b"nao apagar")
+
+    primeiro = CacheBytes(4, diretorio_disco=str(tmp_path), max_bytes_disco=1024)
+    segundo = CacheBytes(4, diretorio_disco=str(tmp_path), max_bytes_disco=1024)
+    primeiro.definir("chave", b"conteudo grande")
+    segundo.definir("chave", b"outro conteudo")
+
+    assert primeiro.diretorio_disco != segundo.diretorio_disco
+    assert os.path.dirname(primeiro.diretorio_disco) == str(tmp_path)
+    assert bytes(primeiro.obter("chave")) == b"conteudo grande"
+    assert bytes(segundo.obter("chave")) == b"outro conteudo"
+
+    primeiro.fechar()
+
+    assert not os.path.exists(primeiro.diretorio_disco)
+    assert os.path.isdir(segundo.diretorio_disco)
+    assert existente.read_bytes() == b"nao apagar"
+    segundo.fechar()
+
+
+def test_camada_de_disco_nao_bloqueia_o_loop(tmp_path):
+    cache = CacheBytes(4, diretorio_disco=str(tmp_path), max_bytes_disco=1024)
+    threads = []
+    escrever_disco = cache._escrever_disco
+
+    def escrever_registrando(valor):
+        threads.append(threading.get_ident())
+        return escrever_disco(valor)
+
+    cache._escrever_disco = escrever_registrando
+
+    async def carregar(valor):
+        return valor
+
+    async def rodar():
+        await cache.obter_ou_carregar("a", lambda: carregar(b"aaa"))
+        await cache.obter_ou_carregar("b", lambda: carregar(b"bbb"))
+        return threading.get_ident(), await cache.obter_ou_carregar("a", lambda: carregar(b"outro"))
+
+    loop, valor = asyncio.run(rodar())
+
+    assert valor == b"aaa"
+    assert threads and loop not in threads
+    assert cache.carregamentos == 2
+    assert cache.acertos_disco == 1
+    cache.fechar()
+
+
+def test_invalidacao_durante_gravacao_descarta_arquivo(tmp_path):
+    cache = CacheBytes(4, diretorio_disco=str(tmp_path), max_bytes_disco=1024)
+
+    async def rodar():
+        gravacao = asyncio.create_task(cache._transbordar_async([("a", b"aaa")]))
+        await asyncio.sleep(0)
+        cache.invalidar("a")
+        await gravacao
+
+    asyncio.run(rodar())
+
+    assert cache.obter("a") is None
+    assert os.listdir(cache.diretorio_disco) == []
+    cache.fechar()
@@ -0,0 +1,43 @@
+import asyncio
+from app.services import gptOpenAI
+from app.services.cache_respostas import CacheRespostas
+
+
+def _cache():
+    cache = CacheRespostas(similaridade=0.5)
+    cache.guardar("123", None, "Vocês entregam no centro?", "Sim, entregamos.")
+    cache.guardar("123", None, "O produto vem com garantia?", "Sim, 12 meses.")
+    return cache
+
+
+def test_pergunta_parecida_reaproveita_resposta():
+    assert _cache().buscar("123", None, "voces entregam no centro") == "Sim, entregamos."
+
+
+def test_negacao_nao_reaproveita_resposta():
+    cache = _cache()
+
+    assert cache.buscar("123", None, "Vocês não entregam no centro?") is None
+    assert cache.buscar("123", None, "O produto vem sem garantia?") is None
+
+
+def test_resposta_em_cache_e_registrada_na_thread_do_contato(monkeypatch):
+    registradas = []
+
+    async def thread_do_contato(cnpj, id_contato):
+        return "thread_1"
+
+    async def registrar_troca(thread_id, pergunta, resposta):
+        registradas.append((thread_id, pergunta, resposta))
+
+    monkeypatch.setattr(gptOpenAI, "cache_respostas", _cache())
+    monkeypatch.setattr(gptOpenAI.gerenciador_threads, "thread_do_contato", thread_do_contato)
+    monkeypatch.setattr(gptOpenAI.servico_assistente, "registrar_troca", registrar_troca)
+
+    async def rodar():
+        resultado = await gptOpenAI.responder("Vocês entregam no centro?", "123", "5511999999999")
+        await asyncio.gather(*gptOpenAI._registros_contexto)
+        return resultado
+
+    assert asyncio.run(rodar()) == ("Sim, entregamos.", None, "completed")
+    assert registradas == [("thread_1", "Vocês entregam no centro?", "Sim, entregamos.")]
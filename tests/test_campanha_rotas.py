@@ -0,0 +1,37 @@
+import asyncio
+from fastapi import HTTPException
+from app.routes import campanha as rotas_campanha
+from app.routes.campanha import CampanhaDisparo
+
+
+def _disparar(monkeypatch, cnpj="123", envios=None, erro=None):
+    async def recuperar_empresa(usuario):
+        return cnpj
+
+    async def disparar_campanha(cnpj, campanha_id, numeros):
+        if erro:
+            raise erro
+        return envios
+
+    monkeypatch.setattr(rotas_campanha, "recuperar_empresa", recuperar_empresa)
+    monkeypatch.setattr(rotas_campanha.motor_disparo, "disparar_campanha", disparar_campanha)
+    try:
+        return asyncio.run(rotas_campanha.disparar_campanha(1, CampanhaDisparo(), usuario_atual=None))
+    except HTTPException as e:
+        return e
+
+
+def test_disparo_de_campanha_inexistente_retorna_404(monkeypatch):
+    assert _disparar(monkeypatch).status_code == 404
+
+
+def test_disparo_sem_empresa_retorna_400(monkeypatch):
+    assert _disparar(monkeypatch, cnpj=None).status_code == 400
+
+
+def test_falha_inesperada_no_disparo_retorna_500(monkeypatch):
+    assert _disparar(monkeypatch, erro=RuntimeError("banco indisponível")).status_code == 500
+
+
+def test_disparo_retorna_envios_agendados(monkeypatch):
+    assert _disparar(monkeypatch, envios=3) == {"status": "success", "envios_agendados": 3}
@@ -0,0 +1,31 @@
+import asyncio
+from types import SimpleNamespace
+from app.models import destinatario_campanha
+from app.models.destinatario_campanha import incluir_destinatarios_campanha
+
+
+class _SessaoFalsa:
+    def __init__(self):
+        self.parametros_por_comando = []
+        self.commits = 0
+
+    async def execute(self, instrucao):
+        parametros = len(instrucao.compile().params)
+        self.parametros_por_comando.append(parametros)
+        return SimpleNamespace(rowcount=parametros // 2)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_audiencia_grande_e_inserida_em_lotes(monkeypatch):
+    monkeypatch.setattr(destinatario_campanha, "DESTINATARIOS_LOTE_INSERCAO", 5000)
+    db = _SessaoFalsa()
+    numeros = [f"55119{indice:08d}" for indice in range(20001)] + ["5511900000000"]
+
+    incluidos = asyncio.run(incluir_destinatarios_campanha(db, 1, numeros))
+
+    assert incluidos == 20001
+    assert len(db.parametros_por_comando) == 5
+    assert max(db.parametros_por_comando) <= 10000
+    assert db.commits == 1
@@ -0,0 +1,118 @@
+import asyncio
+import httpx
+from app.models.envio_campanha import STATUS_ENVIADO, STATUS_FALHOU, STATUS_PENDENTE
+from app.services import disparo_campanha
+from app.services.disparo_campanha import InstanciaDisparo, MotorDisparo, TarefaEnvio
+from app.services.join_wpp import ClienteJoinDeveloper
+
+
+def _processar(monkeypatch, handler):
+    cliente = ClienteJoinDeveloper(url_base="http://join.teste", token_cliente="token", max_tentativas=3)
+    cliente._cliente = httpx.AsyncClient(base_url="http://join.teste", transport=httpx.MockTransport(handler))
+    cliente._espera = lambda tentativa, resposta=None: 0
+    monkeypatch.setattr(disparo_campanha, "cliente_join", cliente)
+
+    motor = MotorDisparo(max_tentativas=5)
+
+    async def conteudo(cnpj, campanha_produto_id):
+        return {"texto": "Oferta", "url_imagem": None}
+
+    motor._conteudo = conteudo
+    tarefa = TarefaEnvio(envio_id=1, campanha_id=1, campanha_produto_id=1, numero="5511999999999")
+
+    async def rodar():
+        instancia = InstanciaDisparo("123", mensagens_por_minuto=60)
+        try:
+            await motor._processar(instancia, tarefa)
+        finally:
+            await cliente.fechar()
+        return instancia
+
+    return motor, asyncio.run(rodar())
+
+
+def test_envio_usa_uma_tentativa_do_cliente_e_reagenda_no_motor(monkeypatch):
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        return httpx.Response(503)
+
+    motor, instancia = _processar(monkeypatch, handler)
+
+    assert len(chamadas) == 1
+    assert motor.retentativas == 1
+    assert instancia.agendadas == 1
+    assert instancia.gravacoes[0]["status"] == STATUS_PENDENTE
+
+
+def test_envio_com_timeout_de_leitura_nao_e_reagendado(monkeypatch):
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        raise httpx.ReadTimeout("sem resposta", request=request)
+
+    motor, instancia = _processar(monkeypatch, handler)
+
+    assert len(chamadas) == 1
+    assert motor.retentativas == 0
+    assert instancia.agendadas == 0
+    assert instancia.gravacoes[0]["status"] == STATUS_FALHOU
+
+
+def test_envio_com_erro_de_conexao_e_reagendado(monkeypatch):
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        raise httpx.ConnectError("recusada", request=request)
+
+    motor, instancia = _processar(monkeypatch, handler)
+
+    assert len(chamadas) == 1
+    assert instancia.agendadas == 1
+    assert instancia.gravacoes[0]["status"] == STATUS_PENDENTE
+
+
+def test_envio_bem_sucedido_registra_id_da_mensagem(monkeypatch):
+    def handler(request):
+        return httpx.Response(201, json={"key": {"id": "ABC123"}})
+
+    motor, instancia = _processar(monkeypatch, handler)
+
+    assert motor.enviados == 1
+    assert instancia.gravacoes[0]["status"] == STATUS_ENVIADO
+    assert instancia.gravacoes[0]["id_mensagem"] == "ABC123"
+
+
+def test_fallback_para_original_nao_e_cacheado_como_derivado(monkeypatch):
+    motor = MotorDisparo()
+    baixadas, consultas = [], []
+
+    async def resolver_hash(url, baixar_original):
+        return "abc"
+
+    async def derivado(sha256, nome="whatsapp"):
+        consultas.append(sha256)
+        return None
+
+    async def baixar_imagem(url):
+        baixadas.append(url)
+        return b"png"
+
+    monkeypatch.setattr(disparo_campanha.gerador_derivados, "resolver_hash", resolver_hash)
+    monkeypatch.setattr(disparo_campanha.gerador_derivados, "derivado", derivado)
+    motor._baixar_imagem = baixar_imagem
+    conteudo = {"url_imagem": "http://s/foto.png", "nome_arquivo": "foto.png"}
+
+    async def rodar():
+        return [await motor._fragmento_midia(conteudo) for _ in range(2)]
+
+    primeiro, segundo = asyncio.run(rodar())
+
+    assert primeiro == segundo
+    assert b'"fileName":"foto.png"' in primeiro
+    assert baixadas == ["http://s/foto.png"]
+    assert consultas == ["abc"]
+    assert motor._midias.obter(("whatsapp", "abc")) is None
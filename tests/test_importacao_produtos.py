@@ -0,0 +1,109 @@
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import json
+import zipfile
+import pytest
+from app.services import importacao_produtos
+from app.services.importacao_produtos import ErroValidacao, ImportacaoProdutos, validar_linha
+
+
+def _registro(**campos):
+    return {"nome": "Arroz", "codigo_produto": "A1", "unidade_medida": "kg", "preco_venda": "10", **campos}
+
+
+def test_qtd_estoque_inteira_e_aceita():
+    assert validar_linha(_registro(qtd_estoque="12"))["qtd_estoque"] == 12
+    assert validar_linha(_registro(qtd_estoque=3.0))["qtd_estoque"] == 3
+
+
+@pytest.mark.parametrize("valor", ["2.5", "1,7", 0.3, "abc", "NaN", "-1"])
+def test_qtd_estoque_invalida_e_rejeitada(valor):
+    with pytest.raises(ErroValidacao):
+        validar_linha(_registro(qtd_estoque=valor))
+
+
+class _Resultado:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def all(self):
+        return self.linhas
+
+
+class _SessaoFalsa:
+    def __init__(self, referenciados):
+        self.referenciados = referenciados
+
+    async def execute(self, instrucao, *args):
+        if "path_imagem2" in str(instrucao):
+            return _Resultado([(caminho, None, None) for caminho in self.referenciados])
+        return _Resultado([])
+
+    async def rollback(self):
+        pass
+
+
+def _importar(monkeypatch, referenciados=()):
+    enviados, deletados, agendados = [], [], []
+
+    async def enviar(bucket, caminho, conteudo, content_type=None, sobrescrever=False):
+        enviados.append(caminho)
+        return {"bucket": bucket, "path": caminho, "public_url": f"http://s/{caminho}", "sha256": "x"}
+
+    async def deletar(bucket, caminhos):
+        deletados.extend(caminhos)
+        return caminhos
+
+    async def gravar(db, validas):
+        erros = [importacao._erro(numero, "falhou", produto["codigo_produto"])
+                 for numero, produto, _ in validas if produto["codigo_produto"] == "B2"]
+        return len(validas) - len(erros), erros
+
+    @asynccontextmanager
+    async def get_db(env):
+        yield _SessaoFalsa(referenciados)
+
+    monkeypatch.setattr(importacao_produtos.armazenamento, "enviar", enviar)
+    monkeypatch.setattr(importacao_produtos.armazenamento, "deletar", deletar)
+    monkeypatch.setattr(importacao_produtos.gerador_derivados, "agendar", agendados.append)
+    monkeypatch.setattr(importacao_produtos, "get_db", get_db)
+    monkeypatch.setattr(importacao_produtos, "emitir", lambda *a, **k: None)
+
+    linhas = [
+        {**_registro(codigo_produto="A1"), "imagem": "a.jpg"},
+        {**_registro(codigo_produto="B2"), "imagem": "b.jpg"}
+    ]
+    arquivo = io.BytesIO("".join(json.dumps(linha) + "\n" for linha in linhas).encode())
+    imagens = io.BytesIO()
+    with zipfile.ZipFile(imagens, "w") as zip_imagens:
+        zip_imagens.writestr("a.jpg", b"imagem a")
+        zip_imagens.writestr("b.jpg", b"imagem b")
+    imagens.seek(0)
+
+    importacao = ImportacaoProdutos("123", arquivo, "ndjson", imagens)
+    importacao._gravar = gravar
+
+    async def rodar():
+        return [evento async for evento in importacao.executar()]
+
+    return asyncio.run(rodar()), enviados, deletados, agendados
+
+
+def test_imagem_de_linha_nao_gravada_e_removida(monkeypatch):
+    eventos, enviados, deletados, agendados = _importar(monkeypatch)
+
+    caminho_b = next(caminho for caminho in enviados if caminho.endswith("-b.jpg"))
+    assert deletados == [caminho_b]
+    assert [upload["path"] for upload in agendados] == [c for c in enviados if c.endswith("-a.jpg")]
+    assert eventos[-1]["importadas"] == 1
+    assert eventos[-1]["erros"] == 1
+
+
+def test_imagem_ainda_referenciada_nao_e_removida(monkeypatch):
+    caminho_b = "produtos/123/" + importacao_produtos.hashlib.sha256(b"imagem b").hexdigest()[:16] + "-b.jpg"
+
+    _, enviados, deletados, _ = _importar(monkeypatch, referenciados=[caminho_b])
+
+    assert caminho_b in enviados
+    assert deletados == []
@@ -0,0 +1,124 @@
+import asyncio
+import httpx
+from app.services.join_wpp import ClienteJoinDeveloper
+
+
+def _cliente(handler, max_tentativas=3):
+    cliente = ClienteJoinDeveloper(url_base="http://join.teste", token_cliente="token", max_tentativas=max_tentativas)
+    cliente._cliente = httpx.AsyncClient(base_url="http://join.teste", transport=httpx.MockTransport(handler))
+    cliente._espera = lambda tentativa, resposta=None: 0
+    return cliente
+
+
+def _executar(cliente, chamada):
+    async def rodar():
+        try:
+            return await chamada(cliente)
+        finally:
+            await cliente.fechar()
+    return asyncio.run(rodar())
+
+
+def test_envio_nao_repete_apos_timeout_de_leitura():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        raise httpx.ReadTimeout("sem resposta", request=request)
+
+    resposta = _executar(_cliente(handler), lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert len(chamadas) == 1
+    assert not resposta.sucesso
+    assert resposta.status_code == 0
+
+
+def test_envio_repete_erro_de_conexao():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        if len(chamadas) == 1:
+            raise httpx.ConnectError("recusada", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    resposta = _executar(_cliente(handler), lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert len(chamadas) == 2
+    assert resposta.sucesso
+    assert resposta.dados == {"ok": True}
+
+
+def test_envio_repete_status_retentavel():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        if len(chamadas) < 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(201, json={"id": "abc"})
+
+    resposta = _executar(_cliente(handler), lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert len(chamadas) == 3
+    assert resposta.status_code == 201
+
+
+def test_status_nao_retentavel_retorna_erro_sem_repetir():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        return httpx.Response(400, json={"mensagem": "numero invalido"})
+
+    resposta = _executar(_cliente(handler), lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert len(chamadas) == 1
+    assert resposta.erro == "HTTP 400"
+    assert resposta.para_dict()["status_code"] == 400
+
+
+def test_consulta_repete_timeout_de_leitura():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        if len(chamadas) == 1:
+            raise httpx.ReadTimeout("sem resposta", request=request)
+        return httpx.Response(200, json={"status": "open"})
+
+    resposta = _executar(_cliente(handler), lambda c: c.verificar_status_conexao("123"))
+
+    assert len(chamadas) == 2
+    assert resposta.dados == {"status": "open"}
+    assert chamadas[0].headers["instancia"] == "123"
+    assert chamadas[0].headers["tokenCliente"] == "token"
+
+
+def test_esgota_tentativas_em_erro_de_conexao():
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        raise httpx.ConnectError("recusada", request=request)
+
+    resposta = _executar(_cliente(handler, max_tentativas=2), lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert len(chamadas) == 2
+    assert resposta.erro == "recusada"
+
+
+def test_sem_token_nao_faz_requisicao(monkeypatch):
+    chamadas = []
+
+    async def obter(codigo):
+        return None
+
+    monkeypatch.setattr("app.services.join_wpp.cache_credenciais.obter", obter)
+    cliente = _cliente(lambda request: chamadas.append(request) or httpx.Response(200))
+    cliente.token_cliente = None
+
+    resposta = _executar(cliente, lambda c: c.enviar_texto("123", "5511999999999", "oi"))
+
+    assert chamadas == []
+    assert not resposta.sucesso
@@ -0,0 +1,23 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.auth2.token import UsuarioAutenticado
+from app.routes import metricas as rotas_metricas
+
+
+def _acessar(monkeypatch, niveis, nivel_acesso):
+    monkeypatch.setattr(rotas_metricas, "METRICAS_NIVEIS_ACESSO", niveis)
+    usuario = UsuarioAutenticado(username="ana", cnpj="123", nivel_acesso=nivel_acesso)
+    try:
+        return asyncio.run(rotas_metricas.usuario_metricas(usuario))
+    except HTTPException as e:
+        return e
+
+
+@pytest.mark.parametrize("niveis, nivel_acesso", [(set(), 1), ({1}, 2), ({1}, None)])
+def test_metricas_recusam_usuario_sem_nivel_administrativo(monkeypatch, niveis, nivel_acesso):
+    assert _acessar(monkeypatch, niveis, nivel_acesso).status_code == 403
+
+
+def test_metricas_aceitam_nivel_configurado(monkeypatch):
+    assert _acessar(monkeypatch, {1}, 1).username == "ana"
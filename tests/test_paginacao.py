@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime
+from app.models.contrato import _contrato_formatado, Contrato
+from app.models.usuario import Usuario
+from app.utils.paginacao import Paginacao, paginar
+from app.utils.transformadores_json import usuario_to_dict
+
+
+class _Resultado:
+    def __init__(self, linhas):
+        self._linhas = linhas
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._linhas
+
+
+class _SessaoFalsa:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    async def execute(self, consulta):
+        return _Resultado(self.linhas)
+
+
+def test_projecao_passa_pelo_serializador():
+    linhas = [{"id": 1, "data_cadastro": datetime(2026, 1, 2, 3, 4, 5)}]
+
+    pagina = asyncio.run(paginar(
+        _SessaoFalsa(linhas), Usuario, [], Paginacao(campos=["data_cadastro"]), usuario_to_dict
+    ))
+
+    assert pagina.itens == [{"id": 1, "data_cadastro": "2026-01-02T03:04:05"}]
+
+
+def test_projecao_mantem_apenas_campos_pedidos_e_cursor():
+    linhas = [{"id": indice, "plano": "anual"} for indice in (3, 4, 5)]
+
+    pagina = asyncio.run(paginar(
+        _SessaoFalsa(linhas), Contrato, [], Paginacao(limite=2, campos=["plano"]), _contrato_formatado
+    ))
+
+    assert pagina.itens == [{"id": 3, "plano": "anual"}, {"id": 4, "plano": "anual"}]
+    assert pagina.proximo_cursor == 4
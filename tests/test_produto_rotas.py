@@ -0,0 +1,181 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import asyncio
+import io
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from app.routes import produto as rotas_produto
+
+
+class _SessaoFalsa:
+    async def rollback(self):
+        pass
+
+
+def _atualizar(monkeypatch, conteudo=b"nova imagem", path_anterior="produtos/123/antiga.jpg", falhar=False, existe=True):
+    passos = []
+    produto = SimpleNamespace(id=7, path_imagem1=path_anterior) if existe else None
+
+    async def recuperar_empresa(usuario):
+        return "123"
+
+    @asynccontextmanager
+    async def get_db(env):
+        yield _SessaoFalsa()
+
+    async def buscar_produto(db, produto_id):
+        return produto
+
+    async def upload_arquivo_stream(arquivo, file_name, bucket_name, content_type, overwrite, storage_path=None):
+        passos.append(("upload", file_name))
+        return {"status": "success", "path": file_name, "public_url": f"http://s/{file_name}", "sha256": "x"}
+
+    async def atualizar_produto(db, produto_id, path_imagem1=None, **campos):
+        if falhar:
+            raise RuntimeError("falha no banco")
+        passos.append(("atualizar", path_imagem1))
+        produto.path_imagem1 = path_imagem1 or produto.path_imagem1
+        return produto
+
+    async def caminhos_imagem_em_uso(db, caminhos):
+        return set()
+
+    async def delete_file(bucket, caminhos):
+        passos.append(("deletar", sorted(caminhos)))
+
+    monkeypatch.setattr(rotas_produto, "recuperar_empresa", recuperar_empresa)
+    monkeypatch.setattr(rotas_produto, "get_db", get_db)
+    monkeypatch.setattr(rotas_produto, "buscar_produto", buscar_produto)
+    monkeypatch.setattr(rotas_produto, "upload_arquivo_stream", upload_arquivo_stream)
+    monkeypatch.setattr(rotas_produto, "atualizar_produto", atualizar_produto)
+    monkeypatch.setattr(rotas_produto, "caminhos_imagem_em_uso", caminhos_imagem_em_uso)
+    monkeypatch.setattr(rotas_produto, "delete_file", delete_file)
+    monkeypatch.setattr(rotas_produto.gerador_derivados, "agendar", lambda upload: None)
+    monkeypatch.setattr(rotas_produto, "produto_to_dict", lambda produto: {"id": produto.id})
+
+    imagem = UploadFile(io.BytesIO(conteudo), filename="foto.jpg", headers=Headers({"content-type": "image/jpeg"}))
+
+    async def rodar():
+        return await rotas_produto.atualizar_produto_endpoint(
+            7, None, None, None, None, None, None, None, imagem, usuario_atual=None
+        )
+
+    try:
+        resposta = asyncio.run(rodar())
+    except Exception as e:
+        resposta = e
+    return resposta, passos
+
+
+def test_imagem_antiga_e_removida_apos_upload_e_atualizacao(monkeypatch):
+    resposta, passos = _atualizar(monkeypatch)
+
+    assert resposta["status"] == "success"
+    assert [passo for passo, _ in passos] == ["upload", "atualizar", "deletar"]
+    caminho_novo = passos[0][1]
+    assert caminho_novo.startswith("produtos/123/") and caminho_novo.endswith("-foto.jpg")
+    assert passos[2][1] == ["produtos/123/antiga.jpg"]
+
+
+def test_reenvio_da_mesma_imagem_nao_remove_o_arquivo(monkeypatch):
+    caminho = rotas_produto.caminho_imagem_produto(
+        "123", rotas_produto.hashlib.sha256(b"mesma").hexdigest(), "foto.jpg"
+    )
+
+    _, passos = _atualizar(monkeypatch, conteudo=b"mesma", path_anterior=caminho)
+
+    assert [passo for passo, _ in passos] == ["upload", "atualizar"]
+
+
+def test_falha_ao_atualizar_remove_upload_novo_e_mantem_antigo(monkeypatch):
+    _, passos = _atualizar(monkeypatch, falhar=True)
+
+    assert [passo for passo, _ in passos] == ["upload", "deletar"]
+    assert passos[1][1] == [passos[0][1]]
+
+
+def test_atualizar_produto_inexistente_retorna_404(monkeypatch):
+    resposta, passos = _atualizar(monkeypatch, existe=False)
+
+    assert isinstance(resposta, HTTPException)
+    assert resposta.status_code == 404
+    assert passos == []
+
+
+def test_deletar_produto_inexistente_retorna_404(monkeypatch):
+    async def recuperar_empresa(usuario):
+        return "123"
+
+    @asynccontextmanager
+    async def get_db(env):
+        yield _SessaoFalsa()
+
+    async def buscar_produto(db, produto_id):
+        return None
+
+    monkeypatch.setattr(rotas_produto, "recuperar_empresa", recuperar_empresa)
+    monkeypatch.setattr(rotas_produto, "get_db", get_db)
+    monkeypatch.setattr(rotas_produto, "buscar_produto", buscar_produto)
+
+    try:
+        asyncio.run(rotas_produto.deletar_produto_endpoint(7, usuario_atual=None))
+    except HTTPException as e:
+        resposta = e
+
+    assert resposta.status_code == 404
+
+
+def _cadastrar(monkeypatch, falhar=False):
+    passos = []
+
+    async def recuperar_empresa(usuario):
+        return "123"
+
+    @asynccontextmanager
+    async def get_db(env):
+        yield _SessaoFalsa()
+        passos.append(("commit", env))
+
+    async def upload_arquivo_stream(arquivo, file_name, bucket_name, content_type, overwrite, storage_path=None):
+        return {"status": "success", "path": file_name, "public_url": f"http://s/{file_name}", "sha256": "x"}
+
+    async def criar_produto(db, **campos):
+        if falhar:
+            raise RuntimeError("falha no banco")
+        passos.append(("criar", campos["path_imagem1"]))
+        return SimpleNamespace(id=7)
+
+    async def caminhos_imagem_em_uso(db, caminhos):
+        return set()
+
+    async def delete_file(bucket, caminhos):
+        passos.append(("deletar", sorted(caminhos)))
+
+    monkeypatch.setattr(rotas_produto, "recuperar_empresa", recuperar_empresa)
+    monkeypatch.setattr(rotas_produto, "get_db", get_db)
+    monkeypatch.setattr(rotas_produto, "upload_arquivo_stream", upload_arquivo_stream)
+    monkeypatch.setattr(rotas_produto, "criar_produto", criar_produto)
+    monkeypatch.setattr(rotas_produto, "caminhos_imagem_em_uso", caminhos_imagem_em_uso)
+    monkeypatch.setattr(rotas_produto, "delete_file", delete_file)
+    monkeypatch.setattr(rotas_produto.gerador_derivados, "agendar", lambda upload: passos.append(("agendar", upload["path"])))
+    monkeypatch.setattr(rotas_produto, "produto_to_dict", lambda produto: {"id": produto.id})
+
+    imagem = UploadFile(io.BytesIO(b"imagem"), filename="foto.jpg", headers=Headers({"content-type": "image/jpeg"}))
+    resposta = asyncio.run(rotas_produto.cadastrar_produto(
+        "Caneca", "Caneca branca", "C1", "un", 10.0, 5, "http://loja/c1", imagem, usuario_atual=None
+    ))
+    return resposta, passos
+
+
+def test_derivados_sao_agendados_apos_salvar_produto(monkeypatch):
+    resposta, passos = _cadastrar(monkeypatch)
+
+    assert resposta == {"status": "success", "produto": {"id": 7}}
+    assert [passo for passo, _ in passos] == ["criar", "commit", "agendar"]
+
+
+def test_falha_ao_cadastrar_nao_agenda_derivados(monkeypatch):
+    resposta, passos = _cadastrar(monkeypatch, falhar=True)
+
+    assert resposta["status"] == "error"
+    assert [passo for passo, _ in passos] == ["deletar"]
@@ -0,0 +1,75 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.routes import join_wpp as rotas_join
+from app.services import webhook_join
+from app.services.gptOpenAI import MENSAGEM_FALHA
+from app.services.webhook_join import ProcessadorWebhook
+
+
+class _Requisicao:
+    async def body(self):
+        return b'{"event": "messages.upsert", "instance": "123", "data": {}}'
+
+
+def _receber(monkeypatch, segredo, token):
+    recebidos = []
+    monkeypatch.setattr(rotas_join, "JD_WEBHOOK_SEGREDO", segredo)
+    monkeypatch.setattr(rotas_join.processador_webhook, "receber", lambda payload: recebidos.append(payload) or True)
+    try:
+        resposta = asyncio.run(rotas_join.receber_webhook_join(_Requisicao(), token))
+    except HTTPException as e:
+        resposta = e
+    return resposta, recebidos
+
+
+@pytest.mark.parametrize("token", [None, "", "qualquer"])
+def test_webhook_sem_segredo_configurado_recusa_tudo(monkeypatch, token):
+    resposta, recebidos = _receber(monkeypatch, None, token)
+
+    assert resposta.status_code == 503
+    assert recebidos == []
+
+
+def test_webhook_com_token_invalido_e_recusado(monkeypatch):
+    resposta, recebidos = _receber(monkeypatch, "segredo", "outro")
+
+    assert resposta.status_code == 401
+    assert recebidos == []
+
+
+def test_webhook_com_token_valido_e_aceito(monkeypatch):
+    resposta, recebidos = _receber(monkeypatch, "segredo", "segredo")
+
+    assert resposta == {"status": "success"}
+    assert len(recebidos) == 1
+
+
+@pytest.mark.parametrize("status", ["cancelled", "expired", "requires_action", "failed", "incomplete"])
+def test_resposta_nao_concluida_envia_mensagem_de_falha(monkeypatch, status):
+    enviados = []
+
+    @asynccontextmanager
+    async def get_db(env):
+        yield None
+
+    async def buscar_produto_ultimo_envio(db, numero):
+        return None
+
+    async def responder(texto, cnpj, numero, produto_id=None):
+        return f"Erro: {status}", "thread_1", status
+
+    async def enviar_texto(cnpj, numero, mensagem):
+        enviados.append(mensagem)
+        return SimpleNamespace(sucesso=True)
+
+    monkeypatch.setattr(webhook_join, "get_db", get_db)
+    monkeypatch.setattr(webhook_join, "buscar_produto_ultimo_envio", buscar_produto_ultimo_envio)
+    monkeypatch.setattr(webhook_join, "responder", responder)
+    monkeypatch.setattr(webhook_join.cliente_join, "enviar_texto", enviar_texto)
+
+    asyncio.run(ProcessadorWebhook()._responder("123", "5511999999999", "oi"))
+
+    assert enviados == [MENSAGEM_FALHA]